@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+BATCH_ENDPOINT_URL = "/v1/chat/completions"
+
+
+class BatchRequestWriter:
+    """
+    Write chat completion requests in the OpenAI Batch API input format.
+    Each custom_id is written once, so identical requests shared by several records cost nothing extra.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.custom_ids = set()
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def add(self, custom_id: str, messages, model: str = "gpt-4o", **params) -> bool:
+        """Append a request; returns False if custom_id was already written."""
+        if custom_id in self.custom_ids:
+            return False
+        self.custom_ids.add(custom_id)
+        request = {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT_URL,
+            "body": {"model": model, "messages": messages, **params},
+        }
+        self._file.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return True
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_batch_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read a batch output file.
+    Returns:
+        dict: custom_id -> {"content": message content or None, "error": error description or None}
+    """
+    results = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            content, error = None, record.get('error')
+            response = record.get('response') or {}
+            if response.get('status_code') == 200:
+                try:
+                    content = response['body']['choices'][0]['message']['content']
+                except (KeyError, IndexError, TypeError) as e:
+                    error = f"Malformed response body: {e}"
+            elif error is None:
+                error = f"HTTP {response.get('status_code')}: {response.get('body')}"
+            results[record['custom_id']] = {"content": content, "error": error}
+    return results
+
+
+def _request_params(body: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in body.items() if k not in ('model', 'messages')}
+
+
+def offline_responder(body: Dict[str, Any]) -> str:
+    """Default responder of LocalBatchEndpoint: answers nothing, so an offline run never spends API quota."""
+    raise RuntimeError("no offline response for this request; replay an LLM cache (--llm_cache) or opt in to API calls (--live)")
+
+
+def replay_responder(cache_path: str) -> Callable[[Dict[str, Any]], str]:
+    """Responder answering batch requests from an LLM cache file only; a request missing from it fails."""
+    from Acache import LLMCache
+    cache = LLMCache(cache_path, mode='replay')
+
+    def respond(body: Dict[str, Any]) -> str:
+        return cache.get(LLMCache.make_key(body['model'], body['messages'], _request_params(body)))
+    return respond
+
+
+def live_responder(body: Dict[str, Any]) -> str:
+    """Answer a batch request body through Atools.chat_completion: real API calls (honours the LLM cache)."""
+    from Atools import chat_completion
+    return chat_completion(body['messages'], model=body['model'], **_request_params(body))
+
+
+class LocalBatchEndpoint:
+    """
+    File-based stand-in for the OpenAI Batch API, used for offline runs and tests.
+    create() stores the input under root_dir and answers every request with responder
+    (request body -> message content), writing an output file in the same format as the
+    real endpoint. The default offline_responder fails every request; pass replay_responder(...)
+    to answer from an LLM cache, or live_responder to call the API.
+    """
+
+    def __init__(self, root_dir: str, responder: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.root_dir = root_dir
+        self.responder = responder or offline_responder
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _batch_dir(self, batch_id: str) -> str:
+        return os.path.join(self.root_dir, batch_id)
+
+    def create(self, input_path: str) -> Dict[str, Any]:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir)
+        shutil.copyfile(input_path, os.path.join(batch_dir, 'input.jsonl'))
+        batch = {"id": batch_id, "status": "in_progress", "created_at": time.time(), "request_counts": {}}
+        self._write_state(batch)
+        self._run(batch)
+        return batch
+
+    def _run(self, batch: Dict[str, Any]):
+        batch_dir = self._batch_dir(batch['id'])
+        completed = failed = 0
+        with open(os.path.join(batch_dir, 'input.jsonl'), 'r', encoding='utf-8') as fin, \
+             open(os.path.join(batch_dir, 'output.jsonl'), 'w', encoding='utf-8') as fout:
+            for line in fin:
+                line = line.strip()
+                if not line:
+                    continue
+                request = json.loads(line)
+                record = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request['custom_id'], "response": None, "error": None}
+                try:
+                    content = self.responder(request['body'])
+                    record['response'] = {
+                        "status_code": 200,
+                        "body": {
+                            "object": "chat.completion",
+                            "model": request['body'].get('model'),
+                            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        },
+                    }
+                    completed += 1
+                except Exception as e:
+                    record['error'] = {"code": type(e).__name__, "message": str(e)}
+                    failed += 1
+                fout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        batch.update({"status": "completed", "completed_at": time.time(),
+                      "request_counts": {"total": completed + failed, "completed": completed, "failed": failed}})
+        self._write_state(batch)
+
+    def _write_state(self, batch: Dict[str, Any]):
+        with open(os.path.join(self._batch_dir(batch['id']), 'batch.json'), 'w', encoding='utf-8') as f:
+            json.dump(batch, f, indent=2)
+
+    def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        with open(os.path.join(self._batch_dir(batch_id), 'batch.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def download(self, batch_id: str, output_path: str):
+        batch = self.retrieve(batch_id)
+        if batch['status'] != 'completed':
+            raise RuntimeError(f"Batch {batch_id} is not completed: {batch['status']}")
+        shutil.copyfile(os.path.join(self._batch_dir(batch_id), 'output.jsonl'), output_path)
+
+
+class OpenAIBatchEndpoint:
+    """Thin wrapper over the OpenAI Batch API with the same interface as LocalBatchEndpoint."""
+
+    def __init__(self, client=None, completion_window: str = "24h"):
+        if client is None:
+            from Atools import get_client
+            client = get_client()
+        self.client = client
+        self.completion_window = completion_window
+
+    def create(self, input_path: str) -> Dict[str, Any]:
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT_URL,
+            completion_window=self.completion_window,
+        )
+        return self.retrieve(batch.id)
+
+    def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "id": batch.id,
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+            "request_counts": batch.request_counts.model_dump() if batch.request_counts else {},
+        }
+
+    def download(self, batch_id: str, output_path: str):
+        batch = self.retrieve(batch_id)
+        if batch['status'] != 'completed':
+            raise RuntimeError(f"Batch {batch_id} is not completed: {batch['status']}")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            if batch['output_file_id']:
+                f.write(self.client.files.content(batch['output_file_id']).text)
+            # Failed requests are reported in a separate error file with the same line format
+            if batch['error_file_id']:
+                f.write(self.client.files.content(batch['error_file_id']).text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit batch request files built by judge_fact.py / judge_score.py and download their results.")
+    parser.add_argument('command', choices=['submit', 'status', 'download'])
+    parser.add_argument('--endpoint', choices=['local', 'openai'], default='local', help='local: file-based stand-in that answers requests immediately')
+    parser.add_argument('--local_root', type=str, default='./exp/batches', help='Working directory of the local endpoint')
+    parser.add_argument('--llm_cache', type=str, default=None, help='local: answer requests from this LLM cache file (as written by --llm_cache of the judge scripts); requests missing from it fail')
+    parser.add_argument('--live', action='store_true', help='local: answer requests through the chat completions API (spends API quota; the LLM cache is not used)')
+    parser.add_argument('--input', type=str, help='submit: batch request JSONL')
+    parser.add_argument('--batch_id', type=str, help='status/download: batch id returned by submit')
+    parser.add_argument('--output', type=str, help='download: where to write the batch result JSONL')
+    args = parser.parse_args()
+    if args.llm_cache and args.live:
+        parser.error('--llm_cache and --live are mutually exclusive')
+    if args.command == 'submit' and args.endpoint == 'local' and not (args.llm_cache or args.live):
+        parser.error('submit --endpoint local needs --llm_cache PATH (replay cached responses) or --live (call the API)')
+
+    if args.endpoint == 'local':
+        responder = replay_responder(args.llm_cache) if args.llm_cache else live_responder if args.live else offline_responder
+        endpoint = LocalBatchEndpoint(args.local_root, responder)
+    else:
+        endpoint = OpenAIBatchEndpoint()
+    if args.command == 'submit':
+        batch = endpoint.create(args.input)
+    elif args.command == 'status':
+        batch = endpoint.retrieve(args.batch_id)
+    else:
+        endpoint.download(args.batch_id, args.output)
+        batch = endpoint.retrieve(args.batch_id)
+        print(f"Saved batch results: {args.output}")
+    print(json.dumps(batch, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a request is not found in the cache."""
+
+
+class LLMCache:
+    """
+    On-disk, content-addressed cache of chat completion responses backed by SQLite.
+
+    Entries are keyed by a hash of the model, the messages and the generation parameters,
+    so identical judge requests share one entry across runs and across scripts.
+    When the stored responses exceed max_bytes, the least recently used entries are evicted.
+
+    Modes:
+        - 'readwrite': look up the cache first and store every new response (default)
+        - 'replay': read-only; a miss raises CacheMissError instead of calling the API
+    """
+
+    MODES = ('readwrite', 'replay')
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, mode: str = 'readwrite'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cache file not found for replay: {path}")
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+                "created_at REAL, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None) -> str:
+        """Hash model, messages and generation parameters into a stable cache key."""
+        payload = json.dumps(
+            {'model': model, 'messages': messages, 'params': params or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss (CacheMissError in replay mode)."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.mode == 'replay':
+                    raise CacheMissError(f"No cached response for key {key}")
+                return None
+            self.hits += 1
+            if self.mode == 'readwrite':
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        """Store a response and evict old entries if the size limit is exceeded."""
+        if self.mode == 'replay':
+            return
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            self._conn.commit()
+            if self.max_bytes is not None:
+                self._evict()
+
+    def delete(self, key: str):
+        """Drop one entry, e.g. a response its caller could not use."""
+        if self.mode == 'replay':
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PageCache:
+    """
+    On-disk store of scraped pages backed by SQLite, keyed by normalized URL and provider.
+
+    Page markdown is stored zlib-compressed together with fetch metadata. Entries older
+    than ttl_seconds are treated as misses and re-fetched; ttl_seconds=None never expires.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT, provider TEXT, content BLOB, metadata TEXT, fetched_at REAL, "
+            "PRIMARY KEY (url, provider))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_key(url: str) -> str:
+        """Drop surrounding whitespace and the #fragment, which never changes the fetched page."""
+        return url.strip().split('#', 1)[0]
+
+    def get(self, url: str, provider: str) -> Optional[str]:
+        """Return the cached markdown for (url, provider), or None if missing or expired."""
+        key = self.normalize_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, fetched_at FROM pages WHERE url = ? AND provider = ?", (key, provider)
+            ).fetchone()
+        if row is None or (self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def get_metadata(self, url: str, provider: str) -> Optional[Dict[str, Any]]:
+        """Return the fetch metadata stored with a page, regardless of its age."""
+        key = self.normalize_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM pages WHERE url = ? AND provider = ?", (key, provider)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, url: str, provider: str, content: str, metadata: Optional[Dict[str, Any]] = None):
+        """Store a scraped page with its fetch metadata."""
+        key = self.normalize_key(url)
+        now = time.time()
+        raw = content.encode('utf-8')
+        compressed = zlib.compress(raw)
+        metadata = dict(metadata or {})
+        metadata.update({'fetched_at': now, 'content_bytes': len(raw), 'compressed_bytes': len(compressed)})
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, provider, content, metadata, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, provider, compressed, json.dumps(metadata, ensure_ascii=False), now),
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of stored pages."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from Asections import SectionIndex
+
+# Sentence terminators: CJK/latin '!' '?' '。' and line breaks always end a sentence; '.' only when
+# followed by whitespace, the end of the text, a citation marker or a closing quote/bracket
+# (so decimals, URLs and domain names are not split)
+_SENTENCE_END = re.compile(r'[。！？!?\n]|\.(?=\s|$|\[|["\'”’)\]])')
+# Closing quotes/brackets and citation markers that trail a terminator belong to its sentence
+_SENTENCE_TAIL = re.compile(r'["\'”’)」』]*(?:[ \t]*\[\[?\d+(?:\s*[,，\-–]\s*\d+)*\]?\])*')
+# Words whose trailing '.' does not end a sentence
+_ABBREVIATIONS = frozenset({
+    'e.g', 'i.e', 'etc', 'al', 'vs', 'cf', 'approx', 'fig', 'figs', 'eq', 'ref', 'refs', 'no', 'vol',
+    'dr', 'mr', 'mrs', 'ms', 'prof', 'st', 'jr', 'sr', 'inc', 'ltd', 'co', 'u.s', 'ph.d', 'p', 'pp',
+})
+_WORD_BEFORE_DOT = re.compile(r'([A-Za-z]+(?:\.[A-Za-z]+)*)$')
+
+# [[1]], [[1,2]], [1], [1, 2], [1-3]; a markdown link label like [1](http...) is not a citation
+CITATION_MARKER = re.compile(r'\[\[(\d+(?:\s*[,，\-–]\s*\d+)*)\]\]|\[(\d+(?:\s*[,，\-–]\s*\d+)*)\](?!\()')
+# Reference list entry: "[1],https://...", "[1] https://...", "[[1]]: Title https://..."
+_REFERENCE_LINE = re.compile(r'^[ \t]*(?:[-*][ \t]+)?\[\[?(\d+)\]?\][ \t]*[,:：.]?[ \t]*(.*)$', re.MULTILINE)
+_URL = re.compile(r'https?://[^\s)\]>"\']+')
+# A reference list URL runs to the end of its whitespace-free token; parentheses are kept (DOIs,
+# wiki titles) and only trailing punctuation and an unbalanced closing bracket are trimmed
+_REFERENCE_URL = re.compile(r'https?://\S+')
+_URL_TRAILING = '.,;:\'">，。；：、）》'
+_REFERENCE_TITLE = re.compile(r'^#+\s*(?:references?|sources?|bibliography|citations?|参考文献|参考资料|引用)\b', re.IGNORECASE)
+_LIST_PREFIX = re.compile(r'^(?:[>*+\-#|]+\s*|\d+\.\s+)+')
+# Ranges wider than this are treated as noise rather than expanded
+MAX_CITATION_RANGE = 50
+
+
+def split_sentences(text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """
+    Linear-time sentence segmentation of text[start:end].
+    Yields (start, end) offsets of each non-empty sentence, whitespace excluded; the terminator and
+    any closing quotes or citation markers right after it are part of the sentence.
+    """
+    end = len(text) if end is None else end
+    sentence_start = start
+    pos = start
+    while pos < end:
+        match = _SENTENCE_END.search(text, pos, end)
+        if match is None:
+            break
+        boundary = match.start()
+        pos = boundary + 1
+        if text[boundary] == '.':
+            word = _WORD_BEFORE_DOT.search(text, max(sentence_start, boundary - 12), boundary)
+            if word is not None and (word.group(1).lower() in _ABBREVIATIONS or len(word.group(1)) == 1 and word.group(1).isupper()):
+                continue
+        if text[boundary] == '\n':
+            sentence_end = boundary
+        else:
+            sentence_end = _SENTENCE_TAIL.match(text, pos, end).end()
+            pos = sentence_end
+        span = _trim(text, sentence_start, sentence_end)
+        if span is not None:
+            yield span
+        sentence_start = pos
+    span = _trim(text, sentence_start, end)
+    if span is not None:
+        yield span
+
+
+def _trim(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def citation_numbers(marker: re.Match) -> List[int]:
+    """Reference numbers of one CITATION_MARKER match, with 'a-b' ranges expanded."""
+    numbers = []
+    for part in re.split(r'\s*[,，]\s*', marker.group(1) or marker.group(2)):
+        bounds = re.split(r'\s*[\-–]\s*', part)
+        low, high = int(bounds[0]), int(bounds[-1])
+        if low <= high and high - low <= MAX_CITATION_RANGE:
+            numbers.extend(range(low, high + 1))
+        else:
+            numbers.append(low)
+    return numbers
+
+
+def parse_reference_list(text: str, start: int = 0, end: Optional[int] = None) -> Dict[int, str]:
+    """
+    Map reference numbers to URLs from the reference list lines in text[start:end].
+    Entries without a URL (e.g. "[29],") are left out.
+    """
+    end = len(text) if end is None else end
+    references = {}
+    for match in _REFERENCE_LINE.finditer(text, start, end):
+        url = _REFERENCE_URL.search(match.group(2))
+        if url is not None:
+            references.setdefault(int(match.group(1)), trim_url(url.group()))
+    return references
+
+
+def trim_url(url: str) -> str:
+    """Strip trailing punctuation and closing brackets that have no opening one inside the URL."""
+    while url:
+        last = url[-1]
+        if last in _URL_TRAILING:
+            url = url[:-1]
+        elif last in ')]' and url.count(last) > url.count('(' if last == ')' else '['):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def clean_claim(sentence: str) -> str:
+    """Claim text of a cited sentence: citation markers, list/quote prefixes, bold markers and the final terminator removed."""
+    claim = CITATION_MARKER.sub('', sentence).replace('``', '').replace('**', '')
+    claim = _LIST_PREFIX.sub('', claim.strip())
+    claim = re.sub(r'\s+', ' ', claim)
+    claim = re.sub(r'\s+([,.;:!?。，；：！？)])', r'\1', claim)
+    return claim.strip().rstrip('.。!！?？;；:：,， ').strip()
+
+
+def extract_report_claims(report: str, min_chars: int = 20) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+    """
+    Turn a report into judge_fact contexts grouped by cited URL.
+    Sentences are taken from every section except the reference list, skipping table rows; each
+    citation marker is resolved against the reference list and the cleaned sentence becomes a
+    context of every URL it cites. Contexts are deduplicated per URL and kept in order of first
+    appearance.
+    Args:
+        report: markdown report whose reference list holds "[n],url" style lines
+        min_chars: contexts shorter than this after cleaning are dropped
+    Returns:
+        (claims, stats): claims is {url: [context, ...]} ordered by first citation; stats counts
+        sentences, cited sentences, claims and unresolved citation markers
+    """
+    index = SectionIndex(report)
+    reference_sections = [
+        k for k in range(len(index))
+        if index.sections[k].title_start >= 0 and _REFERENCE_TITLE.match(index.titles[k])
+    ]
+    references: Dict[int, str] = {}
+    for k in reference_sections:
+        section = index.sections[k]
+        references.update(parse_reference_list(report, section.body_start, section.body_end))
+    if not reference_sections:
+        references = parse_reference_list(report)
+
+    claims: Dict[str, List[str]] = {}
+    seen = set()
+    stats = {"sentences": 0, "cited_sentences": 0, "claims": 0, "unresolved_citations": 0}
+    skip = set(reference_sections)
+    for k, section in enumerate(index.sections):
+        if k in skip:
+            continue
+        line_start = previous_end = section.body_start
+        for start, end in split_sentences(report, section.body_start, section.body_end):
+            # Sentences never contain a line break, so only the gap since the previous one is searched
+            newline = report.rfind('\n', previous_end, start)
+            if newline != -1:
+                line_start = newline + 1
+            previous_end = end
+            if report.startswith('|', line_start):
+                # Markdown table rows are not sentences
+                continue
+            stats["sentences"] += 1
+            sentence = report[start:end]
+            if '[' not in sentence:
+                continue
+            markers = list(CITATION_MARKER.finditer(sentence))
+            if not markers:
+                continue
+            stats["cited_sentences"] += 1
+            claim = clean_claim(sentence)
+            if len(claim) < min_chars or (_REFERENCE_LINE.fullmatch(sentence) and _URL.search(sentence)):
+                continue
+            for marker in markers:
+                for number in citation_numbers(marker):
+                    url = references.get(number)
+                    if url is None:
+                        stats["unresolved_citations"] += 1
+                        continue
+                    if (url, claim) in seen:
+                        continue
+                    seen.add((url, claim))
+                    claims.setdefault(url, []).append(claim)
+                    stats["claims"] += 1
+    return claims, stats
+
+
+def write_claims_jsonl(input_path: str, output_path: str, min_chars: int = 20) -> Dict[str, int]:
+    """
+    Stream a report JSONL (the judge_score.py input) into judge_fact.py input: one
+    {url: {"contexts": [...], "file_id": ...}} line per cited URL of each report.
+    file_id is the md5 of the topic, as in judge_score.py.
+    Returns:
+        totals of the extract_report_claims stats plus reports and lines written
+    """
+    totals = {"reports": 0, "lines": 0, "sentences": 0, "cited_sentences": 0, "claims": 0, "unresolved_citations": 0}
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(input_path, 'r', encoding='utf-8') as fin, open(output_path, 'w', encoding='utf-8') as fout:
+        for line in fin:
+            if not line.strip():
+                continue
+            json_data = json.loads(line)
+            file_id = hashlib.md5(json_data['topic'].encode('utf-8')).hexdigest()
+            claims, stats = extract_report_claims(json_data['report'], min_chars)
+            for url, contexts in claims.items():
+                fout.write(json.dumps({url: {"contexts": contexts, "file_id": file_id}}, ensure_ascii=False) + "\n")
+                totals["lines"] += 1
+            for key, value in stats.items():
+                totals[key] += value
+            totals["reports"] += 1
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract cited claims from report JSONL (judge_score.py input) into judge_fact.py input.")
+    parser.add_argument('--inputpath', type=str, required=True, help='Report JSONL with "topic" and "report" fields')
+    parser.add_argument('--outputpath', type=str, required=True, help='judge_fact.py input JSONL to write')
+    parser.add_argument('--min_chars', type=int, default=20, help='Drop claims shorter than this many characters')
+    args = parser.parse_args()
+    totals = write_claims_jsonl(args.inputpath, args.outputpath, args.min_chars)
+    print(f"Saved claims: {args.outputpath} {json.dumps(totals, ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
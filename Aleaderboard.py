@@ -0,0 +1,283 @@
+import argparse
+import csv
+import glob
+import importlib.util
+import json
+import math
+import os
+import random
+import re
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: vectorized bootstrap; without it the same statistics are computed in pure Python
+    np = None
+
+SCORE_METRICS = ('comprehensiveness_score', 'coherence_score', 'clarity_score', 'insight_score', 'overall_score', 'repeat_score')
+
+# Top-level fields of a judge_score.py result. Each key is located with a plain substring search and
+# only its value is parsed, so the large compare_list / repeat_results strings are never decoded; the
+# same key inside a JSON string has its quotes escaped and does not match.
+_SCORE_KEYS = tuple((field, f'"{field}"') for field in ('file_id', *SCORE_METRICS))
+_FIELD_VALUE = re.compile(r'\s*:\s*("[0-9a-f]*"|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|null)')
+# is_factual of a judge_fact.py verdict; error labels (strings or {"error": ...}) have none
+_IS_FACTUAL = re.compile(r'(?<!\\)"is_factual"\s*:\s*(-?\d+)')
+# Samples with at most this many distinct values are bootstrapped from multinomial counts
+MULTINOMIAL_MAX_VALUES = 64
+
+
+def _result_files(paths: List[str], pattern: str) -> List[str]:
+    """Expand directories into their result files matching pattern; plain files are kept as given."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(p for p in glob.glob(os.path.join(path, pattern)) if not p.endswith('.missing.jsonl')))
+        else:
+            files.append(path)
+    return files
+
+
+def _documents(path: str) -> Iterator[str]:
+    """Raw text of each result in a file: the whole file for .json, one line at a time for JSONL."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            yield f.read()
+            return
+        for line in f:
+            if line.strip():
+                yield line
+
+
+class ScoreColumns:
+    """
+    Columnar store of the per-report scores of one model: one float array per metric, NaN where a
+    result lacks the metric. Results are deduplicated by file_id (first occurrence wins).
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, array] = {metric: array('d') for metric in SCORE_METRICS}
+        self.file_ids = set()
+        self.duplicates = 0
+
+    def add_document(self, text: str) -> bool:
+        fields = {}
+        for field, key in _SCORE_KEYS:
+            # Scores follow the pair lists, so the search runs from the end
+            pos = text.rfind(key)
+            match = _FIELD_VALUE.match(text, pos + len(key)) if pos != -1 else None
+            if match is not None:
+                fields[field] = match.group(1)
+        file_id = fields.get('file_id')
+        if file_id is None or file_id == 'null':
+            return False
+        if file_id in self.file_ids:
+            self.duplicates += 1
+            return False
+        self.file_ids.add(file_id)
+        for metric in SCORE_METRICS:
+            value = fields.get(metric)
+            self.columns[metric].append(math.nan if value is None or value == 'null' else float(value))
+        return True
+
+    def __len__(self) -> int:
+        return len(self.file_ids)
+
+
+class FactColumns:
+    """Columnar store of the is_factual labels (-1/0/1) of one model's verdicts; error labels are only counted."""
+
+    def __init__(self):
+        self.labels = array('b')
+        self.errors = 0
+
+    def add_document(self, text: str):
+        match = _IS_FACTUAL.search(text)
+        if match is None or match.group(1) not in ('-1', '0', '1'):
+            self.errors += 1
+        else:
+            self.labels.append(int(match.group(1)))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+def scan_score_results(paths: List[str]) -> ScoreColumns:
+    """Single pass over judge_score.py outputs: {file_id}.json files, results*.jsonl or merged JSONL."""
+    columns = ScoreColumns()
+    for path in _result_files(paths, '*.json*'):
+        for text in _documents(path):
+            columns.add_document(text)
+    return columns
+
+
+def scan_fact_results(paths: List[str]) -> FactColumns:
+    """Single pass over judge_fact.py outputs (.judge.jsonl files or directories holding them)."""
+    columns = FactColumns()
+    for path in _result_files(paths, '*.judge.jsonl'):
+        for text in _documents(path):
+            if '"url"' in text:
+                columns.add_document(text)
+    return columns
+
+
+def _finite(values: array) -> List[float]:
+    return [v for v in values if not math.isnan(v)]
+
+
+def bootstrap_ci(values, resamples: int = 1000, confidence: float = 0.95, seed: int = 0) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Percentile bootstrap confidence interval of the mean.
+    Args:
+        values: sample (NaN entries are ignored)
+        resamples: number of bootstrap resamples (0 disables the interval)
+    Returns:
+        (low, high), or (None, None) for fewer than two values
+    """
+    alpha = (1 - confidence) / 2
+    if np is not None:
+        data = np.asarray(values, dtype=float)
+        data = data[~np.isnan(data)]
+        n = len(data)
+        if n < 2 or resamples <= 0:
+            return None, None
+        rng = np.random.default_rng(seed)
+        distinct, counts = np.unique(data, return_counts=True)
+        if len(distinct) <= MULTINOMIAL_MAX_VALUES:
+            # Judge scores take a handful of values: a resample mean only depends on how often each
+            # value is drawn, so drawing multinomial counts costs O(values) instead of O(n)
+            means = rng.multinomial(n, counts / n, size=resamples) @ distinct / n
+        else:
+            means = np.empty(resamples)
+            # Resample in chunks so the index matrix stays around 8M entries
+            chunk = max(1, (1 << 23) // n)
+            for start in range(0, resamples, chunk):
+                size = min(chunk, resamples - start)
+                means[start:start + size] = data[rng.integers(0, n, size=(size, n))].mean(axis=1)
+        low, high = np.quantile(means, [alpha, 1 - alpha])
+        return float(low), float(high)
+    data = _finite(values)
+    n = len(data)
+    if n < 2 or resamples <= 0:
+        return None, None
+    rng = random.Random(seed)
+    means = sorted(sum(rng.choices(data, k=n)) / n for _ in range(resamples))
+    return means[int(alpha * (resamples - 1))], means[int(math.ceil((1 - alpha) * (resamples - 1)))]
+
+
+def _mean(values) -> Tuple[Optional[float], int]:
+    if np is not None:
+        data = np.asarray(values, dtype=float)
+        data = data[~np.isnan(data)]
+        return (float(data.mean()) if len(data) else None), len(data)
+    data = _finite(values)
+    return (sum(data) / len(data) if data else None), len(data)
+
+
+def summarize_model(model: str, scores: Optional[ScoreColumns], facts: Optional[FactColumns], resamples: int = 1000, confidence: float = 0.95, seed: int = 0) -> Dict[str, Any]:
+    """
+    One leaderboard row: per-metric mean and bootstrap CI over reports, and the is_factual
+    distribution with the citation accuracy (share of fully supported claims) and its CI.
+    """
+    row: Dict[str, Any] = {'model': model}
+    if scores is not None:
+        row['reports'] = len(scores)
+        for metric in SCORE_METRICS:
+            mean, _ = _mean(scores.columns[metric])
+            low, high = bootstrap_ci(scores.columns[metric], resamples, confidence, seed)
+            row[metric] = _round(mean)
+            row[f'{metric}_ci_low'] = _round(low)
+            row[f'{metric}_ci_high'] = _round(high)
+    if facts is not None:
+        n = len(facts)
+        counts = {label: 0 for label in (1, 0, -1)}
+        for label in facts.labels:
+            counts[label] += 1
+        row['claims'] = n
+        row['fact_errors'] = facts.errors
+        row['supported'] = _round(counts[1] / n if n else None)
+        row['partially_supported'] = _round(counts[0] / n if n else None)
+        row['unsupported'] = _round(counts[-1] / n if n else None)
+        supported = array('d', (1.0 if label == 1 else 0.0 for label in facts.labels))
+        low, high = bootstrap_ci(supported, resamples, confidence, seed)
+        row['citation_accuracy'] = row['supported']
+        row['citation_accuracy_ci_low'] = _round(low)
+        row['citation_accuracy_ci_high'] = _round(high)
+    return row
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 4)
+
+
+def build_leaderboard(score_inputs: Dict[str, List[str]], fact_inputs: Dict[str, List[str]], resamples: int = 1000, confidence: float = 0.95, seed: int = 0) -> List[Dict[str, Any]]:
+    """Rows of every model with score and/or fact inputs, best overall_score first."""
+    rows = []
+    for model in dict.fromkeys([*score_inputs, *fact_inputs]):
+        scores = scan_score_results(score_inputs[model]) if model in score_inputs else None
+        facts = scan_fact_results(fact_inputs[model]) if model in fact_inputs else None
+        rows.append(summarize_model(model, scores, facts, resamples, confidence, seed))
+    rows.sort(key=lambda row: -(row.get('overall_score') or 0))
+    return rows
+
+
+def write_csv(rows: List[Dict[str, Any]], path: str):
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_parquet(rows: List[Dict[str, Any]], path: str):
+    """Write the leaderboard as Parquet; requires pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.table({column: [row.get(column) for row in rows] for column in columns})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pq.write_table(table, path)
+
+
+def _model_paths(specs: List[str]) -> Dict[str, List[str]]:
+    """MODEL=PATH arguments (PATH alone uses its base name as the model) grouped by model."""
+    grouped: Dict[str, List[str]] = {}
+    for spec in specs or []:
+        model, sep, path = spec.partition('=')
+        if not sep:
+            path = spec
+            model = os.path.splitext(os.path.basename(os.path.normpath(spec)))[0]
+        grouped.setdefault(model, []).append(path)
+    return grouped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate judge_score.py / judge_fact.py outputs into a per-model leaderboard with bootstrap confidence intervals.")
+    parser.add_argument('--scores', nargs='+', default=[], help='MODEL=PATH of judge_score.py outputs (directory, results JSONL or merged JSONL); repeat a model to add paths')
+    parser.add_argument('--facts', nargs='+', default=[], help='MODEL=PATH of judge_fact.py outputs (.judge.jsonl file or directory)')
+    parser.add_argument('--output', type=str, default='./exp/leaderboard.csv', help='Leaderboard CSV to write')
+    parser.add_argument('--parquet', type=str, default=None, help='Also write the leaderboard as Parquet (requires pyarrow)')
+    parser.add_argument('--bootstrap', type=int, default=1000, help='Bootstrap resamples per metric (0 disables confidence intervals)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the intervals')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the bootstrap resampling')
+    args = parser.parse_args()
+    if not args.scores and not args.facts:
+        parser.error('at least one of --scores / --facts is required')
+    if args.parquet and importlib.util.find_spec('pyarrow') is None:
+        parser.error('--parquet requires pyarrow (pip install pyarrow)')
+
+    rows = build_leaderboard(_model_paths(args.scores), _model_paths(args.facts), args.bootstrap, args.confidence, args.seed)
+    write_csv(rows, args.output)
+    print(f"Saved leaderboard: {args.output}")
+    if args.parquet:
+        write_parquet(rows, args.parquet)
+        print(f"Saved leaderboard: {args.parquet}")
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Rough prompt token estimate of a chat request: about 4 characters per token plus per-message overhead."""
+    total = 3
+    for message in messages:
+        content = message.get('content') or ''
+        if not isinstance(content, str):
+            content = str(content)
+        total += 4 + (len(content) + 3) // 4
+    return total
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After (or retry-after-ms) header of an API error, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # HTTP-date form; rare enough to import the parser only here
+        import email.utils
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+class RateLimiter:
+    """
+    Process-wide client-side scheduler for the shared OpenAI client.
+
+    Two token buckets enforce requests-per-minute and tokens-per-minute budgets; each refills
+    continuously at limit/60 per second up to one minute's worth. acquire() blocks until a request
+    with the estimated prompt tokens fits in both budgets, and pause() stops all dispatch until a
+    server-provided Retry-After has elapsed. Either limit may be None (unlimited).
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._requests = float(rpm) if rpm else 0.0
+        self._tokens = float(tpm) if tpm else 0.0
+        self._updated = now
+        self._paused_until = 0.0
+        self._window = deque()  # [time, tokens] of requests dispatched in the last minute
+        self.total_wait = 0.0
+        self.throttled = 0
+        self.rate_limited = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    def _prune(self, now: float):
+        while self._window and now - self._window[0][0] > 60:
+            self._window.popleft()
+
+    def acquire(self, tokens: int = 0) -> List[float]:
+        """
+        Block until one request with the given prompt tokens may be sent.
+        Returns the request's [time, tokens] entry of the one-minute window, to pass to record_usage.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                # A request larger than the whole budget is let through once the bucket is full
+                need_tokens = min(tokens, self.tpm) if self.tpm else 0
+                wait = max(0.0, self._paused_until - now)
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < need_tokens:
+                    wait = max(wait, (need_tokens - self._tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    self._prune(now)
+                    entry = [now, tokens]
+                    self._window.append(entry)
+                    if waited > 0:
+                        self.throttled += 1
+                        self.total_wait += waited
+                    return entry
+            time.sleep(wait)
+            waited += wait
+
+    def record_usage(self, extra_tokens: int, entry: Optional[List[float]] = None):
+        """
+        Charge tokens not known at dispatch time (completion tokens, estimate error) to the TPM budget.
+        entry is the value acquire() returned for the request, whose window entry is corrected.
+        """
+        if not self.tpm or not extra_tokens:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= extra_tokens
+            if entry is not None:
+                entry[1] += extra_tokens
+
+    def pause(self, seconds: float):
+        """Stop all dispatch for the given number of seconds (e.g. from a 429 Retry-After header)."""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def utilization(self) -> Dict[str, Any]:
+        """Current usage over the last minute relative to the configured budgets."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            requests = len(self._window)
+            tokens = sum(used for _, used in self._window)
+            return {
+                'requests_last_minute': requests,
+                'tokens_last_minute': tokens,
+                'rpm_limit': self.rpm,
+                'tpm_limit': self.tpm,
+                'rpm_utilization': round(requests / self.rpm, 4) if self.rpm else None,
+                'tpm_utilization': round(tokens / self.tpm, 4) if self.tpm else None,
+                'paused_for': round(max(0.0, self._paused_until - now), 3),
+                'throttled_requests': self.throttled,
+                'rate_limited_responses': self.rate_limited,
+                'total_wait_seconds': round(self.total_wait, 3),
+            }
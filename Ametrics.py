@@ -0,0 +1,129 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# USD per 1M tokens: (input, cached input, output); model names are matched by longest prefix
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+# Tags (stage, file_id, url, ...) attached to every record made in the current context
+_tags: contextvars.ContextVar = contextvars.ContextVar("metrics_tags", default={})
+
+
+@contextlib.contextmanager
+def metrics_tags(**tags):
+    """Attach tags to the metrics recorded inside the block (nested blocks add to the outer tags)."""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags() -> Dict[str, Any]:
+    return _tags.get()
+
+
+def submit_in_context(executor, fn, /, *args, **kwargs):
+    """executor.submit that carries the caller's metrics tags into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost of one call from MODEL_PRICES, or None for an unknown model."""
+    if not model:
+        return None
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class MetricsRecorder:
+    """
+    Per-call accounting of LLM requests and page scrapes.
+
+    record() tags each call with its stage (fact_check, quality, repeatability_pair, scrape, ...)
+    and the current metrics_tags (e.g. file_id), keeps running per-stage totals for summary(), and
+    appends the record to a JSONL file when path is set.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, List[float]] = {}
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, **fields):
+        tags = current_tags()
+        record = {"ts": round(time.time(), 3), **tags, **fields}
+        stage = record.setdefault("stage", "llm")
+        record["latency_s"] = round(record.get("latency_s", 0.0), 4)
+        with self._lock:
+            totals = self._stages.setdefault(stage, {
+                "calls": 0, "cache_hits": 0, "errors": 0, "retries": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+                "bytes": 0, "cost_usd": 0.0, "latency_s": 0.0,
+            })
+            totals["calls"] += 1
+            totals["cache_hits"] += int(bool(record.get("cache_hit")))
+            totals["errors"] += int(record.get("error") is not None)
+            for key in ("retries", "prompt_tokens", "completion_tokens", "cached_tokens", "bytes"):
+                totals[key] += record.get(key) or 0
+            totals["cost_usd"] += record.get("cost_usd") or 0.0
+            totals["latency_s"] += record.get("latency_s", 0.0)
+            self._latencies.setdefault(stage, []).append(record.get("latency_s", 0.0))
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage totals with latency percentiles, plus the totals over all stages."""
+        with self._lock:
+            stages = {}
+            for stage, totals in self._stages.items():
+                latencies = self._latencies[stage]
+                stages[stage] = {
+                    **totals,
+                    "cost_usd": round(totals["cost_usd"], 6),
+                    "latency_s": round(totals["latency_s"], 3),
+                    "latency_mean_s": round(totals["latency_s"] / totals["calls"], 3),
+                    "latency_p50_s": round(_percentile(latencies, 0.5), 3),
+                    "latency_p95_s": round(_percentile(latencies, 0.95), 3),
+                    "latency_max_s": round(max(latencies), 3),
+                }
+            total = {
+                key: sum(s[key] for s in stages.values())
+                for key in ("calls", "cache_hits", "errors", "retries", "prompt_tokens", "completion_tokens", "cached_tokens", "bytes")
+            }
+            total["cost_usd"] = round(sum(s["cost_usd"] for s in stages.values()), 6)
+            return {"stages": stages, "total": total}
+
+    def write_summary(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -114,6 +114,47 @@ Here is the sentence:
 {input}
 """
 
+FACT_CHECK_BATCH_SYS_PROMPT = """
+# Factual Evaluation
+Given a piece of web content and a numbered list of sentences from a report, please determine for each sentence whether the information it expresses can be directly found in or reasonably inferred from the provided web content.
+
+# Important Notes
+- Please do not rely on your external knowledge; make judgments solely based on the provided web content
+- Pay attention to key terms in each statement (such as time, location, people, quantities, etc.), ensuring these details have corresponding or derivable information in the web content
+- If a statement contains multiple information points, please evaluate each one to determine if they can all be supported by the web content
+- Judge every sentence independently of the other sentences in the list
+
+## Scoring Criteria
+- **Fully Supported**:
+  - The web content explicitly mentions information that is identical to or highly relevant to the statement, allowing direct verification of the statement as true
+  - Or, through reasonable inference from multiple information points in the web content, a conclusion consistent with the statement can be reached
+- **Partially Supported**:
+  - The web content contains some relevant information, but it is insufficient to fully confirm or deny the statement
+  - Or the information is ambiguous, making it impossible to make a clear judgment
+- **Not Supported**:
+  - The web content does not mention any information related to the statement
+  - Or the web content clearly contradicts the statement, allowing the statement to be determined as false
+
+
+Please return a JSON array with exactly one object per sentence, in the same order as the list:
+[
+    {
+        "id": <number of the sentence in the list>,
+        "is_factual": -1/0/1, # -1: not supported, 0: partially supported, 1: fully supported
+        "sentence_support": "Specific sentences from the web content that can support this fact"
+    },
+    ...
+]
+"""
+
+FACT_CHECK_BATCH_USER_PROMPT = """
+Here is the content of the website:
+{url_markdown}
+
+Here are the sentences:
+{inputs}
+"""
+
 REPEATABILITY_SYSTEM_PROMPT = """
 Given two paragraphs, please assess the degree of content repetition between them. 
 You should analyze from multiple perspectives and assign a reasonable score based on the scoring criteria.
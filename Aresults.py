@@ -0,0 +1,321 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+from Asections import SectionIndex
+
+COMPACT_FORMAT = 'compact-v1'
+# Fields of a legacy judge_score.py result that are copied unchanged into the compact format
+_RESULT_FIELDS = ('comprehensiveness_score', 'coherence_score', 'clarity_score', 'insight_score', 'overall_score', 'repeat_score', 'quality_reason')
+# file_id is the first field of both result formats
+_LEADING_FILE_ID = re.compile(r'\{"file_id":"([^"]*)"')
+# Present only when the corresponding judge_score.py option is enabled
+_OPTIONAL_FIELDS = ('prefiltered_pairs', 'repeat_interval')
+
+
+class JsonlReader:
+    """
+    Lazily iterate the records of a JSONL file.
+    Each iteration re-opens the file and parses one line at a time, so the whole input is never
+    held in memory; len() counts non-empty lines without parsing them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._length = None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def __len__(self) -> int:
+        if self._length is None:
+            with open(self.path, 'rb') as f:
+                self._length = sum(1 for line in f if line.strip())
+        return self._length
+
+
+def truncate_partial_line(path: str):
+    """Drop a trailing partial line (e.g. left by an interrupted run) so appends start on a fresh line."""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        # Walk back to the last complete line
+        pos = end
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                f.truncate(pos - step + newline + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def read_file_ids(path: str) -> Iterator[str]:
+    """file_id of every result line of a JSONL result file; only lines not starting with it are decoded."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = _LEADING_FILE_ID.match(line)
+            if match is not None:
+                yield match.group(1)
+            elif line.strip():
+                try:
+                    file_id = json.loads(line).get('file_id')
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                if file_id is not None:
+                    yield file_id
+
+
+class DirectoryResultSink:
+    """Write each result as its own pretty-printed {file_id}.json under output_dir."""
+
+    def __init__(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+
+    def write(self, result_entry: Dict[str, Any], file_id: str) -> str:
+        output_file = os.path.join(self.output_dir, f'{file_id}.json')
+        with open(output_file, 'w', encoding='utf-8') as file:
+            json.dump(result_entry, file, indent=4, ensure_ascii=False)
+        return output_file
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonlResultSink:
+    """
+    Append compact results (one JSON object per line) to results.jsonl under output_dir
+    (<prefix>.jsonl for another prefix, e.g. one per --shard worker sharing the directory).
+
+    Writes go through a buffered file; sync() flushes and fsyncs it and is meant to be called on
+    checkpoint boundaries, so a checkpoint never covers results that are not on disk. With
+    shard_max_bytes set, results go to results-00000.jsonl, results-00001.jsonl, ... and a new shard
+    is started once the current one reaches the limit.
+
+    Without resume, existing result files of the prefix are deleted. With resume, new results are
+    appended to the last file after dropping a trailing partial line left by an interrupted run, and
+    the file ids already written are collected in file_ids: results can reach the disk before the
+    checkpoint records them, so the caller marks these as processed, and write() skips them.
+    """
+
+    def __init__(self, output_dir: str, shard_max_bytes: Optional[int] = None, buffer_size: int = 1 << 20, prefix: str = 'results', resume: bool = True):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.shard_max_bytes = shard_max_bytes
+        self.buffer_size = buffer_size
+        self.shard_index = 0
+        self.file_ids = set()
+        shards = sorted(glob.glob(os.path.join(output_dir, f'{glob.escape(prefix)}-[0-9]*.jsonl')))
+        single = os.path.join(output_dir, f'{prefix}.jsonl')
+        existing = shards + ([single] if os.path.exists(single) else [])
+        for path in existing:
+            if not resume:
+                os.remove(path)
+                continue
+            truncate_partial_line(path)
+            self.file_ids.update(read_file_ids(path))
+        if resume and shard_max_bytes and shards:
+            self.shard_index = int(os.path.basename(shards[-1])[len(prefix) + 1:-len('.jsonl')])
+        self._open()
+
+    def shard_path(self, shard_index: int) -> str:
+        if not self.shard_max_bytes:
+            return os.path.join(self.output_dir, f'{self.prefix}.jsonl')
+        return os.path.join(self.output_dir, f'{self.prefix}-{shard_index:05d}.jsonl')
+
+    def _open(self):
+        self.path = self.shard_path(self.shard_index)
+        if os.path.exists(self.path):
+            truncate_partial_line(self.path)
+        self._file = open(self.path, 'ab', buffering=self.buffer_size)
+        self._size = self._file.tell()
+
+    def write(self, result_entry: Dict[str, Any], file_id: str) -> str:
+        if file_id in self.file_ids:
+            return self.path
+        self.file_ids.add(file_id)
+        if self.shard_max_bytes and self._size >= self.shard_max_bytes:
+            self.sync()
+            self._file.close()
+            self.shard_index += 1
+            self._open()
+        line = (json.dumps(result_entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        self._file.write(line)
+        self._size += len(line)
+        return self.path
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def _passage_hash(passage: str) -> str:
+    return hashlib.md5(passage.encode('utf-8')).hexdigest()
+
+
+def compact_result(result_entry: Dict[str, Any], report: str) -> Dict[str, Any]:
+    """
+    Convert a judge_score.py result to the compact format.
+
+    The legacy result holds the full text of both passages of every pair twice (compare_list and
+    repeat_results). The compact result stores each paired section once in a section table, as its
+    index in the report's SectionIndex, the character offsets of its title and body and the md5 of
+    the "title\nbody" passage, and pairs refer to the table by position:
+        "sections": [{"section": k, "offsets": [title_start, title_end, body_start, body_end], "md5": ...}]
+        "pairs": [[a, b, score, explanation, repetitions_found, confidence], ...]
+    Args:
+        result_entry: legacy result of assemble_result_entry
+        report: the judged report text, whose sections the passages were cut from
+    """
+    index = SectionIndex(report)
+    table: List[Dict[str, Any]] = []
+    positions: Dict[str, int] = {}
+    passages = {p: None for pair in result_entry['repeat_results'] for p in pair[:2]}
+    lengths = {len(p) for p in passages}
+    # Only sections of a matching length are rendered and compared
+    for k, section in enumerate(index.sections):
+        if index.length('with_title', k) not in lengths:
+            continue
+        passage = index.render('with_title', k)
+        if passage in passages and passage not in positions:
+            positions[passage] = len(table)
+            table.append({
+                'section': k,
+                'offsets': [section.title_start, section.title_end, section.body_start, section.body_end],
+                'md5': _passage_hash(passage),
+            })
+    missing = [p for p in passages if p not in positions]
+    if missing:
+        raise ValueError(f"{len(missing)} passage(s) of {result_entry['file_id']} are not sections of the report")
+    compact = {'file_id': result_entry['file_id'], 'topic': result_entry['topic'], 'format': COMPACT_FORMAT}
+    compact.update((field, result_entry[field]) for field in _RESULT_FIELDS)
+    compact.update((field, result_entry[field]) for field in _OPTIONAL_FIELDS if field in result_entry)
+    compact['sections'] = table
+    compact['pairs'] = [[positions[pair[0]], positions[pair[1]], *pair[2:]] for pair in result_entry['repeat_results']]
+    return compact
+
+
+def expand_result(compact: Dict[str, Any], report: str) -> Dict[str, Any]:
+    """
+    Convert a compact result back to the legacy judge_score.py format.
+    Passages are cut from the report at the stored offsets and checked against their md5, so a
+    report that changed since judging raises ValueError instead of producing wrong passages.
+    """
+    if compact.get('format') != COMPACT_FORMAT:
+        return compact
+    passages = []
+    for entry in compact['sections']:
+        title_start, title_end, body_start, body_end = entry['offsets']
+        title = SectionIndex.PREAMBLE_TITLE if title_start < 0 else report[title_start:title_end]
+        passage = title + "\n" + report[body_start:body_end]
+        if _passage_hash(passage) != entry['md5']:
+            raise ValueError(f"Section {entry['section']} of {compact['file_id']} does not match the report text")
+        passages.append(passage)
+    repeat_results = [[passages[pair[0]], passages[pair[1]], *pair[2:]] for pair in compact['pairs']]
+    result_entry = {
+        'file_id': compact['file_id'],
+        'topic': compact['topic'],
+        'compare_list': [pair[:3] for pair in repeat_results],
+        'repeat_results': repeat_results,
+    }
+    result_entry.update((field, compact[field]) for field in _RESULT_FIELDS)
+    result_entry.update((field, compact[field]) for field in _OPTIONAL_FIELDS if field in compact)
+    return result_entry
+
+
+def read_results(path: str) -> Iterator[Dict[str, Any]]:
+    """Results of a judge_score.py output: a directory of {file_id}.json / results*.jsonl files or one file."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, '*.json'))) + sorted(glob.glob(os.path.join(path, 'results*.jsonl')))
+    else:
+        files = [path]
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            if file.endswith('.json'):
+                yield json.load(f)
+                continue
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def report_offsets(reports_path: str) -> Dict[str, int]:
+    """Byte offset of each report line of a judge_score.py input, by file_id (md5 of the topic)."""
+    offsets = {}
+    with open(reports_path, 'rb') as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                topic = json.loads(line)['topic']
+                offsets.setdefault(hashlib.md5(topic.encode('utf-8')).hexdigest(), offset)
+    return offsets
+
+
+def expand_results(inputs: List[str], reports_path: str, output_dir: str, output_format: str = 'dir') -> int:
+    """
+    Expand compact results (legacy results are passed through) into a legacy output directory.
+    Reports are read from reports_path by seeking to the line of each file_id.
+    Returns:
+        number of results written
+    """
+    offsets = report_offsets(reports_path)
+    sink = JsonlResultSink(output_dir, resume=False) if output_format == 'jsonl' else DirectoryResultSink(output_dir)
+    written = 0
+    with open(reports_path, 'rb') as freports:
+        for path in inputs:
+            for compact in read_results(path):
+                if compact.get('format') == COMPACT_FORMAT:
+                    if compact['file_id'] not in offsets:
+                        raise ValueError(f"Report of {compact['file_id']} not found in {reports_path}")
+                    freports.seek(offsets[compact['file_id']])
+                    report = json.loads(freports.readline())['report']
+                    result_entry = expand_result(compact, report)
+                else:
+                    result_entry = compact
+                sink.write(result_entry, result_entry['file_id'])
+                written += 1
+    sink.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand compact judge_score.py results (--result_format compact) back to the legacy format.")
+    parser.add_argument('--inputs', nargs='+', required=True, help='Compact output directories or result files')
+    parser.add_argument('--reports', type=str, required=True, help='The judge_score.py input JSONL the results were computed from')
+    parser.add_argument('--outputpath', type=str, required=True, help='Output directory for the legacy results')
+    parser.add_argument('--output_format', choices=['dir', 'jsonl'], default='dir', help='dir: one pretty-printed {file_id}.json per report; jsonl: results.jsonl')
+    args = parser.parse_args()
+    written = expand_results(args.inputs, args.reports, args.outputpath, args.output_format)
+    print(f"Expanded {written} results into {args.outputpath}")
+
+
+if __name__ == '__main__':
+    main()
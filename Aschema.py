@@ -0,0 +1,274 @@
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SchemaError(ValueError):
+    """Raised when a judge response misses a required field that cannot be repaired locally."""
+
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # Structured outputs in strict mode require every property and no extra ones
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_SCORE_0_4 = {"type": "integer", "enum": [0, 1, 2, 3, 4]}
+
+QUALITY_SCHEMA = _strict_object({
+    "Reason": {"type": "string"},
+    "Comprehensiveness_Score": _SCORE_0_4,
+    "Coherence_Score": _SCORE_0_4,
+    "Clarity_Score": _SCORE_0_4,
+    "Insightfulness_Score": _SCORE_0_4,
+    "Overall_Score": _SCORE_0_4,
+})
+
+_FACT_LABEL = {
+    "is_factual": {"type": "integer", "enum": [-1, 0, 1]},
+    "sentence_support": {"type": "string"},
+}
+
+FACT_CHECK_SCHEMA = _strict_object(dict(_FACT_LABEL))
+
+# The root of a structured output must be an object, so the per-claim array is wrapped in "results"
+FACT_CHECK_BATCH_SCHEMA = _strict_object({
+    "results": {
+        "type": "array",
+        "items": _strict_object({"id": {"type": "integer"}, **_FACT_LABEL}),
+    },
+})
+
+REPEATABILITY_PAIR_SCHEMA = _strict_object({
+    "score": _SCORE_0_4,
+    "explanation": {"type": "string"},
+    "repetitions_found": {"type": "array", "items": {"type": "string"}},
+    "confidence": {"type": "string"},
+})
+
+JUDGE_SCHEMAS = {
+    "quality": QUALITY_SCHEMA,
+    "fact_check": FACT_CHECK_SCHEMA,
+    "fact_check_batch": FACT_CHECK_BATCH_SCHEMA,
+    "repeatability_pair": REPEATABILITY_PAIR_SCHEMA,
+}
+
+
+def response_format(judge: str) -> Dict[str, Any]:
+    """OpenAI response_format parameter enforcing the JSON schema of a judge."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": f"{judge}_result", "strict": True, "schema": JUDGE_SCHEMAS[judge]},
+    }
+
+
+# Field coercers: return the repaired value or raise ValueError/TypeError if it cannot be repaired
+
+def _number(value: Any):
+    if isinstance(value, bool):
+        raise TypeError("boolean is not a score")
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        match = re.search(r"-?\d+(?:\.\d+)?", str(value))
+        if match is None:
+            raise ValueError(f"no number in {value!r}")
+        number = float(match.group())
+    return int(number) if float(number).is_integer() else float(number)
+
+def _score_0_4(value: Any):
+    score = _number(value)
+    if not 0 <= score <= 4:
+        raise ValueError(f"score {score} outside 0-4")
+    return score
+
+def _is_factual(value: Any):
+    label = _number(value)
+    if label not in (-1, 0, 1):
+        raise ValueError(f"is_factual {label} not in -1/0/1")
+    return int(label)
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return str(value)
+
+def _string_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+def _confidence(value: Any):
+    return value if isinstance(value, (str, int, float)) and not isinstance(value, bool) else None
+
+# judge -> field -> (coercer, default used when the field is missing, or None if the field is required)
+_FIELDS: Dict[str, Dict[str, Tuple[Callable[[Any], Any], Optional[Callable[[], Any]]]]] = {
+    "quality": {
+        "Reason": (_text, str),
+        "Comprehensiveness_Score": (_score_0_4, None),
+        "Coherence_Score": (_score_0_4, None),
+        "Clarity_Score": (_score_0_4, None),
+        "Insightfulness_Score": (_score_0_4, None),
+        "Overall_Score": (_score_0_4, None),
+    },
+    "fact_check": {
+        "is_factual": (_is_factual, None),
+        "sentence_support": (_text, str),
+    },
+    "repeatability_pair": {
+        "score": (_score_0_4, None),
+        "explanation": (_text, str),
+        "repetitions_found": (_string_list, list),
+        "confidence": (_confidence, lambda: None),
+    },
+}
+
+
+def validate_result(judge: str, result: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Check a parsed judge response against the result shape of the judge and repair broken fields in place.
+    Args:
+        judge: 'quality', 'fact_check' or 'repeatability_pair'
+        result: the parsed JSON response
+    Returns:
+        (result, repaired_fields)
+    Raises:
+        SchemaError: the response is not an object or a required field is missing or unusable
+    """
+    if isinstance(result, list) and result and isinstance(result[-1], dict):
+        result = result[-1]
+    if isinstance(result, dict) and "result" in result and isinstance(result["result"], dict):
+        result = result["result"]
+    if not isinstance(result, dict):
+        raise SchemaError(f"{judge} response is not a JSON object: {type(result).__name__}")
+    repaired = []
+    for field, (coerce, default) in _FIELDS[judge].items():
+        if field not in result:
+            if default is None:
+                raise SchemaError(f"{judge} response misses required field {field!r}")
+            result[field] = default()
+            repaired.append(field)
+            continue
+        try:
+            value = coerce(result[field])
+        except (TypeError, ValueError) as e:
+            if default is None:
+                raise SchemaError(f"{judge} response has invalid {field!r}: {e}") from e
+            value = default()
+        if value != result[field] or type(value) is not type(result[field]):
+            result[field] = value
+            repaired.append(field)
+    return result, repaired
+
+
+class JudgeStats:
+    """Thread-safe per-judge counters of calls, repaired and failed parses, and retries."""
+
+    EVENTS = ("calls", "valid", "repaired", "parse_failures", "retries")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, judge: str, event: str, count: int = 1):
+        with self._lock:
+            counts = self._counts.setdefault(judge, dict.fromkeys(self.EVENTS, 0))
+            counts[event] += count
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Counters plus parse-failure, repair and retry rates per judge."""
+        with self._lock:
+            report = {}
+            for judge, counts in self._counts.items():
+                calls = counts["calls"]
+                report[judge] = dict(counts)
+                report[judge]["parse_failure_rate"] = round(counts["parse_failures"] / calls, 4) if calls else 0.0
+                report[judge]["repair_rate"] = round(counts["repaired"] / calls, 4) if calls else 0.0
+                report[judge]["retry_rate"] = round(counts["retries"] / calls, 4) if calls else 0.0
+            return report
+
+
+# Word confidences some judges return instead of a percentage
+_CONFIDENCE_WORDS = {"very high": 0.95, "high": 0.9, "medium": 0.6, "moderate": 0.6, "low": 0.3, "very low": 0.1}
+
+def confidence_value(value: Any) -> Optional[float]:
+    """Repeatability confidence as a fraction in [0, 1] ("85%", 85, 0.85 or "high"), or None if unreadable."""
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _CONFIDENCE_WORDS:
+            return _CONFIDENCE_WORDS[text]
+        percent = text.endswith('%')
+        try:
+            value = float(text.rstrip('%').strip())
+        except ValueError:
+            return None
+        if percent:
+            value /= 100
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None
+    value = float(value)
+    if value > 1:
+        value /= 100
+    return value if 0 <= value <= 1 else None
+
+
+class JudgeCascade:
+    """
+    Two-model judge cascade: fast_model answers every request first and the request is sent again
+    to strong_model only when the fast verdict is uncertain. Counts fast answers and escalations per
+    judge and reason, so thresholds can be tuned against cost and throughput.
+    """
+
+    REASONS = ("parse_failure", "partial", "low_confidence")
+
+    def __init__(self, fast_model: str, strong_model: str = "gpt-4o", min_confidence: float = 0.8, escalate_partial: bool = True):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.min_confidence = min_confidence
+        self.escalate_partial = escalate_partial
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def escalation_reason(self, judge: str, result: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Why a fast verdict should be re-asked of the strong model.
+        Args:
+            judge: judge name (fact_check, quality, repeatability_pair)
+            result: the parsed fast verdict, None if it could not be parsed
+        Returns:
+            one of REASONS, or None to keep the fast verdict
+        """
+        if not isinstance(result, dict) or "error" in result:
+            return "parse_failure"
+        if judge == "fact_check" and self.escalate_partial and result.get("is_factual") == 0:
+            return "partial"
+        if judge == "repeatability_pair":
+            confidence = confidence_value(result.get("confidence"))
+            if confidence is None or confidence < self.min_confidence:
+                return "low_confidence"
+        return None
+
+    def record(self, judge: str, reason: Optional[str] = None, count: int = 1):
+        with self._lock:
+            counts = self._counts.setdefault(judge, dict.fromkeys(("calls", "escalated") + self.REASONS, 0))
+            counts["calls"] += count
+            if reason is not None:
+                counts["escalated"] += count
+                counts[reason] += count
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Fast verdicts, escalations per reason and the escalation rate per judge."""
+        with self._lock:
+            report = {}
+            for judge, counts in self._counts.items():
+                report[judge] = dict(counts)
+                report[judge]["escalation_rate"] = round(counts["escalated"] / counts["calls"], 4) if counts["calls"] else 0.0
+            return report
@@ -0,0 +1,173 @@
+import re
+from collections.abc import Sequence
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+# ATX heading line (1-6 '#' followed by a space), matched at a line start
+_ATX_HEADING = re.compile(r'(#{1,6}) [^\n]*')
+
+
+class SectionSpan(NamedTuple):
+    """Offsets of one section into the indexed text; the preamble has level 0 and title offsets -1."""
+    level: int
+    title_start: int
+    title_end: int
+    body_start: int
+    body_end: int
+
+
+class SectionIndex:
+    """
+    Single-pass index of the markdown headings and sections of a report.
+
+    The text is scanned once for ATX headings; a section runs from the end of a heading line of the
+    split level to the next heading of that level, with surrounding whitespace excluded from its body
+    span. Only offsets are stored, the strings are cut from the original text when a view is read,
+    so quality scoring, repeatability pairing and citation extraction can share one index.
+
+    Sections follow the historical extract_first_level_headings split: text before the first
+    heading becomes a "Beginning of the report" section, and a last heading that ends the text has
+    no section. A report without headings is a single preamble section.
+
+    Usage:
+        index = SectionIndex(report)
+        index.headings       # heading lines of the split level
+        index.titles         # heading line of each section
+        index.bodies         # stripped body of each section
+        index.with_titles    # "title\\nbody" of each section
+    """
+
+    PREAMBLE_TITLE = "Beginning of the report"
+
+    def __init__(self, text: str, level: int = 2):
+        self.text = text
+        self.level = level
+        # (level, start, end) of every heading line, in document order
+        self.heading_spans: List[Tuple[int, int, int]] = []
+        # Jump between lines starting with '#' instead of testing every line start
+        line_start = 0 if text.startswith('#') else text.find('\n#') + 1 or -1
+        while line_start != -1:
+            match = _ATX_HEADING.match(text, line_start)
+            if match is not None:
+                self.heading_spans.append((len(match.group(1)), line_start, match.end()))
+            line_start = text.find('\n#', line_start) + 1 or -1
+        self._splits = [(start, end) for heading_level, start, end in self.heading_spans if heading_level == level]
+        self.sections: List[SectionSpan] = []
+        first_heading = self._splits[0][0] if self._splits else len(text)
+        if first_heading > 0:
+            self.sections.append(SectionSpan(0, -1, -1, *self._strip(0, first_heading)))
+        for k, (start, end) in enumerate(self._splits):
+            if k + 1 < len(self._splits):
+                body_end = self._splits[k + 1][0]
+            elif end < len(text):
+                body_end = len(text)
+            else:
+                break
+            self.sections.append(SectionSpan(level, start, end, *self._strip(end, body_end)))
+        # "title\nbody" strings are the only ones that are not plain slices; build each once
+        self._joined: Dict[int, str] = {}
+
+    def _strip(self, start: int, end: int) -> Tuple[int, int]:
+        text = self.text
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    @property
+    def headings(self) -> 'SectionView':
+        return SectionView(self, 'heading', range(len(self._splits)))
+
+    @property
+    def titles(self) -> 'SectionView':
+        return SectionView(self, 'title', range(len(self.sections)))
+
+    @property
+    def bodies(self) -> 'SectionView':
+        return SectionView(self, 'body', range(len(self.sections)))
+
+    @property
+    def with_titles(self) -> 'SectionView':
+        return SectionView(self, 'with_title', range(len(self.sections)))
+
+    def render(self, kind: str, k: int) -> str:
+        """String of kind 'heading', 'title', 'body' or 'with_title' for heading/section k."""
+        if kind == 'heading':
+            start, end = self._splits[k]
+            return self.text[start:end]
+        if kind == 'with_title':
+            joined = self._joined.get(k)
+            if joined is None:
+                joined = self._joined[k] = self.render('title', k) + "\n" + self.render('body', k)
+            return joined
+        section = self.sections[k]
+        if kind == 'title':
+            return self.PREAMBLE_TITLE if section.title_start < 0 else self.text[section.title_start:section.title_end]
+        return self.text[section.body_start:section.body_end]
+
+    def length(self, kind: str, k: int) -> int:
+        """len(render(kind, k)) computed from the offsets."""
+        if kind == 'heading':
+            start, end = self._splits[k]
+            return end - start
+        section = self.sections[k]
+        title = len(self.PREAMBLE_TITLE) if section.title_start < 0 else section.title_end - section.title_start
+        body = section.body_end - section.body_start
+        return {'title': title, 'body': body, 'with_title': title + 1 + body}[kind]
+
+    def contains(self, kind: str, k: int, needle: str) -> bool:
+        """needle in render(kind, k), searched in place in the original text."""
+        if kind == 'heading':
+            start, end = self._splits[k]
+            return self.text.find(needle, start, end) != -1
+        if kind == 'with_title' and "\n" in needle:
+            return needle in self.render(kind, k)
+        section = self.sections[k]
+        if kind in ('title', 'with_title'):
+            if section.title_start < 0:
+                if needle in self.PREAMBLE_TITLE:
+                    return True
+            elif self.text.find(needle, section.title_start, section.title_end) != -1:
+                return True
+            if kind == 'title':
+                return False
+        return self.text.find(needle, section.body_start, section.body_end) != -1
+
+
+class SectionView(Sequence):
+    """
+    Read-only sequence of heading or section strings of a SectionIndex.
+    Items are cut from the indexed text on access; slicing and select() return views over the
+    same index without copying any text.
+    """
+
+    def __init__(self, index: SectionIndex, kind: str, ids: Union[range, Tuple[int, ...]]):
+        self.index = index
+        self.kind = kind
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SectionView(self.index, self.kind, self.ids[i])
+        return self.index.render(self.kind, self.ids[i])
+
+    def text_length(self, i: int) -> int:
+        """len(self[i]) without building the string."""
+        return self.index.length(self.kind, self.ids[i])
+
+    def contains(self, i: int, needle: str) -> bool:
+        """needle in self[i] without building the string."""
+        return self.index.contains(self.kind, self.ids[i], needle)
+
+    def select(self, positions) -> 'SectionView':
+        """View of the items at the given positions of this view."""
+        return SectionView(self.index, self.kind, tuple(self.ids[p] for p in positions))
+
+    def __repr__(self) -> str:
+        return f"SectionView({self.kind!r}, {len(self)} items)"
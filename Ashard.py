@@ -0,0 +1,290 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+
+# Tag inserted into every per-shard file name, e.g. checkpoint.shard-0-of-4.jsonl
+_SHARD_TAG = re.compile(r'shard-(\d+)-of-(\d+)')
+# Multi-part extensions the tag goes in front of, so shard outputs still match *.judge.jsonl
+_COMPOUND_EXTENSIONS = ('.judge.jsonl', '.out.jsonl')
+
+
+def shard_of(key: str, count: int) -> int:
+    """Shard of a key: md5 of the key modulo count, identical on every process and machine."""
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16) % count
+
+
+class Shard(NamedTuple):
+    """
+    Partition i of N of an input. Reports are assigned by their md5 file_id and fact-check lines
+    by their normalized URL, so every worker given the same input and N picks a disjoint part
+    without any coordination. Keys that cannot be derived (malformed lines) belong to shard 0, so
+    they are reported exactly once.
+    """
+    index: int
+    count: int
+
+    @property
+    def tag(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+    def owns(self, key: Optional[str]) -> bool:
+        if key is None:
+            return self.index == 0
+        return shard_of(key, self.count) == self.index
+
+    def path(self, path: Optional[str]) -> Optional[str]:
+        """Per-shard variant of a file path: the tag is inserted before the extension (.judge.jsonl counts as one)."""
+        if not path:
+            return path
+        ext = next((e for e in _COMPOUND_EXTENSIONS if path.endswith(e)), None)
+        root, ext = (path[:-len(ext)], ext) if ext else os.path.splitext(path)
+        return f"{root}.{self.tag}{ext}"
+
+
+def parse_shard(spec: str) -> Shard:
+    """argparse type for --shard: "i/N" with 0 <= i < N."""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', spec)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {spec!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or index >= count:
+        raise argparse.ArgumentTypeError(f"shard index must satisfy 0 <= i < N, got {spec!r}")
+    return Shard(index, count)
+
+
+def shard_path(path: Optional[str], shard: Optional[Shard]) -> Optional[str]:
+    """path unchanged without sharding, otherwise its per-shard variant."""
+    return path if shard is None else shard.path(path)
+
+
+class ShardFilter:
+    """
+    Lazily iterate the records of an iterable that belong to one shard.
+    key maps a record to its shard key; len() counts the owned records with one pass over the
+    input, so a lazy reader (e.g. JsonlReader) stays lazy.
+    """
+
+    def __init__(self, records: Iterable[Any], shard: Shard, key: Callable[[Any], Optional[str]]):
+        self.records = records
+        self.shard = shard
+        self.key = key
+        self._length = None
+
+    def __iter__(self) -> Iterator[Any]:
+        for record in self.records:
+            if self.shard.owns(self.key(record)):
+                yield record
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = sum(1 for _ in self)
+        return self._length
+
+
+def _input_files(paths: List[str], pattern: str) -> List[str]:
+    """Expand directories into their files matching pattern; plain files are kept as given."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return files
+
+
+def _iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of a result file: a pretty-printed .json object or compact JSONL lines."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            yield json.load(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line of a worker that was killed mid-write
+                continue
+
+
+def infer_shard_count(paths: List[str]) -> Optional[int]:
+    """N of the shard-i-of-N tags in the given file names, if they agree."""
+    counts = {int(m.group(2)) for m in (_SHARD_TAG.search(os.path.basename(p)) for p in paths) if m}
+    return counts.pop() if len(counts) == 1 else None
+
+
+def missing_shard_files(paths: List[str], count: int) -> List[int]:
+    """Shard indices of 0..count-1 without any tagged file among paths."""
+    seen = {int(m.group(1)) for m in (_SHARD_TAG.search(os.path.basename(p)) for p in paths) if m}
+    return [i for i in range(count) if i not in seen] if seen else []
+
+
+def _completeness(summary: Dict[str, Any], expected: Optional[Set[str]], present: Set[str], shard_count: Optional[int], output_path: str,
+                  describe: Callable[[str], Any], shard_key: Callable[[str], str] = lambda key: key):
+    """Add missing/unexpected counts to summary and write the missing keys next to the output."""
+    if expected is None:
+        return
+    missing = [key for key in expected if key not in present]
+    summary['expected'] = len(expected)
+    summary['missing'] = len(missing)
+    summary['unexpected'] = sum(1 for key in present if key not in expected)
+    if shard_count:
+        by_shard: Dict[int, int] = {}
+        for key in missing:
+            shard = shard_of(shard_key(key), shard_count)
+            by_shard[shard] = by_shard.get(shard, 0) + 1
+        summary['missing_by_shard'] = dict(sorted(by_shard.items()))
+    if missing:
+        missing_path = os.path.splitext(output_path)[0] + '.missing.jsonl'
+        with open(missing_path, 'w', encoding='utf-8') as f:
+            for key in sorted(missing):
+                f.write(json.dumps(describe(key), ensure_ascii=False) + '\n')
+        summary['missing_path'] = missing_path
+
+
+def merge_score_results(inputs: List[str], output_path: str, reports_path: Optional[str] = None, shard_count: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Merge the judge_score.py outputs of several shards into one JSONL of unique results.
+    Args:
+        inputs: output directories ({file_id}.json and/or results*.jsonl) or result files
+        output_path: merged JSONL, one compact result per file_id (first occurrence wins)
+        reports_path: optional judge_score.py input; every report it would judge (i.e. not skipped
+            for too few paragraphs or no headings) is expected in the merged results
+        shard_count: N of the run, to break missing reports down by shard (inferred from file names if not given)
+    Returns:
+        summary counts; missing file ids are written to <output>.missing.jsonl
+    """
+    files = [
+        path for path in _input_files(inputs, '*.json*')
+        if path.endswith(('.json', '.jsonl')) and not path.endswith('.missing.jsonl')
+        and os.path.abspath(path) != os.path.abspath(output_path)
+    ]
+    shard_count = shard_count or infer_shard_count(files)
+    present: Set[str] = set()
+    summary: Dict[str, Any] = {'files': len(files), 'records': 0, 'duplicates': 0}
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as fout:
+        for path in files:
+            for record in _iter_records(path):
+                file_id = record.get('file_id') if isinstance(record, dict) else None
+                if file_id is None:
+                    continue
+                if file_id in present:
+                    summary['duplicates'] += 1
+                    continue
+                present.add(file_id)
+                fout.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+                summary['records'] += 1
+    if shard_count:
+        summary['missing_shard_files'] = missing_shard_files(files, shard_count)
+
+    expected = None
+    if reports_path:
+        # The skip rules live in judge_score.prepare_report; imported here to keep this module light
+        from judge_score import prepare_report
+        from Aresults import JsonlReader
+        expected = set()
+        for json_data in JsonlReader(reports_path):
+            file_id, report_args = prepare_report(json_data)
+            if report_args is not None:
+                expected.add(file_id)
+    _completeness(summary, expected, present, shard_count, output_path, lambda file_id: {'file_id': file_id})
+    return summary
+
+
+def _fact_key(url: str, context: str) -> str:
+    return json.dumps([url, context], ensure_ascii=False)
+
+
+def merge_fact_results(inputs: List[str], output_path: str, claims_path: Optional[str] = None, shard_count: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Merge the judge_fact.py outputs of several shards into one JSONL of unique verdicts.
+    Args:
+        inputs: shard output files (or directories holding *.judge.jsonl files)
+        output_path: merged JSONL, one {url, context, label} record per (url, context) and one per
+            distinct error record (first occurrence wins)
+        claims_path: optional judge_fact.py claims input; each of its (url, context) pairs is expected
+        shard_count: N of the run, to break missing pairs down by shard (inferred from file names if not given)
+    Returns:
+        summary counts; missing pairs are written to <output>.missing.jsonl
+    """
+    files = [path for path in _input_files(inputs, '*.judge.jsonl') if os.path.abspath(path) != os.path.abspath(output_path)]
+    shard_count = shard_count or infer_shard_count(files)
+    present: Set[str] = set()
+    errors: Set[str] = set()
+    summary: Dict[str, Any] = {'files': len(files), 'records': 0, 'duplicates': 0, 'error_labels': 0}
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as fout:
+        for path in files:
+            for record in _iter_records(path):
+                if 'url' in record and 'context' in record:
+                    key = _fact_key(record['url'], record['context'])
+                    seen = present
+                else:
+                    key = json.dumps(record, sort_keys=True, ensure_ascii=False)
+                    seen = errors
+                if key in seen:
+                    summary['duplicates'] += 1
+                    continue
+                seen.add(key)
+                if seen is present:
+                    label = record.get('label')
+                    if isinstance(label, str) and label.startswith('__ERROR__') or isinstance(label, dict) and 'error' in label:
+                        summary['error_labels'] += 1
+                fout.write(json.dumps(record, ensure_ascii=False) + '\n')
+                summary['records'] += 1
+    summary['error_records'] = len(errors)
+    if shard_count:
+        summary['missing_shard_files'] = missing_shard_files(files, shard_count)
+
+    expected = None
+    if claims_path:
+        from judge_fact import parse_record
+        expected = set()
+        with open(claims_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    url, contexts = parse_record(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if url is None:
+                    continue
+                for c in contexts:
+                    if isinstance(c, str):
+                        expected.add(_fact_key(url, c))
+    # Pairs are sharded by their URL
+    _completeness(summary, expected, present, shard_count, output_path,
+                  lambda key: dict(zip(('url', 'context'), json.loads(key))), lambda key: json.loads(key)[0])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the outputs of judge_score.py / judge_fact.py runs started with --shard i/N and check that nothing is missing.")
+    parser.add_argument('command', choices=['score', 'fact'])
+    parser.add_argument('--inputs', nargs='+', required=True, help='score: shard output directories or result files; fact: shard output files or directories')
+    parser.add_argument('--output', type=str, required=True, help='Merged, deduplicated JSONL to write')
+    parser.add_argument('--expected', type=str, default=None, help='score: the report JSONL input; fact: the claims JSONL input. Every item it holds must be in the merged output')
+    parser.add_argument('--shards', type=int, default=None, help='N of the run, to report missing items per shard (inferred from shard-i-of-N file names if not set)')
+    args = parser.parse_args()
+
+    if args.command == 'score':
+        summary = merge_score_results(args.inputs, args.output, args.expected, args.shards)
+    else:
+        summary = merge_fact_results(args.inputs, args.output, args.expected, args.shards)
+    print(f"Saved merged results: {args.output}")
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if summary.get('missing') or summary.get('missing_shard_files'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
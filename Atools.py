@@ -1,54 +1,120 @@
 import json_repair
-from openai import OpenAI
 import re
-import copy
-import requests
 import json
 import random
-from tqdm import trange
 import os
-import dashscope
+import sys
+import math
+import threading
 import time
+import itertools
 from dotenv import load_dotenv
 load_dotenv()
-import logging
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from firecrawl.firecrawl import FirecrawlApp
-from Aprompts import Quality_sys_prompt, Quality_user_prompt, FACT_CHECK_SYS_PROMPT, FACT_CHECK_USER_PROMPT, REPEATABILITY_SYSTEM_PROMPT, REPEATABILITY_USER_PROMPT
+# The openai, firecrawl and requests SDKs are imported on first use (see get_client,
+# SearchAgent.app and WebScrapingJinaTool), so importing Atools stays cheap for --help,
+# checkpoint maintenance and worker processes
+from Acache import LLMCache, PageCache
+from Ametrics import MetricsRecorder, current_tags, estimate_cost, metrics_tags
+from Atrace import span, traced
+from Alimiter import RateLimiter, estimate_message_tokens, retry_after_seconds
+from Aclaims import split_sentences
+from Asections import SectionIndex
+from Aschema import JudgeCascade, JudgeStats, SchemaError, response_format, validate_result
+from Aprompts import Quality_sys_prompt, Quality_user_prompt, FACT_CHECK_SYS_PROMPT, FACT_CHECK_USER_PROMPT, FACT_CHECK_BATCH_SYS_PROMPT, FACT_CHECK_BATCH_USER_PROMPT, REPEATABILITY_SYSTEM_PROMPT, REPEATABILITY_USER_PROMPT
 
 APIKEY = os.environ.get("OPENAI_API_KEY")
 APIBASE = os.environ.get("OPENAI_API_BASE")
+# Jina Reader endpoint; overridable to point scrapes at a local stand-in (see benchmarks/)
+JINA_READER_BASE = os.environ.get("JINA_READER_BASE", "https://r.jina.ai")
 
-client = OpenAI(
-    api_key=APIKEY,
-    base_url=APIBASE,
-    timeout=600,
-)
+_client = None
+_client_lock = threading.Lock()
 
+def get_client():
+    """The shared OpenAI client, constructed on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(
+                    api_key=APIKEY,
+                    base_url=APIBASE,
+                    timeout=600,
+                )
+    return _client
+
+def __getattr__(name):
+    # Keeps `Atools.client` / `from Atools import client` working without an import-time client
+    if name == 'client':
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _NotRaised(Exception):
+    """Placeholder matched by no exception."""
+
+def openai_error(name):
+    """
+    openai exception class by name for use in except clauses. While the SDK is not loaded no
+    openai exception can have been raised, so a placeholder is returned instead of importing it.
+    """
+    openai = sys.modules.get('openai')
+    return getattr(openai, name) if openai is not None else _NotRaised
 
 
 class WebScrapingJinaTool:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, pool_size: int = 16, connect_timeout: float = 10, read_timeout: float = 90):
+        """
+        Args:
+            api_key (str): Jina API key, defaults to JINA_API_KEY
+            pool_size (int): keep-alive connections kept open to r.jina.ai
+            connect_timeout (float): seconds allowed to establish a connection
+            read_timeout (float): total seconds allowed to receive the response; also bounds stalled sockets
+        """
         self.api_key = api_key or os.environ.get("JINA_API_KEY")
         if not self.api_key:
             raise ValueError("Jina API key not provided! Please set JINA_API_KEY environment variable.")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        import requests
+        from requests.adapters import HTTPAdapter
+        # One pooled session per tool: thousands of scrapes reuse the same TLS connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _get(self, url: str, headers: Dict[str, str]) -> bytes:
+        """GET with connect/read timeouts and an overall deadline on the body download."""
+        deadline = time.monotonic() + self.read_timeout
+        with self.session.get(url, headers=headers, timeout=(self.connect_timeout, self.read_timeout), stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Jina AI Reader Failed for {url}: {response.status_code}")
+            # read1 returns whatever has arrived, so a host trickling bytes cannot outlive the deadline
+            raw = response.raw
+            read = raw.read1 if hasattr(raw, 'read1') else raw.read
+            chunks = []
+            while True:
+                chunk = read(65536, decode_content=True)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Jina AI Reader exceeded {self.read_timeout}s for {url}")
+            return b''.join(chunks)
 
     def __call__(self, url: str) -> Dict[str, Any]:
         try:
-            jina_url = f'https://r.jina.ai/{url}'
+            jina_url = f'{JINA_READER_BASE.rstrip("/")}/{url}'
             headers = {
                 "Accept": "application/json",
                 'Authorization': self.api_key,
                 'X-Timeout': "60000",
                 "X-With-Generated-Alt": "true",
             }
-            response = requests.get(jina_url, headers=headers)
-
-            if response.status_code != 200:
-                raise Exception(f"Jina AI Reader Failed for {url}: {response.status_code}")
-
-            response_dict = response.json()
+            response_dict = json.loads(self._get(jina_url, headers))
 
             return {
                 'url': response_dict['data']['url'],
@@ -82,16 +148,280 @@ def load_response(response):
         return response
 
 
+# Optional on-disk response cache shared by all judge functions, see configure_llm_cache
+llm_cache = None
+
+def configure_llm_cache(path=None, max_mb=None, replay=False):
+    """
+    Enable (or disable, with path=None) the persistent LLM response cache.
+
+    Args:
+        path (str): SQLite file holding the cache; the same file can be shared by judge_fact.py and judge_score.py
+        max_mb (float): size limit of stored responses in MB, least recently used entries are evicted beyond it
+        replay (bool): read-only mode, a cache miss raises CacheMissError instead of calling the API
+    """
+    global llm_cache
+    if llm_cache is not None:
+        llm_cache.close()
+        llm_cache = None
+    if path:
+        max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        llm_cache = LLMCache(path, max_bytes=max_bytes, mode='replay' if replay else 'readwrite')
+    return llm_cache
+
+# Optional process-wide RPM/TPM scheduler for the shared client, see configure_rate_limiter
+rate_limiter = None
+RATE_LIMIT_MAX_RETRIES = 6
+# Connection errors, timeouts and 5xx responses, retried like the SDK does without a rate limiter
+TRANSIENT_MAX_RETRIES = 3
+
+def configure_rate_limiter(rpm=None, tpm=None):
+    """
+    Enable (or disable, when both limits are None) client-side throttling of all chat completion calls.
+
+    Args:
+        rpm (float): requests-per-minute budget
+        tpm (float): tokens-per-minute budget, prompt tokens are estimated before dispatch
+
+    Returns:
+        RateLimiter or None; its utilization() reports current usage
+    """
+    global rate_limiter
+    rate_limiter = RateLimiter(rpm=rpm, tpm=tpm) if (rpm or tpm) else None
+    return rate_limiter
+
+# Per-call token, cost and latency accounting, see configure_metrics
+metrics = MetricsRecorder()
+
+def configure_metrics(path=None):
+    """
+    Start a new metrics recorder; with a path every LLM call and scrape is also appended to it as JSONL.
+
+    Returns:
+        MetricsRecorder; its summary() reports per-stage tokens, estimated cost and latency
+    """
+    global metrics
+    metrics.close()
+    metrics = MetricsRecorder(path)
+    return metrics
+
+def completion_usage(completion):
+    """Return (prompt_tokens, completion_tokens, cached_tokens) reported with a completion (zeros if missing)."""
+    usage = getattr(completion, 'usage', None)
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = getattr(details, 'cached_tokens', None) or 0
+    return getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0, cached
+
+def _create_completion(model, messages, params):
+    """
+    Returns (completion, retries): retries counts 429 responses and transient errors (connection
+    errors, timeouts, 5xx) retried under the rate limiter.
+    """
+    if rate_limiter is None:
+        return get_client().chat.completions.create(model=model, messages=messages, **params), 0
+    estimated = estimate_message_tokens(messages)
+    rate_limited = 0
+    transient = 0
+    while True:
+        entry = rate_limiter.acquire(estimated)
+        try:
+            # The SDK's own retries are off so that 429s are retried here and every worker waits on
+            # the shared Retry-After; the other errors the SDK would retry are retried here as well
+            completion = get_client().with_options(max_retries=0).chat.completions.create(model=model, messages=messages, **params)
+        except openai_error('RateLimitError') as e:
+            rate_limited += 1
+            if rate_limited > RATE_LIMIT_MAX_RETRIES:
+                raise
+            wait = retry_after_seconds(e)
+            rate_limiter.pause(wait if wait is not None else min(60, 2 ** rate_limited))
+            continue
+        except (openai_error('APIConnectionError'), openai_error('APITimeoutError'), openai_error('InternalServerError')):
+            transient += 1
+            if transient > TRANSIENT_MAX_RETRIES:
+                raise
+            # Same backoff as the SDK: 0.5 s doubling up to 8 s, with jitter
+            time.sleep(min(8.0, 0.5 * 2 ** (transient - 1)) * random.uniform(0.75, 1.0))
+            continue
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            rate_limiter.record_usage(getattr(usage, 'total_tokens', estimated) - estimated, entry)
+        return completion, rate_limited + transient
+
+def _accepted(result):
+    """Whether a parsed judge result is usable: parsers report failures as None or an {"error": ...} dict."""
+    return result is not None and not (isinstance(result, dict) and 'error' in result)
+
+def chat_completion(messages, model="gpt-4o", parse=None, **params):
+    """
+    Send a chat completion request through the shared client and return the message content.
+    Identical requests are answered from llm_cache when it is configured, and requests are
+    throttled by rate_limiter when it is configured. Every call is recorded in metrics.
+
+    With parse, parse(content) is returned instead, and only a response parse accepts is cached:
+    a broken response is not replayed to retries or later runs, and a cached one that parse
+    rejects is dropped and requested again (except in replay mode).
+    """
+    start = time.perf_counter()
+    key = None
+    if llm_cache is not None:
+        key = LLMCache.make_key(model, messages, params)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            metrics.record(model=model, cache_hit=True, latency_s=time.perf_counter() - start)
+            if parse is None:
+                return cached
+            try:
+                result = parse(cached)
+                if _accepted(result) or llm_cache.mode == 'replay':
+                    return result
+            except SchemaError:
+                if llm_cache.mode == 'replay':
+                    raise
+            llm_cache.delete(key)
+            start = time.perf_counter()
+    try:
+        with span('llm.request', model=model, stage=current_tags().get('stage', 'llm')):
+            completion, retries = _create_completion(model, messages, params)
+    except Exception as e:
+        metrics.record(model=model, error=f"{type(e).__name__}: {e}", latency_s=time.perf_counter() - start)
+        raise
+    prompt_tokens, completion_tokens, cached_tokens = completion_usage(completion)
+    response_model = getattr(completion, 'model', None) or model
+    metrics.record(
+        model=response_model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cached_tokens=cached_tokens,
+        cost_usd=estimate_cost(response_model, prompt_tokens, cached_tokens, completion_tokens),
+        retries=retries,
+        latency_s=time.perf_counter() - start,
+    )
+    content = load_response(completion)
+    # A SchemaError from parse propagates before the response is cached
+    result = content if parse is None else parse(content)
+    if key is not None and isinstance(content, str) and (parse is None or _accepted(result)):
+        llm_cache.put(key, model, content)
+    return result
+
+
+# Judge responses are requested as JSON-schema structured outputs while the backend accepts them,
+# see configure_structured_outputs; judge_stats counts parse outcomes and retries per judge
+structured_outputs = True
+judge_stats = JudgeStats()
+
+def configure_structured_outputs(enabled=True):
+    """Enable or disable schema-enforced judge responses (response_format=json_schema)."""
+    global structured_outputs
+    structured_outputs = enabled
+
+def judge_params(judge):
+    """Extra request parameters of a judge call: the response_format of its schema when enabled."""
+    return {"response_format": response_format(judge)} if structured_outputs else {}
+
+def judge_completion(judge, messages, model="gpt-4o", parse=None):
+    """
+    Send a judge request with its structured-output schema. If the backend rejects response_format,
+    structured outputs are switched off for the rest of the run and the request is sent as plain JSON.
+    With parse, the parsed verdict is returned and only responses parse accepts are cached (see chat_completion).
+    """
+    global structured_outputs
+    params = judge_params(judge)
+    with metrics_tags(stage=judge):
+        try:
+            return chat_completion(messages, model=model, parse=parse, **params)
+        except openai_error('BadRequestError') as e:
+            if not params or 'response_format' not in str(e):
+                raise
+            print(f"Structured outputs not supported by the backend, falling back to free-form JSON: {e}")
+            structured_outputs = False
+            return chat_completion(messages, model=model, parse=parse)
+
+# Model answering judge requests; with judge_cascade set, a cheaper model answers first and only
+# uncertain verdicts reach judge_model, see configure_judge_models
+judge_model = "gpt-4o"
+judge_cascade = None
+
+def configure_judge_models(model="gpt-4o", cascade_model=None, min_confidence=0.8, escalate_partial=True):
+    """
+    Choose the judge model and optionally put a cheaper model in front of it.
+
+    Args:
+        model (str): judge model; the strong model of the cascade
+        cascade_model (str): fast model answering first, None disables the cascade
+        min_confidence (float): repeatability verdicts below this confidence are escalated
+        escalate_partial (bool): escalate partially supported (is_factual=0) fact checks
+
+    Returns:
+        JudgeCascade or None; its report() gives the escalation rates
+    """
+    global judge_model, judge_cascade
+    judge_model = model
+    judge_cascade = JudgeCascade(cascade_model, model, min_confidence, escalate_partial) if cascade_model else None
+    return judge_cascade
+
+def run_judge(judge, messages, parse):
+    """
+    Send a judge request and parse the verdict with parse. With a cascade, the fast model answers
+    first; a verdict it fails to produce or is uncertain about (see JudgeCascade.escalation_reason)
+    is requested again from the strong model, whose verdict is returned as is.
+    """
+    cascade = judge_cascade
+    if cascade is None:
+        return judge_completion(judge, messages, model=judge_model, parse=parse)
+    try:
+        with metrics_tags(cascade='fast'):
+            result = judge_completion(judge, messages, model=cascade.fast_model, parse=parse)
+    except SchemaError:
+        result = None
+    reason = cascade.escalation_reason(judge, result)
+    cascade.record(judge, reason)
+    if reason is None:
+        return result
+    with metrics_tags(cascade='escalated', escalation=reason):
+        return judge_completion(judge, messages, model=cascade.strong_model, parse=parse)
+
+def parse_judge_response(judge, response):
+    """
+    Parse a judge response and validate it against the judge's result shape; only broken fields are repaired.
+    Raises SchemaError if a required field is missing or unusable.
+    """
+    judge_stats.record(judge, 'calls')
+    try:
+        with span(f'parse.{judge}'):
+            result, repaired = validate_result(judge, json_repair.loads(response))
+    except Exception as e:
+        judge_stats.record(judge, 'parse_failures')
+        if isinstance(e, SchemaError):
+            raise
+        raise SchemaError(f"{judge} response is not valid JSON: {e}") from e
+    judge_stats.record(judge, 'repaired' if repaired else 'valid')
+    return result
+
+
 class SearchAgent:
-    def __init__(self, num_limit_pages: int = 3):
+    def __init__(self, num_limit_pages: int = 3, page_cache: PageCache = None, jina_options: Dict[str, Any] = None):
         self.NUM_LIMIT_PAGES = num_limit_pages
-        self.app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_KEY"))
+        self._app = None
         self._jina_api_key = os.environ.get("JINA_API_KEY")
         self._jina_tool = None
+        # Connection pool size and timeouts of the Jina HTTP session, see WebScrapingJinaTool
+        self._jina_options = jina_options or {}
+        # Optional persistent page store shared by every scrape of this agent
+        self.page_cache = page_cache
+
+    @property
+    def app(self):
+        """Firecrawl client, only constructed when the firecrawl provider is used."""
+        if self._app is None:
+            from firecrawl.firecrawl import FirecrawlApp
+            self._app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_KEY"))
+        return self._app
 
     def _get_jina_tool(self) -> WebScrapingJinaTool:
         if self._jina_tool is None:
-            self._jina_tool = WebScrapingJinaTool(api_key=self._jina_api_key)
+            self._jina_tool = WebScrapingJinaTool(api_key=self._jina_api_key, **self._jina_options)
         return self._jina_tool
 
     def search(self, query, provider: str = 'firecrawl'):
@@ -123,17 +453,50 @@ class SearchAgent:
         Scrape the given URL using the specified provider.
         - provider='firecrawl': use Firecrawl to scrape markdown
         - provider='jina': use Jina Reader to fetch page content
+        If a page_cache is configured, fresh cached pages are returned without fetching,
+        and successfully fetched pages are stored in it. Every scrape is recorded in metrics.
+        """
+        with span('scrape', url=url, provider=provider):
+            start = time.perf_counter()
+            if self.page_cache is not None:
+                cached = self.page_cache.get(url, provider)
+                if cached is not None:
+                    metrics.record(stage='scrape', url=url, provider=provider, cache_hit=True, latency_s=time.perf_counter() - start)
+                    return cached
+            content, metadata = self._fetch(url, provider)
+            metrics.record(
+                stage='scrape',
+                url=url,
+                provider=provider,
+                bytes=len(content.encode('utf-8')) if content else 0,
+                error=None if content else 'no content',
+                latency_s=time.perf_counter() - start,
+            )
+            if content and self.page_cache is not None:
+                self.page_cache.put(url, provider, content, metadata)
+            return content
+
+    def _fetch(self, url, provider: str = 'firecrawl'):
+        """
+        Fetch the page from the provider.
+        Returns:
+            (content, metadata): page markdown (None on failure) and fetch metadata
         """
         if provider == 'jina':
             try:
                 jina_tool = self._get_jina_tool()
                 result = jina_tool(url)
                 if 'content' in result and result.get('content'):
-                    return result['content']
-                return None
+                    metadata = {
+                        'provider': provider,
+                        'title': result.get('title'),
+                        'publish_time': result.get('publish_time'),
+                    }
+                    return result['content'], metadata
+                return None, None
             except Exception as e:
                 print(f"Error scraping with Jina {url}: {e}")
-                return None
+                return None, None
 
         # default: firecrawl
         try:
@@ -146,12 +509,17 @@ class SearchAgent:
                 }
             )
             if result['metadata']["statusCode"] == 200:
-                return self.remove_markdown_links(result["markdown"])
+                metadata = {
+                    'provider': provider,
+                    'title': result['metadata'].get('title'),
+                    'status_code': result['metadata']["statusCode"],
+                }
+                return self.remove_markdown_links(result["markdown"]), metadata
             else:
-                return None
+                return None, None
         except Exception as e:
             print(f"Error scraping {url}: {e}")
-            return None
+            return None, None
     
     def remove_markdown_links(self, markdown_text: str) -> str:
         """
@@ -171,25 +539,124 @@ class SearchAgent:
 
 
 def extract_numbered_sentences(text):
-    pattern = r'[^。.!?]*\[\[\d+(?:,\d+)*\]\][^。.!?]*[。.!?]'
-    sentences = re.findall(pattern, text)
+    """Sentences of text that carry a [[n]] / [[n,m]] citation marker, found with the linear-time Aclaims.split_sentences scanner."""
+    sentences = []
+    for start, end in split_sentences(text):
+        sentence = text[start:end]
+        if '[[' in sentence and _DOUBLE_BRACKET_CITATION.search(sentence):
+            sentences.append(sentence)
     return sentences
 
+_DOUBLE_BRACKET_CITATION = re.compile(r'\[\[\d+(?:\s*,\s*\d+)*\]\]')
+
+# Each judge is split into a message builder and a response parser, so that the same
+# requests can be sent synchronously or written to an offline batch (see Abatch.py).
+
+def fact_check_messages(sentence, url_markdown):
+    return [
+        {"role": "system", "content": FACT_CHECK_SYS_PROMPT},
+        {"role": "user", "content": FACT_CHECK_USER_PROMPT.format(input=sentence,url_markdown=url_markdown)}
+    ]
+
+def parse_fact_check_response(response):
+    try:
+        return parse_judge_response('fact_check', response)
+    except SchemaError:
+        return {"error": "Failed to parse JSON response", "raw_response": response}
+
 def check_factual(sentence,url_markdown):
-    completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": FACT_CHECK_SYS_PROMPT},
-                {"role": "user", "content": FACT_CHECK_USER_PROMPT.format(input=sentence,url_markdown=url_markdown)}
-            ]
-        )
+    return run_judge('fact_check', fact_check_messages(sentence, url_markdown), parse_fact_check_response)
+
+
+@traced('parse.fact_check_batch')
+def parse_batch_fact_labels(response, num_claims):
+    """
+    Validate a batched fact-check response.
+    Returns:
+        list: one {"is_factual", "sentence_support"} dict per claim in input order, or None if the response is malformed
+    """
+    judge_stats.record('fact_check_batch', 'calls')
     try:
-        result = json_repair.loads(load_response(completion))
-        if isinstance(result, list):
-            return result[-1]
-        return result
-    except:
-        return {"error": "Failed to parse JSON response", "raw_response": load_response(completion)}
+        result = json_repair.loads(response)
+    except Exception:
+        result = None
+    if isinstance(result, dict):
+        result = result.get('results')
+    if not isinstance(result, list) or len(result) != num_claims:
+        judge_stats.record('fact_check_batch', 'parse_failures')
+        return None
+    labels = [None] * num_claims
+    any_repaired = False
+    for position, item in enumerate(result):
+        try:
+            claim_id = int(item.get('id', position))
+            label, repaired = validate_result('fact_check', {k: v for k, v in item.items() if k != 'id'})
+        except (AttributeError, TypeError, ValueError):
+            judge_stats.record('fact_check_batch', 'parse_failures')
+            return None
+        if not 0 <= claim_id < num_claims or labels[claim_id] is not None:
+            judge_stats.record('fact_check_batch', 'parse_failures')
+            return None
+        any_repaired = any_repaired or bool(repaired)
+        labels[claim_id] = {"is_factual": label['is_factual'], "sentence_support": label['sentence_support']}
+    judge_stats.record('fact_check_batch', 'repaired' if any_repaired else 'valid')
+    return labels
+
+def fact_check_batch_messages(sentences, url_markdown):
+    inputs = "\n".join(f"Claim [{i}]: {sentence}" for i, sentence in enumerate(sentences))
+    return [
+        {"role": "system", "content": FACT_CHECK_BATCH_SYS_PROMPT},
+        {"role": "user", "content": FACT_CHECK_BATCH_USER_PROMPT.format(inputs=inputs, url_markdown=url_markdown)}
+    ]
+
+def _check_factual_with(sentences, url_markdown, model):
+    """Labels of sentences from one model: one batched call, or single checks if its response is malformed."""
+    if len(sentences) == 1:
+        return [judge_completion('fact_check', fact_check_messages(sentences[0], url_markdown), model=model, parse=parse_fact_check_response)]
+    labels = judge_completion(
+        'fact_check_batch', fact_check_batch_messages(sentences, url_markdown), model=model,
+        parse=lambda response: parse_batch_fact_labels(response, len(sentences)),
+    )
+    if labels is None:
+        print(f"Malformed batched fact-check response, falling back to {len(sentences)} single checks")
+        judge_stats.record('fact_check_batch', 'retries', len(sentences))
+        labels = [
+            judge_completion('fact_check', fact_check_messages(sentence, url_markdown), model=model, parse=parse_fact_check_response)
+            for sentence in sentences
+        ]
+    return labels
+
+def check_factual_batch(sentences, url_markdown):
+    """
+    Verify several sentences against one page in a single call: the page is sent once together
+    with a numbered list of claims. Falls back to one check per sentence if the batched response
+    is malformed. With a judge cascade, the claims the fast model is uncertain about are checked
+    again by the strong model (batched as well).
+
+    Args:
+        sentences (list): claims citing the page
+        url_markdown (str): scraped page content
+
+    Returns:
+        list: one label per sentence, in input order
+    """
+    cascade = judge_cascade
+    if cascade is None:
+        return _check_factual_with(sentences, url_markdown, judge_model)
+    with metrics_tags(cascade='fast'):
+        labels = _check_factual_with(sentences, url_markdown, cascade.fast_model)
+    uncertain = []
+    for i, label in enumerate(labels):
+        reason = cascade.escalation_reason('fact_check', label)
+        cascade.record('fact_check', reason)
+        if reason is not None:
+            uncertain.append(i)
+    if uncertain:
+        with metrics_tags(cascade='escalated'):
+            escalated = _check_factual_with([sentences[i] for i in uncertain], url_markdown, cascade.strong_model)
+        for i, label in zip(uncertain, escalated):
+            labels[i] = label
+    return labels
 
 
 def split_paragraphs(markdown_text,regular_expression=r'\n\s*\n'):
@@ -198,64 +665,127 @@ def split_paragraphs(markdown_text,regular_expression=r'\n\s*\n'):
     return paragraphs
 
 
-def extract_first_level_headings(markdown_content,pattern=r'^## .*$'):
+def estimate_tokens(text):
+    """Rough prompt token estimate (about 4 characters per token) used for budgeting."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def tokenize_for_retrieval(text):
+    """Lower-cased latin words and digits, and single CJK characters."""
+    return re.findall(r'[a-z0-9]+|[\u4e00-\u9fff]', text.lower())
+
+
+class BM25Index:
     """
-    Extract first-level headings from a markdown text.
-    First-level headings are those that start with '# ' followed by the heading text.
-    
+    BM25 index over the passages of one scraped page.
+    Built once per page and queried with every claim that cites it.
+    """
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = []
+        self.doc_lens = []
+        doc_freq: Dict[str, int] = {}
+        for passage in passages:
+            tf: Dict[str, int] = {}
+            tokens = tokenize_for_retrieval(passage)
+            for token in tokens:
+                tf[token] = tf.get(token, 0) + 1
+            for token in tf:
+                doc_freq[token] = doc_freq.get(token, 0) + 1
+            self.term_freqs.append(tf)
+            self.doc_lens.append(len(tokens))
+        n = len(passages)
+        self.avg_len = (sum(self.doc_lens) / n) if n else 0.0
+        self.idf = {token: math.log(1 + (n - df + 0.5) / (df + 0.5)) for token, df in doc_freq.items()}
+
+    @classmethod
+    def from_markdown(cls, markdown_text: str, min_chars: int = 200):
+        """Split a page with split_paragraphs, merging short paragraphs (e.g. headings) into the next one."""
+        passages = []
+        buffer = ''
+        for paragraph in split_paragraphs(markdown_text):
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+            if len(buffer) >= min_chars:
+                passages.append(buffer)
+                buffer = ''
+        if buffer:
+            passages.append(buffer)
+        return cls(passages)
+
+    def search(self, query: str, top_k: int = 5):
+        """Return up to top_k (passage index, score) pairs with a positive score, best first."""
+        query_tokens = set(tokenize_for_retrieval(query))
+        scores = []
+        for idx, tf in enumerate(self.term_freqs):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[idx] / self.avg_len) if self.avg_len else self.k1
+            for token in query_tokens:
+                freq = tf.get(token)
+                if freq:
+                    score += self.idf[token] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores.append((idx, score))
+        scores.sort(key=lambda item: -item[1])
+        return scores[:top_k]
+
+    def select_evidence(self, queries: List[str], top_k: int = 5, token_budget: int = 3000):
+        """
+        Pick the passages most relevant to the queries within a token budget.
+
+        Args:
+            queries (list): claims to find evidence for; each contributes its own top_k passages
+            top_k (int): passages retrieved per query
+            token_budget (int): maximum estimated tokens of the returned evidence
+
+        Returns:
+            (evidence, passage_ids): passages joined in page order, and their indices
+        """
+        best: Dict[int, float] = {}
+        for query in queries:
+            for idx, score in self.search(query, top_k):
+                best[idx] = max(score, best.get(idx, 0.0))
+        selected = []
+        used = 0
+        for idx in sorted(best, key=lambda i: -best[i]):
+            cost = estimate_tokens(self.passages[idx])
+            if used + cost <= token_budget:
+                selected.append(idx)
+                used += cost
+        selected.sort()
+        evidence = "\n\n".join(self.passages[idx] for idx in selected)
+        if not selected and best:
+            # The single best passage alone exceeds the budget: send its beginning
+            top = max(best, key=lambda i: best[i])
+            selected = [top]
+            evidence = self.passages[top][:token_budget * 4]
+        return evidence, selected
+
+
+def extract_first_level_headings(markdown_content, level=2):
+    """
+    Split a markdown text at its first-level ('## ') headings.
+    Thin wrapper materializing the lists of a SectionIndex; prefer SectionIndex and its lazy views.
+
     Args:
-        text (str): The markdown text to process
-        
+        markdown_content (str): The markdown text to process
+        level (int): heading level the text is split at
+
     Returns:
-        list: A list of first-level headings
-        
+        tuple: (headings, sections, sections_headings, sections_with_headings) lists
+
     Usage:
         headings, sections, sections_headings, sections_with_headings = extract_first_level_headings(report)
-        
+
     """
-    # Pattern to match first-level headings
-    # pattern = r'\*\*\d+.*?\*\*'
-    # pattern = r'^## .*$'    
-    # Find all matches
-    headings = re.findall(pattern, markdown_content, re.MULTILINE)
-    
-    # return headings
-
-    sections = []
-    current_pos = 0
-    sections_with_headings = []
-    sections_headings = []
-    first_heading_pos = markdown_content.find(headings[0])
-    if first_heading_pos > 0:
-        section0 = markdown_content[:first_heading_pos].strip()
-        sections.append(section0)
-        sections_headings.append("Beginning of the report")
-        sections_with_headings.append("Beginning of the report\n" + section0)
-
-    for i, heading in enumerate(headings):
-        heading_pos = markdown_content.find(heading, current_pos)
-        
-        if heading_pos != -1:
-            if current_pos > 0:
-                section_content = markdown_content[current_pos:heading_pos].strip()
-                sections.append(section_content)
-                sections_headings.append(headings[i-1])
-                sections_with_headings.append(headings[i-1] + "\n" + section_content)
-                
-            current_pos = heading_pos + len(heading)
-
-    if current_pos < len(markdown_content):
-        last_section = markdown_content[current_pos:].strip()
-        sections.append(last_section)
-        sections_headings.append(headings[-1])
-        sections_with_headings.append(headings[-1] + "\n" + last_section)
-
-    return headings, sections, sections_headings, sections_with_headings
+    index = SectionIndex(markdown_content, level)
+    return list(index.headings), list(index.bodies), list(index.titles), list(index.with_titles)
 
 def judge_repeatability(markdown_content):
 
-    _, sections, sections_headings, sections_with_headings = extract_first_level_headings(markdown_content)
-    passage_list = sections
+    passage_list = list(SectionIndex(markdown_content).bodies)
     assert isinstance(passage_list, list), "input MUST be a list"
     paragraphs_str = ''
     for i in range(len(passage_list)):
@@ -263,8 +793,8 @@ def judge_repeatability(markdown_content):
         paragraphs_str += passage_list[i]
         paragraphs_str += '\n'
 
-    completion = client.chat.completions.create(
-            model="gpt-4o",
+    response = chat_completion(
+            model=judge_model,
             messages=[
             {"role": "system", "content": REPEATABILITY_SYSTEM_PROMPT},
             {"role": "user", "content": REPEATABILITY_USER_PROMPT.format(input=paragraphs_str)}
@@ -273,7 +803,7 @@ def judge_repeatability(markdown_content):
 
 
     try:
-        result = json_repair.loads(load_response(completion))
+        result = json_repair.loads(response)
 
         repeat_found = result['repetitions_found']
 
@@ -299,71 +829,216 @@ def judge_repeatability(markdown_content):
 
             except Exception as e:
                 print("Error: ",e)
-                return {"error": "Failed to parse repeat_found", "raw_response": load_response(completion)}
+                return {"error": "Failed to parse repeat_found", "raw_response": response}
         
 
 
         return result
     except Exception as e:
-        return {"error": "Failed to parse JSON response", "raw_response": load_response(completion)}
+        return {"error": "Failed to parse JSON response", "raw_response": response}
+
 
+def repeatability_pair_messages(passage1, passage2):
+    return [
+        {"role": "system", "content": REPEATABILITY_SYSTEM_PROMPT},
+        {"role": "user", "content": REPEATABILITY_USER_PROMPT.format(para1=passage1,para2=passage2)}
+    ]
+
+def parse_repeatability_pair_response(response):
+    return parse_judge_response('repeatability_pair', response)
 
 def judge_repeatability_pair(passage1,passage2):
-    completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": REPEATABILITY_SYSTEM_PROMPT},
-                {"role": "user", "content": REPEATABILITY_USER_PROMPT.format(para1=passage1,para2=passage2)}
-            ]
-        )
-    try:
-        result = json_repair.loads(load_response(completion))
-    except:
-        try:
-            result = json_repair.loads(load_response(completion))['result']
-        except:
-            print("Error after retry: ",load_response(completion))
-            result = None
-    return result
+    return run_judge('repeatability_pair', repeatability_pair_messages(passage1, passage2), parse_repeatability_pair_response)
 
 
+def quality_messages(query, markdown_content):
+    return [
+        {"role": "system", "content": Quality_sys_prompt},
+        {"role": "user", "content": Quality_user_prompt.format(question = query, paragraph = markdown_content)}
+    ]
+
+def parse_quality_response(response):
+    return parse_judge_response('quality', response)
+
 def judge_quality(query,markdown_content):
-    completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-            {"role": "system", "content": Quality_sys_prompt},
-            {"role": "user", "content": Quality_user_prompt.format(question = query, paragraph = markdown_content)}
-        ]
-    )
-    # print("completion: ",completion)
-    result = json_repair.loads(load_response(completion))
-    return result
+    return run_judge('quality', quality_messages(query, markdown_content), parse_quality_response)
 
 
-def generate_random_pair_with_label(sections_with_headings_CN,pair_nums = 10):
+def pairwise_section_similarity(sections):
     """
+    TF-IDF cosine similarity of every pair of sections, computed in one pass over an inverted index.
+    Used as a cheap local prefilter before sending section pairs to the repeatability judge.
 
+    Args:
+        sections (list): section texts
+
+    Returns:
+        dict: {(a, b): similarity} for every a < b, similarity in [0, 1]
     """
-    length = len(sections_with_headings_CN)
-    # Adjust pair_nums to not exceed maximum possible pairs
-    max_pairs = (length * (length - 1)) // 2  # Maximum possible pairs for length elements
-    pair_nums = min(pair_nums, max_pairs)
-    # Generate all possible pairs where a < b < length
-    all_possible_pairs = []
-    for a in range(length-1):
-        for b in range(a+1, length):
-            all_possible_pairs.append((a,b))
-            
-    # Randomly sample pair_nums pairs if we have enough pairs
-    results = []
-    if len(all_possible_pairs) > pair_nums:
-        sampled_pairs = random.sample(all_possible_pairs, pair_nums)
-        for pair in sampled_pairs:
-            results.append((pair, -2, []))
-    else:
-        # If we don't have enough pairs, use all available pairs
-        for pair in all_possible_pairs:
-            results.append((pair, -2, []))
-    
-    return results
+    n = len(sections)
+    term_freqs = []
+    doc_freq = {}
+    for section in sections:
+        tf = {}
+        for token in tokenize_for_retrieval(section):
+            tf[token] = tf.get(token, 0) + 1
+        for token in tf:
+            doc_freq[token] = doc_freq.get(token, 0) + 1
+        term_freqs.append(tf)
+    postings = {}
+    for idx, tf in enumerate(term_freqs):
+        weights = {token: (1 + math.log(freq)) * (math.log((1 + n) / (1 + doc_freq[token])) + 1) for token, freq in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        for token, weight in weights.items():
+            if weight > 0:
+                postings.setdefault(token, []).append((idx, weight / norm))
+    similarity = {(a, b): 0.0 for a in range(n - 1) for b in range(a + 1, n)}
+    for entries in postings.values():
+        for i in range(len(entries)):
+            a, weight_a = entries[i]
+            for j in range(i + 1, len(entries)):
+                b, weight_b = entries[j]
+                similarity[(a, b)] += weight_a * weight_b
+    return similarity
+
+
+def sample_pairs(n, rng=None):
+    """
+    Lazily yield every pair (a, b) with a < b < n exactly once, in random order.
+    Pair ranks are shuffled with a sparse Fisher-Yates permutation, so drawing k pairs costs O(k)
+    time and memory instead of building all n * (n - 1) / 2 pairs first.
+
+    Args:
+        n (int): number of items
+        rng (random.Random): source of randomness, the random module if not given
+    """
+    rng = rng or random
+    total = n * (n - 1) // 2
+    swaps = {}
+    for i in range(total):
+        j = rng.randrange(i, total)
+        rank = swaps.get(j, j)
+        swaps[j] = swaps.pop(i, i)
+        # Rank k <-> pair (a, b) with b = the largest integer such that b * (b - 1) / 2 <= k
+        b = (1 + math.isqrt(1 + 8 * rank)) // 2
+        yield rank - b * (b - 1) // 2, b
+
+
+def generate_random_pair_with_label(sections_with_headings_CN,pair_nums = 10, seed = None, accept = None):
+    """
+    Sample up to pair_nums distinct section pairs (all pairs if there are fewer).
+
+    Args:
+        sections_with_headings_CN: sections to pair
+        pair_nums (int): maximum number of pairs
+        seed: seed of the sampling order (e.g. derived from the file_id), unseeded if None
+        accept: optional predicate on (a, b); only accepted pairs are drawn
+
+    Returns:
+        list: ((a, b), -2, []) per pair in sampling order
+    """
+    rng = random.Random(seed) if seed is not None else None
+    pairs = sample_pairs(len(sections_with_headings_CN), rng)
+    if accept is not None:
+        pairs = filter(accept, pairs)
+    return [(pair, -2, []) for pair in itertools.islice(pairs, pair_nums)]
+
+
+def student_t_quantile(confidence, dof):
+    """
+    Two-sided Student-t critical value: the t with P(|T| < t) = confidence for dof degrees of freedom.
+    P(|T| < t) has a closed form for integer dof (Abramowitz & Stegun 26.7.3/26.7.4), which is
+    inverted by bisection on theta = atan(t / sqrt(dof)), so the value is exact even at dof = 1.
+    """
+    def coverage(theta):
+        cos2 = math.cos(theta) ** 2
+        if dof % 2:
+            term, total = 1.0, 1.0 if dof > 1 else 0.0
+            for k in range(1, (dof - 1) // 2):
+                term *= cos2 * 2 * k / (2 * k + 1)
+                total += term
+            return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total)
+        term = total = 1.0
+        for k in range(1, dof // 2):
+            term *= cos2 * (2 * k - 1) / (2 * k)
+            total += term
+        return math.sin(theta) * total
+
+    low, high = 0.0, math.pi / 2
+    for _ in range(60):
+        mid = (low + high) / 2
+        if coverage(mid) < confidence:
+            low = mid
+        else:
+            high = mid
+    return math.sqrt(dof) * math.tan((low + high) / 2)
+
+
+class RepeatScoreEstimate:
+    """
+    Running mean and confidence interval of the pair scores of one report, used to stop sampling
+    pairs once the repeat score is known precisely enough.
+    The half-width is a Student-t interval with a finite population correction: pairs are drawn
+    without replacement from population pairs, so the interval closes once all are judged.
+    Pairs scored without sampling (known pairs with known_score, e.g. prefiltered pairs) enter the
+    repeat score as an exact stratum: the estimate is the mean over all population + known pairs.
+    """
+
+    SCORE_RANGE = (0, 4)
+
+    def __init__(self, population, confidence=0.95, known=0, known_score=0):
+        self.population = population
+        self.confidence = confidence
+        self.known = known
+        self.known_score = known_score
+        self._t = {}
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, score):
+        # Welford's update
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (score - self.mean)
+
+    def _share(self):
+        # Weight of the sampled stratum in the repeat score
+        total = self.population + self.known
+        return self.population / total if total else 1.0
+
+    def score(self):
+        """Estimated repeat score over all pairs: the sample mean combined with the known pairs."""
+        return self._share() * self.mean + (1 - self._share()) * self.known_score
+
+    def half_width(self):
+        if self.count >= self.population:
+            return 0.0
+        if self.count < 2:
+            return math.inf
+        dof = self.count - 1
+        if dof not in self._t:
+            self._t[dof] = student_t_quantile(self.confidence, dof)
+        t = self._t[dof]
+        fpc = math.sqrt(max(0.0, (self.population - self.count) / (self.population - 1))) if self.population > 1 else 0.0
+        return self._share() * t * math.sqrt(self._m2 / dof / self.count) * fpc
+
+    def width(self):
+        return 2 * self.half_width()
+
+    def interval(self, stop=None):
+        """Achieved interval as stored in the result: low/high (clipped to the score range), width, confidence, pairs and stop reason."""
+        half_width = self.half_width()
+        low, high = self.SCORE_RANGE
+        if math.isfinite(half_width):
+            low, high = max(low, self.score() - half_width), min(high, self.score() + half_width)
+        return {
+            'low': round(low, 4),
+            'high': round(high, 4),
+            'width': round(high - low, 4),
+            'confidence': self.confidence,
+            'pairs': self.count,
+            'stop': stop,
+        }
 
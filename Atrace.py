@@ -0,0 +1,162 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# (trace_id, span_id) of the innermost open span in the current context
+_parent: contextvars.ContextVar = contextvars.ContextVar("trace_parent", default=None)
+
+
+class Tracer:
+    """No-op tracer: span() costs one function call and records nothing."""
+
+    def span(self, name: str, **attributes):
+        return contextlib.nullcontext()
+
+    def close(self):
+        pass
+
+
+class RecordingTracer(Tracer):
+    """
+    Tracer recording nested spans and exporting them to path.
+
+    Formats:
+        - 'chrome': Chrome trace-event JSON ("X" complete events per thread), written on close();
+          open it in chrome://tracing or Perfetto for a flame chart
+        - 'otlp': one OTLP/JSON ExportTraceServiceRequest per line, appended as each span ends
+
+    Parent/child links follow the current context, so spans opened in worker threads started
+    with a copied context (see Ametrics.submit_in_context) nest under the span that submitted them.
+    """
+
+    FORMATS = ("chrome", "otlp")
+
+    def __init__(self, path: str, fmt: str = "chrome", service_name: str = "deepresearch-eval"):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown trace format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._origin_ns = time.time_ns()
+        self._origin_perf_ns = time.perf_counter_ns()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8") if fmt == "otlp" else None
+
+    def _now_ns(self) -> int:
+        # Wall-clock origin plus a monotonic offset: ordered and comparable across threads
+        return self._origin_ns + time.perf_counter_ns() - self._origin_perf_ns
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        parent = _parent.get()
+        trace_id = parent[0] if parent else secrets.token_hex(16)
+        span_id = secrets.token_hex(8)
+        token = _parent.set((trace_id, span_id))
+        start_ns = self._now_ns()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            end_ns = self._now_ns()
+            _parent.reset(token)
+            self._finish(name, attributes, trace_id, span_id, parent[1] if parent else None, start_ns, end_ns, error)
+
+    def _finish(self, name, attributes, trace_id, span_id, parent_id, start_ns, end_ns, error):
+        if self.fmt == "chrome":
+            args = {key: _plain(value) for key, value in attributes.items()}
+            if error is not None:
+                args["error"] = error
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start_ns - self._origin_ns) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+            return
+        span = {
+            "traceId": trace_id,
+            "spanId": span_id,
+            "name": name,
+            "kind": 1,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+            "status": {"code": 2, "message": error} if error is not None else {"code": 1},
+        }
+        if parent_id is not None:
+            span["parentSpanId"] = parent_id
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "Atrace"}, "spans": [span]}],
+        }]}
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(request, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self.fmt == "chrome":
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+            elif self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _plain(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+tracer: Tracer = Tracer()
+
+
+def configure_tracing(path: Optional[str] = None, fmt: str = "chrome") -> Tracer:
+    """Export spans to path in the given format ('chrome' or 'otlp'); path=None restores the no-op tracer."""
+    global tracer
+    tracer.close()
+    tracer = RecordingTracer(path, fmt) if path else Tracer()
+    return tracer
+
+
+def span(name: str, **attributes):
+    """Open a span on the configured tracer (no-op unless configure_tracing was called)."""
+    return tracer.span(name, **attributes)
+
+
+def traced(name: str, *attribute_kwargs: str):
+    """Decorator wrapping every call in a span; the named keyword arguments become span attributes."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            attributes = {key: kwargs[key] for key in attribute_kwargs if key in kwargs}
+            with tracer.span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
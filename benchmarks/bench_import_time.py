@@ -0,0 +1,82 @@
+"""
+Startup benchmark: wall time of fresh interpreters importing the pipeline modules or running
+short commands (--help), plus the heaviest imports reported by `python -X importtime`.
+Also lists which provider SDKs a plain `import Atools` loads (expected: none).
+
+Example:
+    python benchmarks/bench_import_time.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDER_MODULES = ("openai", "firecrawl", "dashscope", "requests", "tqdm")
+
+COMMANDS = {
+    "import Atools": [sys.executable, "-c", "import Atools"],
+    "import judge_score": [sys.executable, "-c", "import judge_score"],
+    "judge_score.py --help": [sys.executable, "judge_score.py", "--help"],
+    "judge_fact.py --help": [sys.executable, "judge_fact.py", "--help"],
+    "python (baseline)": [sys.executable, "-c", "pass"],
+}
+
+
+def time_command(cmd, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def heaviest_imports(module, top):
+    """(cumulative_ms, name) of the top-level imports of `import module`, heaviest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    # Children are printed before their parent, indented two spaces per level
+    pending, entries = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            pending.append((int(cumulative) / 1000, name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                entries = pending
+            pending = []
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup / import-time benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreter runs per command")
+    parser.add_argument("--top", type=int, default=8, help="Number of heaviest imports of Atools to list")
+    args = parser.parse_args()
+
+    print(f"{'command':<24} {'median_ms':>10} {'min_ms':>8} {'max_ms':>8}")
+    for name, cmd in COMMANDS.items():
+        samples = time_command(cmd, args.runs)
+        print(f"{name:<24} {statistics.median(samples) * 1000:>10.1f} {min(samples) * 1000:>8.1f} {max(samples) * 1000:>8.1f}")
+
+    print("\nHeaviest direct imports of Atools (cumulative ms):")
+    for cumulative_ms, name in heaviest_imports("Atools", args.top):
+        print(f"  {cumulative_ms:>8.1f}  {name}")
+
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, Atools; print(' '.join(m for m in {PROVIDER_MODULES!r} if m in sys.modules))"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    print(f"\nProvider SDKs loaded by `import Atools`: {loaded or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
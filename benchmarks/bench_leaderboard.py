@@ -0,0 +1,103 @@
+"""
+Benchmark of the leaderboard stage (Aleaderboard.py) on synthetic judge_score.py / judge_fact.py
+outputs: the field scan against json.loads of every result, and the full leaderboard build
+(scan, means and bootstrap intervals) per model.
+
+Example:
+    python benchmarks/bench_leaderboard.py --reports 20000 --claims 200000 --models 3
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Aleaderboard
+from Aleaderboard import SCORE_METRICS, build_leaderboard, scan_score_results
+
+
+def write_score_results(path, reports, section_kb, seed):
+    rng = random.Random(seed)
+    section = "Lorem ipsum \"quoted\" dolor sit amet. " * int(section_kb * 1024 / 38)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(reports):
+            pairs = [[section, section, rng.randint(1, 5)] for _ in range(3)]
+            result = {
+                "file_id": f"{i:032x}",
+                "topic": f"Topic {i}",
+                "compare_list": pairs,
+                "repeat_results": [pair + ["explanation", [], "high"] for pair in pairs],
+                **{metric: rng.randint(1, 5) for metric in SCORE_METRICS[:-1]},
+                "repeat_score": sum(pair[2] for pair in pairs) / len(pairs),
+                "quality_reason": {"Overall_Score": "reason"},
+            }
+            f.write(json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def write_fact_results(path, claims, seed):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(claims):
+            label = {"is_factual": rng.choice([-1, 0, 1, 1]), "sentence_support": "Supporting sentence."}
+            f.write(json.dumps({"url": f"https://example.org/{i % 997}", "context": f"Claim {i}.", "label": label}) + "\n")
+
+
+def json_load_scan(path):
+    """Baseline: decode every result and collect the metrics."""
+    columns = {metric: [] for metric in SCORE_METRICS}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            for metric in SCORE_METRICS:
+                columns[metric].append(result[metric])
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard aggregation benchmark")
+    parser.add_argument("--reports", type=int, default=20000, help="Results per model")
+    parser.add_argument("--claims", type=int, default=100000, help="Fact verdicts per model")
+    parser.add_argument("--models", type=int, default=2)
+    parser.add_argument("--section_kb", type=float, default=2, help="Size of each section text in the compare_list")
+    parser.add_argument("--bootstrap", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="deepresearch-leaderboard-")
+    try:
+        scores, facts = {}, {}
+        for m in range(args.models):
+            scores[f"model{m}"] = [os.path.join(workdir, f"model{m}.results.jsonl")]
+            facts[f"model{m}"] = [os.path.join(workdir, f"model{m}.judge.jsonl")]
+            write_score_results(scores[f"model{m}"][0], args.reports, args.section_kb, seed=m)
+            write_fact_results(facts[f"model{m}"][0], args.claims, seed=m)
+        size_mb = sum(os.path.getsize(paths[0]) for paths in scores.values()) / 2**20
+        print(f"numpy: {'yes' if Aleaderboard.np is not None else 'no (pure-Python bootstrap)'}; score results: {size_mb:.0f} MB")
+
+        path = scores["model0"][0]
+        start = time.perf_counter()
+        baseline = json_load_scan(path)
+        json_s = time.perf_counter() - start
+        start = time.perf_counter()
+        columns = scan_score_results([path])
+        scan_s = time.perf_counter() - start
+        for metric in SCORE_METRICS:
+            assert list(columns.columns[metric]) == [float(v) for v in baseline[metric]], metric
+        print(f"scan of {args.reports} results: json.loads {json_s:.2f} s, field scan {scan_s:.2f} s ({json_s / scan_s:.1f}x)")
+
+        start = time.perf_counter()
+        rows = build_leaderboard(scores, facts, resamples=args.bootstrap)
+        print(f"leaderboard of {args.models} models ({args.bootstrap} resamples): {time.perf_counter() - start:.2f} s")
+        for row in rows:
+            print(f"  {row['model']}: overall {row['overall_score']} [{row['overall_score_ci_low']}, {row['overall_score_ci_high']}], "
+                  f"citation accuracy {row['citation_accuracy']} [{row['citation_accuracy_ci_low']}, {row['citation_accuracy_ci_high']}]")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
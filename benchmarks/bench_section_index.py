@@ -0,0 +1,115 @@
+"""
+Microbenchmark of report sectioning on multi-megabyte reports: the historical
+find()-based splitter versus SectionIndex, both followed by the repeatability
+candidate filter of judge_score.py. Reports time and peak traced allocations.
+
+Example:
+    python benchmarks/bench_section_index.py --sizes_mb 1 4 16 --sections 400
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Asections import SectionIndex
+
+
+def legacy_extract_first_level_headings(markdown_content, pattern=r'^## .*$'):
+    """extract_first_level_headings as it was before SectionIndex, kept as the baseline."""
+    headings = re.findall(pattern, markdown_content, re.MULTILINE)
+    sections = []
+    current_pos = 0
+    sections_with_headings = []
+    sections_headings = []
+    first_heading_pos = markdown_content.find(headings[0])
+    if first_heading_pos > 0:
+        section0 = markdown_content[:first_heading_pos].strip()
+        sections.append(section0)
+        sections_headings.append("Beginning of the report")
+        sections_with_headings.append("Beginning of the report\n" + section0)
+    for i, heading in enumerate(headings):
+        heading_pos = markdown_content.find(heading, current_pos)
+        if heading_pos != -1:
+            if current_pos > 0:
+                section_content = markdown_content[current_pos:heading_pos].strip()
+                sections.append(section_content)
+                sections_headings.append(headings[i-1])
+                sections_with_headings.append(headings[i-1] + "\n" + section_content)
+            current_pos = heading_pos + len(heading)
+    if current_pos < len(markdown_content):
+        last_section = markdown_content[current_pos:].strip()
+        sections.append(last_section)
+        sections_headings.append(headings[-1])
+        sections_with_headings.append(headings[-1] + "\n" + last_section)
+    return headings, sections, sections_headings, sections_with_headings
+
+
+def legacy_candidates(report, min_length=200):
+    _, _, _, sections_with_headings = legacy_extract_first_level_headings(report)
+    sections_with_headings = [s for s in sections_with_headings[1:-1] if 'https' not in s]
+    return [s for s in sections_with_headings if len(s) >= min_length][1:]
+
+
+def indexed_candidates(report, min_length=200):
+    view = SectionIndex(report).with_titles[1:-1]
+    keep = [i for i in range(len(view)) if not view.contains(i, 'https') and view.text_length(i) >= min_length]
+    return view.select(keep)[1:]
+
+
+def synthetic_report(size_bytes, sections, seed=0):
+    rng = random.Random(seed)
+    words = ["estrogen", "memory", "cortisol", "hippocampus", "study", "evidence", "signal", "tensor",
+             "the", "of", "and", "in", "attention", "plasticity", "cognition", "model"]
+    per_section = max(1, size_bytes // sections)
+    parts = ["# Synthetic report\n\nIntroductory paragraph before the first section.\n"]
+    for k in range(sections):
+        parts.append(f"\n## {k + 1}. Section {k + 1}\n\n")
+        body, length = [], 0
+        while length < per_section:
+            paragraph = " ".join(rng.choice(words) for _ in range(80)) + ".\n\n"
+            if rng.random() < 0.05:
+                paragraph = f"See https://example.org/{k}/{length} for details.\n\n"
+            body.append(paragraph)
+            length += len(paragraph)
+        parts.append("".join(body))
+    parts.append("\n## References\n\n" + "".join(f"[{i}] https://example.org/ref/{i}\n" for i in range(200)))
+    return "".join(parts)
+
+
+def measure(fn, report, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(report)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(report)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of report sectioning")
+    parser.add_argument("--sizes_mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--sections", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size_mb':>8} {'sections':>8} {'legacy_ms':>10} {'index_ms':>9} {'speedup':>8} {'legacy_peak_mb':>15} {'index_peak_mb':>14}")
+    for size_mb in args.sizes_mb:
+        report = synthetic_report(int(size_mb * 1024 * 1024), args.sections)
+        legacy_s, legacy_peak, legacy_result = measure(legacy_candidates, report, args.repeat)
+        index_s, index_peak, index_result = measure(indexed_candidates, report, args.repeat)
+        assert legacy_result == list(index_result), "SectionIndex candidates differ from the legacy splitter"
+        print(f"{size_mb:>8} {args.sections:>8} {legacy_s * 1000:>10.1f} {index_s * 1000:>9.1f} {legacy_s / index_s:>7.1f}x "
+              f"{legacy_peak / 2**20:>15.1f} {index_peak / 2**20:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
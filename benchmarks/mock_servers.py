@@ -0,0 +1,256 @@
+"""
+Local stand-ins for the OpenAI chat completions endpoint and the Jina Reader, used by the benchmark
+suite so that judge_fact.py / judge_score.py can be driven end to end without API costs.
+
+Both servers answer with deterministic content derived from the request, sleep according to a
+configurable latency distribution and fail a configurable fraction of requests.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class LatencyModel:
+    """
+    Latency distribution parsed from a spec string:
+        - 'fixed:MS'
+        - 'uniform:LO_MS,HI_MS'
+        - 'lognormal:MEDIAN_MS,SIGMA'
+    """
+
+    def __init__(self, spec: str = "fixed:0", seed: int = 0):
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.kind = kind
+        self.values = values
+        self.spec = spec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Seconds to wait before answering."""
+        with self._lock:
+            if self.kind == "fixed":
+                ms = self.values[0] if self.values else 0.0
+            elif self.kind == "uniform":
+                ms = self._rng.uniform(self.values[0], self.values[1])
+            else:
+                median, sigma = self.values
+                ms = self._rng.lognormvariate(math.log(median), sigma)
+        return ms / 1000
+
+
+def _digest(*parts: str) -> int:
+    return int(hashlib.md5("\x00".join(parts).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def canned_verdict(body: Dict[str, Any]) -> str:
+    """Deterministic judge answer in the JSON shape the request asks for."""
+    messages = body.get("messages") or [{}]
+    system = messages[0].get("content") or ""
+    user = messages[-1].get("content") or ""
+    schema_name = ((body.get("response_format") or {}).get("json_schema") or {}).get("name", "")
+    h = _digest(system[:200], user)
+
+    if schema_name == "quality_result" or "quality evaluation" in system:
+        scores = [1 + (h >> shift) % 4 for shift in (0, 3, 6, 9, 12)]
+        return json.dumps({
+            "Reason": "Mock assessment of structure, depth and originality.",
+            "Comprehensiveness_Score": scores[0],
+            "Coherence_Score": scores[1],
+            "Clarity_Score": scores[2],
+            "Insightfulness_Score": scores[3],
+            "Overall_Score": scores[4],
+        })
+    if schema_name == "fact_check_batch_result" or "numbered list of sentences" in system:
+        claims = re.findall(r"Claim \[(\d+)\]", user)
+        results = [
+            {"id": int(i), "is_factual": (h >> int(i)) % 3 - 1, "sentence_support": f"Mock support for claim {i}."}
+            for i in claims
+        ]
+        return json.dumps({"results": results} if schema_name else results)
+    if schema_name == "fact_check_result" or "Factual Evaluation" in system:
+        return json.dumps({"is_factual": h % 3 - 1, "sentence_support": "Mock supporting sentence."})
+    return json.dumps({
+        "score": h % 5,
+        "explanation": "Mock repetition assessment.",
+        "repetitions_found": [] if h % 5 == 4 else ["Mock repeated point."],
+        "confidence": f"{60 + h % 40}%",
+    })
+
+
+def mock_page(url: str, page_kb: float) -> str:
+    """Deterministic markdown page of roughly page_kb kilobytes for a URL."""
+    rng = random.Random(_digest(url))
+    words = ["signal", "noise", "memory", "hormone", "estrogen", "cortisol", "attention", "model",
+             "seismic", "tensor", "cognition", "plasticity", "study", "evidence", "component", "data"]
+    parts = [f"# Mock page for {url}\n"]
+    size = len(parts[0])
+    section = 0
+    while size < page_kb * 1024:
+        if section % 5 == 0:
+            parts.append(f"\n## Section {section // 5 + 1}\n")
+        paragraph = " ".join(rng.choice(words) for _ in range(60)) + "."
+        parts.append("\n" + paragraph + "\n")
+        size += len(paragraph) + 2
+        section += 1
+    return "".join(parts)
+
+
+class _MockServer:
+    """ThreadingHTTPServer on 127.0.0.1 running in a daemon thread."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, seed: int = 0, port: int = 0):
+        self.latency = LatencyModel(latency, seed)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed + 1)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self) -> bool:
+        with self._rng_lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            self.errors += int(fail)
+            return fail
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _LLMHandler(_QuietHandler):
+    def do_POST(self):
+        mock = self.server.mock
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        time.sleep(mock.latency.sample())
+        if mock.should_fail():
+            self._send_json(500, {"error": {"message": "Mock server error", "type": "server_error"}})
+            return
+        content = canned_verdict(body)
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{mock.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class MockLLMServer(_MockServer):
+    """OpenAI-compatible POST /v1/chat/completions returning canned judge verdicts."""
+
+    handler_class = _LLMHandler
+
+    @property
+    def base_url(self) -> str:
+        return self.url + "/v1"
+
+
+class _ReaderHandler(_QuietHandler):
+    def do_GET(self):
+        mock = self.server.mock
+        target = self.path.lstrip("/")
+        time.sleep(mock.latency.sample())
+        if mock.should_fail():
+            self._send_json(503, {"code": 503, "message": "Mock reader unavailable"})
+            return
+        self._send_json(200, {"code": 200, "data": {
+            "url": target,
+            "title": f"Mock page {_digest(target) % 10000}",
+            "description": "Mock page served by benchmarks/mock_servers.py",
+            "content": mock_page(target, mock.page_kb),
+        }})
+
+
+class MockReaderServer(_MockServer):
+    """Jina Reader stand-in: GET /<url> returns a JSON envelope with generated page markdown."""
+
+    handler_class = _ReaderHandler
+
+    def __init__(self, page_kb: float = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.page_kb = page_kb
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the mock LLM and reader servers until interrupted.")
+    parser.add_argument("--llm_port", type=int, default=8010)
+    parser.add_argument("--reader_port", type=int, default=8011)
+    parser.add_argument("--llm_latency", default="lognormal:400,0.5", help="fixed:MS | uniform:LO,HI | lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--reader_latency", default="lognormal:800,0.6")
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--page_kb", type=float, default=20)
+    args = parser.parse_args()
+    llm = MockLLMServer(latency=args.llm_latency, error_rate=args.error_rate, port=args.llm_port).start()
+    reader = MockReaderServer(page_kb=args.page_kb, latency=args.reader_latency, error_rate=args.error_rate, port=args.reader_port).start()
+    print(f"OPENAI_API_BASE={llm.base_url}")
+    print(f"JINA_READER_BASE={reader.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        llm.stop()
+        reader.stop()
+
+
+if __name__ == "__main__":
+    main()
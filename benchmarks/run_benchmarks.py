@@ -0,0 +1,224 @@
+"""
+End-to-end throughput benchmark of judge_score.py and judge_fact.py against local mock servers.
+
+Starts the mock OpenAI and Jina Reader servers from mock_servers.py, runs both pipelines as
+subprocesses (so peak RSS is measured per pipeline) and reports reports/sec, claims/sec,
+p50/p99 call latency and peak RSS. Results are printed as a table and appended to a JSONL file
+together with the git commit, so runs can be compared across versions.
+
+Example:
+    python benchmarks/run_benchmarks.py --reports 20 --fact_lines 50 --llm_latency lognormal:300,0.5
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from mock_servers import MockLLMServer, MockReaderServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REPORTS = os.path.join(REPO_ROOT, "data", "report", "qwen-reports.jsonl")
+DEFAULT_FACT_INPUT = os.path.join(REPO_ROOT, "example", "judge_fact_result", "example_fact_judge_input.jsonl")
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_pipeline(cmd: List[str], env: Dict[str, str], cwd: str, log_path: str) -> Dict[str, Any]:
+    """
+    Run one pipeline to completion.
+    Returns:
+        {"returncode", "wall_s", "peak_rss_mb"}
+    """
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reports the resource usage of exactly this child
+        _, status, rusage = os.wait4(proc.pid, 0)
+    wall_s = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss_mb = rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"returncode": proc.returncode, "wall_s": round(wall_s, 3), "peak_rss_mb": round(peak_rss_mb, 1)}
+
+
+def latency_stats(metrics_path: str) -> Dict[str, Dict[str, Any]]:
+    """p50/p99 latency and call counts per stage from a --metrics_path JSONL file."""
+    latencies: Dict[str, List[float]] = {}
+    if os.path.exists(metrics_path):
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    latencies.setdefault(record.get("stage", "llm"), []).append(record.get("latency_s", 0.0))
+    return {
+        stage: {"calls": len(values), "p50_s": round(_percentile(values, 0.5), 4), "p99_s": round(_percentile(values, 0.99), 4)}
+        for stage, values in sorted(latencies.items())
+    }
+
+
+def write_fact_input(source: str, path: str, lines: int) -> int:
+    """
+    Write a judge_fact input of the given number of lines by cycling the source lines, giving
+    every copy distinct URLs so that grouping and caching do not collapse them.
+    Returns:
+        total number of claims (contexts) in the written input
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    claims = 0
+    with open(path, "w", encoding="utf-8") as out:
+        for i in range(lines):
+            record = records[i % len(records)]
+            copy = {}
+            for url, value in record.items():
+                separator = "&" if "?" in url else "?"
+                copy[f"{url}{separator}bench={i}"] = value
+                claims += len(value.get("contexts", []))
+            out.write(json.dumps(copy, ensure_ascii=False) + "\n")
+    return claims
+
+
+def write_report_input(source: str, path: str, reports: int) -> int:
+    written = 0
+    with open(source, "r", encoding="utf-8") as f, open(path, "w", encoding="utf-8") as out:
+        for line in f:
+            if written >= reports:
+                break
+            if line.strip():
+                out.write(line)
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of judge_score.py and judge_fact.py against local mock servers")
+    parser.add_argument("--reports", type=int, default=100, help="Number of reports from --report_input fed to judge_score.py")
+    parser.add_argument("--report_input", default=DEFAULT_REPORTS)
+    parser.add_argument("--fact_lines", type=int, default=20, help="Number of judge_fact.py input lines (the fact input is cycled with distinct URLs)")
+    parser.add_argument("--fact_input", default=DEFAULT_FACT_INPUT)
+    parser.add_argument("--concurrency", type=int, default=8, help="judge_score.py --concurrency")
+    parser.add_argument("--llm_latency", default="lognormal:300,0.5", help="fixed:MS | uniform:LO_MS,HI_MS | lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--reader_latency", default="lognormal:500,0.6", help="Latency distribution of the mock Jina Reader")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of mock requests answered with a server error")
+    parser.add_argument("--page_kb", type=float, default=20, help="Size of each mock page in KB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", choices=["score", "fact"], default=None, help="Run a single pipeline")
+    parser.add_argument("--pipeline_args", default="", help="Extra arguments passed to both pipelines, e.g. '--fact_batch_size 8'")
+    parser.add_argument("--results", default=os.path.join(REPO_ROOT, "exp", "benchmarks.jsonl"), help="JSONL file the run summary is appended to")
+    parser.add_argument("--keep_workdir", action="store_true", help="Keep outputs, logs and metrics of the pipelines")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="deepresearch-bench-")
+    llm = MockLLMServer(latency=args.llm_latency, error_rate=args.error_rate, seed=args.seed).start()
+    reader = MockReaderServer(page_kb=args.page_kb, latency=args.reader_latency, error_rate=args.error_rate, seed=args.seed).start()
+    env = {
+        **os.environ,
+        "OPENAI_API_BASE": llm.base_url,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "JINA_READER_BASE": reader.url,
+        "JINA_API_KEY": "Bearer benchmark",
+        "FIRECRAWL_KEY": "fc-benchmark",
+        "PYTHONUNBUFFERED": "1",
+    }
+    extra = args.pipeline_args.split()
+    summary: Dict[str, Any] = {
+        "ts": round(time.time(), 3),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("results", "keep_workdir")},
+        "pipelines": {},
+    }
+
+    try:
+        if args.only in (None, "score"):
+            report_input = os.path.join(workdir, "reports.jsonl")
+            reports = write_report_input(args.report_input, report_input, args.reports)
+            metrics_path = os.path.join(workdir, "score_metrics.jsonl")
+            cmd = [
+                sys.executable, os.path.join(REPO_ROOT, "judge_score.py"),
+                "--inputpath", report_input,
+                "--outputpath", os.path.join(workdir, "score_out"),
+                "--concurrency", str(args.concurrency),
+                "--metrics_path", metrics_path,
+                *extra,
+            ]
+            print(f"Running judge_score.py over {reports} reports ...")
+            run = run_pipeline(cmd, env, workdir, os.path.join(workdir, "judge_score.log"))
+            summary["pipelines"]["judge_score"] = {
+                **run,
+                "reports": reports,
+                "reports_per_s": round(reports / run["wall_s"], 3),
+                "latency": latency_stats(metrics_path),
+            }
+
+        if args.only in (None, "fact"):
+            fact_input = os.path.join(workdir, "facts.jsonl")
+            claims = write_fact_input(args.fact_input, fact_input, args.fact_lines)
+            metrics_path = os.path.join(workdir, "fact_metrics.jsonl")
+            cmd = [
+                sys.executable, os.path.join(REPO_ROOT, "judge_fact.py"),
+                "--inputpath", fact_input,
+                "--outputpath", os.path.join(workdir, "fact_out.jsonl"),
+                "--provider", "jina",
+                "--metrics_path", metrics_path,
+                *extra,
+            ]
+            print(f"Running judge_fact.py over {args.fact_lines} lines ({claims} claims) ...")
+            run = run_pipeline(cmd, env, workdir, os.path.join(workdir, "judge_fact.log"))
+            summary["pipelines"]["judge_fact"] = {
+                **run,
+                "claims": claims,
+                "claims_per_s": round(claims / run["wall_s"], 3),
+                "latency": latency_stats(metrics_path),
+            }
+    finally:
+        llm.stop()
+        reader.stop()
+
+    summary["mock"] = {
+        "llm_requests": llm.requests, "llm_errors": llm.errors,
+        "reader_requests": reader.requests, "reader_errors": reader.errors,
+    }
+
+    print(f"\n{'pipeline':<12} {'rc':>3} {'wall_s':>8} {'items/s':>9} {'peak_rss_mb':>12}  stage latency p50/p99 (s)")
+    for name, result in summary["pipelines"].items():
+        rate = result.get("reports_per_s", result.get("claims_per_s"))
+        unit = "reports" if "reports_per_s" in result else "claims"
+        stages = ", ".join(f"{stage} {s['p50_s']}/{s['p99_s']} (n={s['calls']})" for stage, s in result["latency"].items())
+        print(f"{name:<12} {result['returncode']:>3} {result['wall_s']:>8} {rate:>9} {result['peak_rss_mb']:>12}  {stages}  [{unit}/s]")
+    print(f"mock: {summary['mock']}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    print(f"Summary appended to {args.results}")
+
+    if args.keep_workdir:
+        print(f"Pipeline outputs and logs kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if any(result["returncode"] != 0 for result in summary["pipelines"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,25 @@
 import copy
+import hashlib
 import os
 import re
+import sys
 import json
 import argparse
-from tqdm import tqdm
-from typing import Dict, Any
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional
 
-from Atools import SearchAgent, check_factual
+from Atools import (
+    SearchAgent, BM25Index, check_factual, check_factual_batch, configure_judge_models, configure_llm_cache, configure_metrics, configure_rate_limiter, configure_structured_outputs,
+    estimate_tokens, fact_check_messages, fact_check_batch_messages, get_client, judge_params, judge_stats, parse_fact_check_response, parse_batch_fact_labels,
+)
+from Abatch import BatchRequestWriter, read_batch_results
+from Ametrics import metrics_tags
+from Atrace import configure_tracing, span
+from Acache import PageCache
+from Aresults import truncate_partial_line
+from Aclaims import write_claims_jsonl
+from Ashard import Shard, parse_shard, shard_path
 
 
 def normalize_url(raw_key: str) -> str:
@@ -27,6 +40,7 @@ def process_obj(agent: SearchAgent, data: Dict[str, Any], provider: str) -> Dict
     Process a single JSON object (like { url_key: {"contexts": [...], ...}, ... }).
     Return an object with normalized URL as key and 'md' field added.
     """
+    from tqdm import tqdm
     normalized_data: Dict[str, Any] = {}
     for raw_url, payload in tqdm(data.items()):
         url = normalize_url(raw_url)
@@ -40,52 +54,572 @@ def process_obj(agent: SearchAgent, data: Dict[str, Any], provider: str) -> Dict
 
     return normalized_data
 
-def process_record_judge(agent: SearchAgent, obj: Dict[str, Any], provider: str):
+def parse_record(obj: Any):
     """
-    Process a record (like { raw_url: {"contexts": [...], ...} }):
-    - Normalize URL
-    - Scrape md
-    - Call check_factual for each context, output {url, context, label}
-    Return: List[Dict]
+    Split a record (like { raw_url: {"contexts": [...], ...} }) into its normalized URL and contexts.
+    Return: (url, contexts), or (None, error_record) if the record is malformed
     """
     if not isinstance(obj, Dict) or len(obj) != 1:
-        return [{
+        return None, {
             "__PARSE_ERROR__": "Each line must contain exactly one key (url).",
             "__raw__": obj
-        }]
+        }
     (raw_url, payload), = obj.items()
     url = normalize_url(raw_url)
     contexts = []
     if isinstance(payload, dict):
         contexts = payload.get("contexts", [])
-    try:
-        page_content = agent.scrape(url, provider=provider)
-    except Exception as e:
-        page_content = f"__SCRAPE_ERROR__: {e}"
+    return url, contexts
+
+class PageEvidence:
+    """
+    Retrieval state for one scraped page. The BM25 index is built once and reused for every claim
+    citing the page, so check_factual only receives the top-k passages within the token budget.
+    """
+
+    def __init__(self, page_content: Any, top_k: int = 5, token_budget: int = 3000):
+        self.page_content = page_content
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.index = None
+        if isinstance(page_content, str) and not page_content.startswith("__SCRAPE_ERROR__"):
+            self.page_tokens = estimate_tokens(page_content)
+            if self.page_tokens > token_budget:
+                self.index = BM25Index.from_markdown(page_content)
+
+    def for_claims(self, claims: List[str]):
+        """
+        Return: (evidence, page_metrics) for the claims; the whole page if it already fits the budget
+        """
+        if self.index is None:
+            if not isinstance(self.page_content, str) or self.page_content.startswith("__SCRAPE_ERROR__"):
+                return self.page_content, None
+            evidence = self.page_content
+        else:
+            evidence, _ = self.index.select_evidence(claims, top_k=self.top_k, token_budget=self.token_budget)
+            if not evidence:
+                # No passage shares a term with the claims: fall back to the beginning of the page
+                evidence = self.page_content[:self.token_budget * 4]
+        evidence_tokens = estimate_tokens(evidence)
+        page_metrics = {
+            "page_tokens": self.page_tokens,
+            "evidence_tokens": evidence_tokens,
+            "token_reduction": round(1 - evidence_tokens / self.page_tokens, 4) if self.page_tokens else 0.0,
+        }
+        return evidence, page_metrics
+
+def scrape_failed(page_content: Any) -> bool:
+    """Whether a scrape returned no usable page (no content or a __SCRAPE_ERROR__ marker)."""
+    return not page_content or isinstance(page_content, str) and page_content.startswith("__SCRAPE_ERROR__")
+
+def is_verdict(label: Any) -> bool:
+    """Whether a result label is a fact-check verdict, as opposed to an error label (string or {"error": ...})."""
+    return isinstance(label, dict) and label.get("is_factual") is not None
+
+def judge_contexts(url: str, contexts: List[Any], page_content: Any, verdicts: Dict[str, Any] = None, batch_size: int = 1, evidence: PageEvidence = None):
+    """
+    Call check_factual for each context against an already scraped page, output {url, context, label}.
+    A page that could not be scraped is not sent to the judge: its contexts get an __ERROR__ label.
+    verdicts: optional memo of context -> result fields for this page, so repeated contexts are checked once
+    batch_size: if > 1, verify up to batch_size contexts per call with check_factual_batch
+    evidence: optional PageEvidence; only the retrieved passages are sent and page_metrics is added to each result
+    Return: List[Dict]
+    """
+    if verdicts is None:
+        verdicts = {}
+    pending = []
+    for c in contexts:
+        if isinstance(c, str) and c not in verdicts and c not in pending:
+            pending.append(c)
+    step = max(1, batch_size)
+    for start in range(0, len(pending), step):
+        chunk = pending[start:start + step]
+        page_text, page_metrics = page_content, None
+        if evidence is not None:
+            page_text, page_metrics = evidence.for_claims(chunk)
+        try:
+            if scrape_failed(page_content):
+                reason = page_content[len("__SCRAPE_ERROR__: "):] if page_content else "no content"
+                labels = [f"__ERROR__: scrape failed: {reason}"] * len(chunk)
+            elif batch_size > 1:
+                labels = check_factual_batch(chunk, page_text)
+            else:
+                labels = [check_factual(chunk[0], page_text)]
+        except Exception as e:
+            labels = [f"__ERROR__: {e}"] * len(chunk)
+        for c, label in zip(chunk, labels):
+            verdicts[c] = {"label": label}
+            if page_metrics is not None:
+                verdicts[c]["page_metrics"] = page_metrics
     results = []
     for c in contexts:
         if not isinstance(c, str):
             continue
-        try:
-            label = check_factual(c, page_content)
-        except Exception as e:
-            label = f"__ERROR__: {e}"
-        results.append({"url": url, "context": c, "label": label})
+        results.append({"url": url, "context": c, **verdicts[c]})
     return results
 
+def scrape_page(agent: SearchAgent, url: str, provider: str):
+    try:
+        return agent.scrape(url, provider=provider)
+    except Exception as e:
+        return f"__SCRAPE_ERROR__: {e}"
+
+class CompletedResults:
+    """
+    Multiset of the records already present in a judge output file, used to resume a run.
+    Completed (url, context) pairs and error records are consumed in input order, so a context
+    repeated on several lines is only skipped as many times as it was written. Only verdicts
+    count as completed: records with an error label (failed scrape or judge call) are removed
+    from the output and judged again.
+    """
+
+    def __init__(self):
+        self.pairs: Counter = Counter()
+        self.errors: Counter = Counter()
+        # Error-labelled records dropped from the output by from_output
+        self.retried = 0
+
+    @classmethod
+    def from_output(cls, path: str) -> "CompletedResults":
+        """
+        Index an existing output file, dropping a partial last line left by an interrupted run.
+        Records with an error label are rewritten out of the file, so their new verdicts replace them.
+        """
+        completed = cls()
+        if not os.path.exists(path):
+            return completed
+        truncate_partial_line(path)
+        tmp_path = path + ".resume.tmp"
+        with open(path, "r", encoding="utf-8") as f, open(tmp_path, "w", encoding="utf-8") as fkeep:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "url" in record and "context" in record:
+                    if not is_verdict(record.get("label")):
+                        completed.retried += 1
+                        continue
+                    completed.pairs[(record["url"], record["context"])] += 1
+                else:
+                    completed.errors[json.dumps(record, sort_keys=True, ensure_ascii=False)] += 1
+                fkeep.write(line)
+        if completed.retried:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+        return completed
+
+    def take_error(self, record: Dict[str, Any]) -> bool:
+        """Consume an error record; True if it was already written."""
+        key = json.dumps(record, sort_keys=True, ensure_ascii=False)
+        if self.errors[key] > 0:
+            self.errors[key] -= 1
+            return True
+        return False
+
+    def remaining(self, url: str, contexts: List[Any]) -> List[str]:
+        """Consume the completed contexts of a line and return the ones still to be judged."""
+        pending = []
+        for c in contexts:
+            if not isinstance(c, str):
+                continue
+            if self.pairs[(url, c)] > 0:
+                self.pairs[(url, c)] -= 1
+            else:
+                pending.append(c)
+        return pending
+
+    def __len__(self):
+        return sum(self.pairs.values()) + sum(self.errors.values())
+
+class CommittedWriter:
+    """
+    Text output flushed and fsynced every commit_every records, so an interrupted run loses at
+    most one batch of results. Used like a file object: one write() call per JSONL record.
+    """
+
+    def __init__(self, path: str, mode: str = "w", commit_every: int = 100):
+        self._file = open(path, mode, encoding="utf-8")
+        self.commit_every = max(1, commit_every)
+        self.pending = 0
+
+    def write(self, text: str):
+        self._file.write(text)
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        with span("commit_output", records=self.pending):
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.pending = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.commit()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def skip_completed(lines: "PlannedLines", completed: CompletedResults):
+    """
+    Resume: remove everything already present in the output from a planned input.
+    Return: (lines, groups) in the format of plan_url_groups, holding only the remaining contexts
+    """
+    remaining_lines = PlannedLines(lines.path)
+    groups: Dict[str, List[int]] = {}
+    for idx, (url, payload) in enumerate(lines):
+        if url is None:
+            if not completed.take_error(payload):
+                remaining_lines.append(url, lines.offsets[idx])
+            continue
+        contexts = completed.remaining(url, payload)
+        if contexts:
+            groups.setdefault(url, []).append(len(remaining_lines))
+            # Only lines with some contexts already done keep their remaining contexts in memory
+            narrowed = len(contexts) != sum(1 for c in payload if isinstance(c, str))
+            remaining_lines.append(url, lines.offsets[idx], contexts if narrowed else None)
+    return remaining_lines, groups
+
+def process_record_judge(agent: SearchAgent, obj: Dict[str, Any], provider: str, batch_size: int = 1, retrieval: Dict[str, int] = None, completed: CompletedResults = None):
+    """
+    Process a record (like { raw_url: {"contexts": [...], ...} }):
+    - Normalize URL
+    - Scrape md
+    - Call check_factual for each context, output {url, context, label}
+    completed: optional CompletedResults; contexts already in the output are skipped
+    Return: List[Dict]
+    """
+    url, contexts = parse_record(obj)
+    if url is None:
+        if completed is not None and completed.take_error(contexts):
+            return []
+        return [contexts]
+    if completed is not None:
+        contexts = completed.remaining(url, contexts)
+        if not contexts:
+            return []
+    with metrics_tags(url=url):
+        page_content = scrape_page(agent, url, provider)
+        evidence = PageEvidence(page_content, **retrieval) if retrieval else None
+        return judge_contexts(url, contexts, page_content, batch_size=batch_size, evidence=evidence)
+
+def line_shard_key(obj: Any) -> Optional[str]:
+    """Shard key of an input line: the normalized URL of its first key (None if it has none)."""
+    if isinstance(obj, dict) and obj:
+        return normalize_url(next(iter(obj)))
+    return None
+
+def parse_input_line(line: str):
+    """(url, contexts) of a stripped input line, or (None, error_record) if it is not valid JSON or malformed."""
+    try:
+        obj = json.loads(line)
+    except Exception as e:
+        return None, {"__PARSE_ERROR__": str(e), "__raw__": line}
+    return parse_record(obj)
+
+class PlannedLines:
+    """
+    Sequence of the planned lines of an input file, each (url, contexts) or (None, error_record).
+    Only the URL and byte offset of a line are kept; its contexts are read back from the input
+    when it is accessed, so planning memory grows with the number of lines, not their contexts.
+    A line can carry its contexts instead (e.g. the remaining ones of a resumed line).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.urls: List[Optional[str]] = []
+        self.offsets = array("q")
+        self.contexts: Dict[int, List[str]] = {}
+
+    def append(self, url: Optional[str], offset: int, contexts: List[str] = None):
+        if contexts is not None:
+            self.contexts[len(self.urls)] = contexts
+        self.urls.append(url)
+        self.offsets.append(offset)
+
+    def url(self, idx: int) -> Optional[str]:
+        return self.urls[idx]
+
+    def _read(self, f, idx: int):
+        if idx in self.contexts:
+            return self.urls[idx], self.contexts[idx]
+        f.seek(self.offsets[idx])
+        url, payload = parse_input_line(f.readline().decode("utf-8").strip())
+        return self.urls[idx], payload
+
+    def __getitem__(self, idx: int):
+        with open(self.path, "rb") as f:
+            return self._read(f, idx)
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            for idx in range(len(self.urls)):
+                yield self._read(f, idx)
+
+    def __len__(self):
+        return len(self.urls)
+
+    @property
+    def records(self) -> int:
+        """Number of lines with a URL (not error records)."""
+        return sum(1 for url in self.urls if url is not None)
+
+def plan_url_groups(input_path: str, shard: Shard = None):
+    """
+    Planning pass: stream the input once and group the lines by normalized URL.
+    shard: optional Shard; only the lines whose URL belongs to it are planned
+    Return:
+        lines: PlannedLines with one entry per non-empty input line, (url, contexts) or (None, error_record)
+        groups: url -> indices into lines, ordered by first appearance of the url
+    """
+    lines = PlannedLines(input_path)
+    groups: Dict[str, List[int]] = {}
+    offset = 0
+    with open(input_path, "rb") as fin:
+        for raw in fin:
+            line_offset, offset = offset, offset + len(raw)
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception:
+                if shard is None or shard.owns(None):
+                    lines.append(None, line_offset)
+                continue
+            if shard is not None and not shard.owns(line_shard_key(obj)):
+                continue
+            url, _ = parse_record(obj)
+            if url is not None:
+                # One string object per URL, however many lines cite it
+                url = sys.intern(url)
+                groups.setdefault(url, []).append(len(lines))
+            lines.append(url, line_offset)
+    return lines, groups
+
+def unique_contexts(contexts_lists):
+    """Unique string contexts across several lines, in order of first appearance."""
+    seen = {}
+    for contexts in contexts_lists:
+        for c in contexts:
+            if isinstance(c, str):
+                seen.setdefault(c, None)
+    return list(seen)
+
+def judge_url_groups(agent: SearchAgent, lines, groups, provider: str, fout, batch_size: int = 1, retrieval: Dict[str, int] = None):
+    """
+    Scrape each unique page exactly once, judge all of its contexts, and write results in the
+    original line order. Lines are flushed as soon as every line before them is complete.
+    Return: number of record lines processed
+    """
+    line_results: Dict[int, List[Dict]] = {}
+    next_line = 0
+
+    def flush_ready_lines():
+        nonlocal next_line
+        while next_line < len(lines):
+            if lines.url(next_line) is None:
+                # Error records are written as they are
+                results = [lines[next_line][1]]
+            elif next_line in line_results:
+                results = line_results.pop(next_line)
+            else:
+                break
+            for r in results:
+                fout.write(json.dumps(r, ensure_ascii=False) + "\n")
+            next_line += 1
+
+    from tqdm import tqdm
+    flush_ready_lines()
+    for url, line_ids in tqdm(groups.items(), desc="pages"):
+        with metrics_tags(url=url):
+            page_content = scrape_page(agent, url, provider)
+            evidence = PageEvidence(page_content, **retrieval) if retrieval else None
+            verdicts: Dict[str, Any] = {}
+            # The contexts of the group are read back from the input only now
+            contexts = {idx: lines[idx][1] for idx in line_ids}
+            # Judge the contexts of all lines citing this page together, so claim batches span lines
+            judge_contexts(url, unique_contexts(contexts.values()), page_content, verdicts, batch_size=batch_size, evidence=evidence)
+            for idx in line_ids:
+                line_results[idx] = judge_contexts(url, contexts[idx], page_content, verdicts, batch_size=batch_size, evidence=evidence)
+        flush_ready_lines()
+    return lines.records
+
+def build_fact_batch(agent: SearchAgent, lines, groups, provider: str, writer: BatchRequestWriter, plan_path: str, batch_size: int = 1, retrieval: Dict[str, int] = None, model: str = "gpt-4o"):
+    """
+    Batch phase 1: scrape each unique page once and write its fact-check requests to the batch file.
+    The plan file maps every custom_id to its url, contexts and page_metrics for the ingest phase.
+    Return: number of requests written
+    """
+    from tqdm import tqdm
+    step = max(1, batch_size)
+    with open(plan_path, "w", encoding="utf-8") as fplan:
+        for url, line_ids in tqdm(groups.items(), desc="pages"):
+            page_content = scrape_page(agent, url, provider)
+            evidence = PageEvidence(page_content, **retrieval) if retrieval else None
+            contexts = unique_contexts(lines[idx][1] for idx in line_ids)
+            url_key = hashlib.md5(url.encode("utf-8")).hexdigest()
+            for k, start in enumerate(range(0, len(contexts), step)):
+                chunk = contexts[start:start + step]
+                page_text, page_metrics = page_content, None
+                if evidence is not None:
+                    page_text, page_metrics = evidence.for_claims(chunk)
+                if len(chunk) > 1:
+                    messages, judge = fact_check_batch_messages(chunk, page_text), "fact_check_batch"
+                else:
+                    messages, judge = fact_check_messages(chunk[0], page_text), "fact_check"
+                custom_id = f"fact::{url_key}::{k}"
+                writer.add(custom_id, messages, model=model, **judge_params(judge))
+                fplan.write(json.dumps({"custom_id": custom_id, "url": url, "contexts": chunk, "page_metrics": page_metrics}, ensure_ascii=False) + "\n")
+    return len(writer.custom_ids)
+
+def ingest_fact_batch(lines, plan_path: str, results_path: str, fout):
+    """
+    Batch phase 2: read the completed batch results and write the usual {url, context, label}
+    records in the original line order. Failed or malformed requests get an error label.
+    Return: number of record lines written
+    """
+    results = read_batch_results(results_path)
+    verdicts: Dict[str, Dict[str, Any]] = {}
+    with open(plan_path, "r", encoding="utf-8") as fplan:
+        for line in fplan:
+            entry = json.loads(line)
+            contexts = entry["contexts"]
+            result = results.get(entry["custom_id"])
+            if result is None or result["content"] is None:
+                error = "missing from batch results" if result is None else result["error"]
+                labels = [f"__ERROR__: batch request {entry['custom_id']} failed: {error}"] * len(contexts)
+            elif len(contexts) > 1:
+                labels = parse_batch_fact_labels(result["content"], len(contexts))
+                if labels is None:
+                    labels = [{"error": "Failed to parse batched JSON response", "raw_response": result["content"]}] * len(contexts)
+            else:
+                labels = [parse_fact_check_response(result["content"])]
+            page_verdicts = verdicts.setdefault(entry["url"], {})
+            for c, label in zip(contexts, labels):
+                page_verdicts[c] = {"label": label}
+                if entry.get("page_metrics") is not None:
+                    page_verdicts[c]["page_metrics"] = entry["page_metrics"]
+    missing = "__ERROR__: context not found in batch plan"
+    for url, payload in lines:
+        if url is None:
+            fout.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            continue
+        page_verdicts = verdicts.get(url, {})
+        for c in payload:
+            if not isinstance(c, str):
+                continue
+            record = {"url": url, "context": c, **page_verdicts.get(c, {"label": missing})}
+            fout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return lines.records
+
+def process_lines(agent: SearchAgent, input_path: str, output_path: str, task: str, provider: str, batch_size: int = 1, retrieval: Dict[str, int] = None, completed: CompletedResults = None, commit_every: int = 100, shard: Shard = None):
+    """
+    Process the input line by line, scraping the URL(s) of every line.
+    completed: optional CompletedResults of the judge task; the output is appended to and only missing contexts are judged
+    shard: optional Shard; lines whose (first) URL belongs to another shard are skipped
+    Return: number of lines processed
+    """
+    count = 0
+    with open(input_path, "r", encoding="utf-8") as fin, \
+         CommittedWriter(output_path, "a" if completed is not None else "w", commit_every) as fout:
+        for line in fin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception as e:
+                if shard is not None and not shard.owns(None):
+                    continue
+                error_record = {"__PARSE_ERROR__": str(e), "__raw__": line}
+                if completed is None or not completed.take_error(error_record):
+                    fout.write(json.dumps(error_record, ensure_ascii=False) + "\n")
+                continue
+            if shard is not None and not shard.owns(line_shard_key(obj)):
+                continue
+            if task == "scrape":
+                result = process_obj(agent, obj, provider=provider)
+                fout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            else:
+                results = process_record_judge(agent, obj, provider=provider, batch_size=batch_size, retrieval=retrieval, completed=completed)
+                for r in results:
+                    fout.write(json.dumps(r, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
 def main():
     parser = argparse.ArgumentParser(description="Compare contexts with scraped pages and summarize -1/0/1.")
     parser.add_argument("--inputpath", required=True, help="Input .jsonl file path, process line by line")
+    parser.add_argument("--input_format", choices=["claims", "reports"], default="claims", help="claims: {url: {\"contexts\": [...]}} lines; reports: the judge_score.py report JSONL, whose cited sentences are first extracted to <output>.claims.jsonl")
+    parser.add_argument("--min_claim_chars", type=int, default=20, help="reports input: drop extracted claims shorter than this many characters")
     parser.add_argument("--outputpath", required=True, help="Output file path or directory (will generate same-named .out.jsonl or .judge.jsonl in directory)")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="Process only partition i/N of the input (0 <= i < N), assigned by normalized URL; the output, metrics, trace and batch files get a .shard-i-of-N suffix")
     parser.add_argument("--provider", choices=["firecrawl", "jina"], default="jina", help="Scraping provider")
     parser.add_argument("--limit", type=int, default=3, help="SearchAgent.num_limit_pages")
     parser.add_argument("--task", choices=["scrape", "judge"], default="judge", help="scrape only scrapes and outputs objects with md; judge directly outputs judgment results")
+    parser.add_argument("--group_by_url", action=argparse.BooleanOptionalAction, default=True, help="judge task: plan the input first and scrape each unique URL once (--no-group_by_url processes line by line)")
+    parser.add_argument("--fact_batch_size", type=int, default=1, help="judge task: maximum number of contexts verified against a page in one LLM call (1 = one call per context)")
+    parser.add_argument("--retrieval_top_k", type=int, default=0, help="judge task: send only the top-k BM25 passages per claim instead of the whole page (0 = whole page)")
+    parser.add_argument("--retrieval_token_budget", type=int, default=3000, help="judge task: maximum estimated tokens of page evidence per check when retrieval is enabled")
+    parser.add_argument("--resume", action="store_true", help="judge task: keep the existing output, skip the (url, context) pairs it already holds and append only the missing ones")
+    parser.add_argument("--commit_every", type=int, default=100, help="Flush and fsync the output every N records")
+    parser.add_argument("--batch_phase", choices=["build", "ingest"], default=None, help="judge task, offline Batch API mode: build writes all requests to --batch_file; ingest assembles the output from --batch_results")
+    parser.add_argument("--batch_file", default=None, help="Batch request JSONL (its plan is stored next to it as <batch_file>.plan.jsonl)")
+    parser.add_argument("--batch_results", default=None, help="Completed batch result JSONL for --batch_phase ingest")
+    parser.add_argument("--jina_pool_size", type=int, default=16, help="Keep-alive connections in the Jina HTTP pool")
+    parser.add_argument("--jina_connect_timeout", type=float, default=10, help="Seconds allowed to connect to Jina Reader")
+    parser.add_argument("--jina_read_timeout", type=float, default=90, help="Total seconds allowed to receive a Jina Reader response")
+    parser.add_argument("--page_cache", default=None, help="SQLite file for the persistent scraped-page cache (disabled if not set)")
+    parser.add_argument("--page_cache_ttl_hours", type=float, default=168, help="Re-scrape cached pages older than this many hours (<= 0: never expire)")
+    parser.add_argument("--structured_outputs", action=argparse.BooleanOptionalAction, default=True, help="Request JSON-schema structured outputs for fact checks (falls back automatically if the backend rejects them)")
+    parser.add_argument("--judge_model", default="gpt-4o", help="Fact-check model; with --cascade_model it only answers the escalated claims")
+    parser.add_argument("--cascade_model", default=None, help="Cheaper model checking every claim first; unparsable and (with --cascade_escalate_partial) partially supported verdicts are re-checked by --judge_model (disabled if not set; not applied with --batch_phase)")
+    parser.add_argument("--cascade_escalate_partial", action=argparse.BooleanOptionalAction, default=True, help="Re-check is_factual=0 verdicts of the cascade model with --judge_model")
+    parser.add_argument("--metrics_path", default=None, help="JSONL file receiving one record per scrape and LLM call (tokens, cost, latency, bytes); a summary is written to <metrics_path>.summary.json")
+    parser.add_argument("--trace_path", default=None, help="Export tracing spans (scrapes, LLM requests, parsing, output commits) to this file (disabled if not set)")
+    parser.add_argument("--trace_format", choices=["chrome", "otlp"], default="chrome", help="chrome: trace-event JSON for chrome://tracing / Perfetto; otlp: OTLP/JSON lines")
+    parser.add_argument("--rpm", type=float, default=None, help="Client-side requests-per-minute budget for judge calls (unlimited if not set)")
+    parser.add_argument("--tpm", type=float, default=None, help="Client-side tokens-per-minute budget for judge calls (unlimited if not set)")
+    parser.add_argument("--llm_cache", default=None, help="SQLite file for the persistent LLM response cache (disabled if not set)")
+    parser.add_argument("--llm_cache_max_mb", type=float, default=None, help="Size limit of the LLM response cache in MB (LRU eviction)")
+    parser.add_argument("--llm_cache_replay", action="store_true", help="Read-only replay: only answer from the LLM cache, never call the API")
     args = parser.parse_args()
+    if args.resume and (args.task != "judge" or args.batch_phase is not None):
+        parser.error("--resume requires --task judge without --batch_phase")
+    # Every per-run file gets the shard tag, so workers can share a directory
+    args.metrics_path = shard_path(args.metrics_path, args.shard)
+    args.trace_path = shard_path(args.trace_path, args.shard)
+    args.batch_file = shard_path(args.batch_file, args.shard)
+
+    configure_structured_outputs(args.structured_outputs)
+    cascade = configure_judge_models(args.judge_model, args.cascade_model, escalate_partial=args.cascade_escalate_partial)
+    run_metrics = configure_metrics(args.metrics_path)
+    run_tracer = configure_tracing(args.trace_path, args.trace_format)
+    limiter = configure_rate_limiter(rpm=args.rpm, tpm=args.tpm)
+    response_cache = None
+    if args.llm_cache:
+        response_cache = configure_llm_cache(args.llm_cache, max_mb=args.llm_cache_max_mb, replay=args.llm_cache_replay)
 
     input_abs = os.path.abspath(args.inputpath)
     output_abs = os.path.abspath(args.outputpath)
 
-    agent = SearchAgent(num_limit_pages=args.limit)
+    page_cache = None
+    if args.page_cache:
+        ttl_seconds = args.page_cache_ttl_hours * 3600 if args.page_cache_ttl_hours > 0 else None
+        page_cache = PageCache(args.page_cache, ttl_seconds=ttl_seconds)
+    jina_options = {
+        "pool_size": args.jina_pool_size,
+        "connect_timeout": args.jina_connect_timeout,
+        "read_timeout": args.jina_read_timeout,
+    }
+    agent = SearchAgent(num_limit_pages=args.limit, page_cache=page_cache, jina_options=jina_options)
 
     # Only support .jsonl streaming processing
     if not (input_abs.lower().endswith(".jsonl") and os.path.isfile(input_abs)):
@@ -94,38 +628,79 @@ def main():
     # Determine output path: if given a directory, create same-named .out.jsonl or .judge.jsonl in it
     if os.path.isdir(output_abs):
         base = os.path.splitext(os.path.basename(input_abs))[0]
+        if args.shard:
+            base = f"{base}.{args.shard.tag}"
         suffix = "judge.jsonl" if args.task == "judge" else "out.jsonl"
         out_jsonl = os.path.join(output_abs, f"{base}.{suffix}")
     else:
         # Treat as file path
         os.makedirs(os.path.dirname(output_abs) or ".", exist_ok=True)
-        out_jsonl = output_abs
+        out_jsonl = shard_path(output_abs, args.shard)
 
-    count = 0
-    with open(input_abs, "r", encoding="utf-8") as fin, \
-         open(out_jsonl, "w", encoding="utf-8") as fout:
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-            except Exception as e:
-                fout.write(json.dumps({"__PARSE_ERROR__": str(e), "__raw__": line}, ensure_ascii=False) + "\n")
-                continue
-            if args.task == "scrape":
-                result = process_obj(agent, obj, provider=args.provider)
-                fout.write(json.dumps(result, ensure_ascii=False) + "\n")
-            else:
-                results = process_record_judge(agent, obj, provider=args.provider)
-                for r in results:
-                    fout.write(json.dumps(r, ensure_ascii=False) + "\n")
-            count += 1
+    if args.input_format == "reports":
+        claims_path = os.path.splitext(out_jsonl)[0] + ".claims.jsonl"
+        totals = write_claims_jsonl(input_abs, claims_path, args.min_claim_chars)
+        print(f"Extracted claims: {claims_path} {json.dumps(totals, ensure_ascii=False)}")
+        input_abs = claims_path
+
+    retrieval = None
+    if args.retrieval_top_k > 0:
+        retrieval = {"top_k": args.retrieval_top_k, "token_budget": args.retrieval_token_budget}
+
+    completed = None
+    if args.resume:
+        completed = CompletedResults.from_output(out_jsonl)
+        print(f"Resuming: {len(completed)} records already in {out_jsonl}, {completed.retried} error labels to judge again")
+
+    if args.task == "judge" and args.batch_phase is None and not args.llm_cache_replay:
+        # Build the client up front so the SDK import is not charged to the first judge calls
+        get_client()
+
+    if args.batch_phase is not None:
+        if args.task != "judge" or not args.batch_file:
+            raise ValueError("--batch_phase requires --task judge and --batch_file")
+        plan_path = args.batch_file + ".plan.jsonl"
+        lines, groups = plan_url_groups(input_abs, args.shard)
+        if args.batch_phase == "build":
+            with BatchRequestWriter(args.batch_file) as writer:
+                num_requests = build_fact_batch(agent, lines, groups, args.provider, writer, plan_path, batch_size=args.fact_batch_size, retrieval=retrieval, model=args.judge_model)
+            print(f"Saved batch requests: {args.batch_file} (requests: {num_requests}, plan: {plan_path})")
+            run_tracer.close()
+            return
+        if not args.batch_results:
+            raise ValueError("--batch_phase ingest requires --batch_results")
+        with open(out_jsonl, "w", encoding="utf-8") as fout:
+            count = ingest_fact_batch(lines, plan_path, args.batch_results, fout)
+    elif args.task == "judge" and args.group_by_url:
+        # Planning pass: each unique URL is scraped once and its verdicts fanned out to the original lines
+        lines, groups = plan_url_groups(input_abs, args.shard)
+        if completed is not None:
+            lines, groups = skip_completed(lines, completed)
+        print(f"Planned {len(lines)} lines over {len(groups)} unique URLs")
+        with CommittedWriter(out_jsonl, "a" if completed is not None else "w", args.commit_every) as fout:
+            count = judge_url_groups(agent, lines, groups, args.provider, fout, batch_size=args.fact_batch_size, retrieval=retrieval)
+    else:
+        count = process_lines(agent, input_abs, out_jsonl, args.task, args.provider, batch_size=args.fact_batch_size, retrieval=retrieval, completed=completed, commit_every=args.commit_every, shard=args.shard)
     print(f"Saved JSONL: {out_jsonl} (lines: {count})")
+    if args.task == "judge":
+        print(f"Judge parse stats: {judge_stats.report()}")
+        if cascade is not None:
+            print(f"Judge cascade escalations: {cascade.report()}")
+    print(f"Run metrics: {json.dumps(run_metrics.summary(), ensure_ascii=False)}")
+    if args.metrics_path:
+        run_metrics.write_summary(args.metrics_path + ".summary.json")
+        run_metrics.close()
+    run_tracer.close()
+    if args.trace_path:
+        print(f"Saved trace: {args.trace_path}")
+    if page_cache is not None:
+        print(f"Page cache stats: {page_cache.stats()}")
+    if response_cache is not None:
+        print(f"LLM cache stats: {response_cache.stats()}")
+    if limiter is not None:
+        print(f"Rate limiter utilization: {limiter.utilization()}")
     return
 
 
 if __name__ == "__main__":
     main()
-
-
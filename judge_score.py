@@ -1,90 +1,161 @@
 import json
 from Atools import *
-import hashlib
-from tqdm import trange
 import os
-import glob
 import argparse
 import logging
 import datetime
 import time
 import hashlib
-from typing import Optional, Dict, List, Tuple
+import threading
+from collections import deque
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from Abatch import BatchRequestWriter, read_batch_results
+from Ametrics import metrics_tags, submit_in_context
+from Atrace import configure_tracing, span, traced
+from Aresults import DirectoryResultSink, JsonlReader, JsonlResultSink, compact_result
+from Ashard import Shard, ShardFilter, parse_shard, shard_path
+from typing import Optional, Dict, Tuple
+
+# Logging configuration; a --shard i/N run logs to judge.shard-i-of-N.txt / judge.shard-i-of-N.json
+LOG_PATH = './exp/judge.txt'
+PROGRESS_LOG_PATH = './exp/judge.json'
+# Set by configure_logging; progress lines are only written to a file once it is configured
+progress_log_path = None
 
-# Logging configuration
-log_path = './exp/judge.txt'
-progress_log_path = './exp/judge.json'
-if not os.path.exists(log_path):
+def configure_logging(shard: Optional[Shard] = None):
+    """Log to the (per-shard) log files and the console."""
+    global progress_log_path
+    log_path = shard_path(LOG_PATH, shard)
+    progress_log_path = shard_path(PROGRESS_LOG_PATH, shard)
     os.makedirs(os.path.dirname(log_path), exist_ok=True)
-if not os.path.exists(progress_log_path):
     os.makedirs(os.path.dirname(progress_log_path), exist_ok=True)
+    # Configure logging format
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_path, encoding='utf-8'),
+            logging.StreamHandler()
+        ],
+        force=True,
+    )
 
-# Configure logging format
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_path, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+_progress_log_lock = threading.Lock()
 
-class CheckpointManager:
-    """Checkpoint Manager"""
-    
-    def __init__(self, checkpoint_file: str = 'checkpoint.json'):
+class CheckpointJournal:
+    """
+    Append-only checkpoint journal.
+
+    Every update is one JSON line appended to checkpoint_file:
+        {"file_id": ..., "metric": "quality" | "repeatability", "data": ...}  a finished metric of a report
+        {"file_id": ..., "done": true}                                        the report's result is saved
+    Loading replays the journal into an in-memory set of completed file ids plus the finished
+    metrics of incomplete reports, so lookups are O(1) and each update costs one line of I/O.
+    compact() atomically rewrites the journal with only the live state.
+    """
+
+    LEGACY_CHECKPOINT_FILE = 'checkpoint.json'
+
+    def __init__(self, checkpoint_file: str = 'checkpoint.jsonl', resume: bool = True):
         self.checkpoint_file = checkpoint_file
-        self.checkpoint_data = self.load_checkpoint()
-    
-    def load_checkpoint(self) -> Dict:
-        """Load checkpoint data"""
-        try:
-            if os.path.exists(self.checkpoint_file):
-                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    logger.info(f"Loaded checkpoint data: {data}")
-                    return data
-        except Exception as e:
-            logger.warning(f"Failed to load checkpoint file: {e}")
-        return {
-            'processed_files': [],
-            'current_index': 0,
-            'start_time': None,
-            'total_files': 0
-        }
-    
-    def save_checkpoint(self, processed_files: List[str], current_index: int, total_files: int):
-        """Save checkpoint data"""
-        checkpoint_data = {
-            'processed_files': processed_files,
-            'current_index': current_index,
-            'start_time': datetime.datetime.now().isoformat(),
-            'total_files': total_files
-        }
-        try:
-            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, indent=2, ensure_ascii=False)
-            logger.info(f"Saved checkpoint: processed {len(processed_files)} files, current index: {current_index}")
-        except Exception as e:
-            logger.error(f"Failed to save checkpoint file: {e}")
-    
+        self.completed = set()
+        self.partial = {}
+        self.total_files = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if resume:
+            self.load()
+            # Rewrite once after replay: drops superseded lines and a torn last line of an interrupted run
+            self.compact()
+        else:
+            if os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+            self._file = open(checkpoint_file, 'a', encoding='utf-8')
+
+    def load(self):
+        """Replay the journal (or the processed_files list of a legacy checkpoint.json)."""
+        if not os.path.exists(self.checkpoint_file):
+            if os.path.exists(self.LEGACY_CHECKPOINT_FILE):
+                with open(self.LEGACY_CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+                    self.completed.update(json.load(f).get('processed_files', []))
+                logger.info(f"Imported legacy checkpoint: {len(self.completed)} processed files")
+            return
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipped unreadable checkpoint line: {line[:80]}")
+                    continue
+                self._apply(event)
+        logger.info(f"Loaded checkpoint: {len(self.completed)} processed files, {len(self.partial)} partially processed")
+
+    def _apply(self, event: Dict):
+        file_id = event['file_id']
+        if event.get('done'):
+            self.completed.add(file_id)
+            self.partial.pop(file_id, None)
+        elif file_id not in self.completed:
+            self.partial.setdefault(file_id, {})[event['metric']] = event['data']
+
+    def _append(self, event: Dict):
+        with self._lock:
+            self._apply(event)
+            self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def record_metric(self, file_id: str, metric: str, data):
+        """Record a finished metric of a report so a resumed run does not judge it again."""
+        self._append({'file_id': file_id, 'metric': metric, 'data': data})
+
+    def get_metric(self, file_id: str, metric: str):
+        """Return the recorded data of a finished metric, or None."""
+        with self._lock:
+            return self.partial.get(file_id, {}).get(metric)
+
+    def add_processed_file(self, file_id: str):
+        """Mark a report as completed; its partial metrics are no longer kept."""
+        self._append({'file_id': file_id, 'done': True})
+
     def is_file_processed(self, file_id: str) -> bool:
         """Check whether the file has been processed"""
-        return file_id in self.checkpoint_data.get('processed_files', [])
-    
-    def add_processed_file(self, file_id: str):
-        """Add processed file"""
-        if 'processed_files' not in self.checkpoint_data:
-            self.checkpoint_data['processed_files'] = []
-        if file_id not in self.checkpoint_data['processed_files']:
-            self.checkpoint_data['processed_files'].append(file_id)
-    
+        return file_id in self.completed
+
+    def sync(self):
+        """Flush and fsync the journal."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def compact(self):
+        """Atomically replace the journal with one line per completed report and per pending metric."""
+        with self._lock:
+            tmp_file = self.checkpoint_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for file_id in sorted(self.completed):
+                    f.write(json.dumps({'file_id': file_id, 'done': True}, ensure_ascii=False) + '\n')
+                for file_id, metrics in self.partial.items():
+                    for metric, data in metrics.items():
+                        f.write(json.dumps({'file_id': file_id, 'metric': metric, 'data': data}, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+            os.replace(tmp_file, self.checkpoint_file)
+            self._file = open(self.checkpoint_file, 'a', encoding='utf-8')
+
     def get_progress(self) -> Tuple[int, int]:
         """Get progress information"""
-        processed = len(self.checkpoint_data.get('processed_files', []))
-        total = self.checkpoint_data.get('total_files', 0)
-        return processed, total
+        return len(self.completed), self.total_files
+
+    def close(self):
+        self.compact()
+        with self._lock:
+            self._file.close()
 
 def log_progress(message: str, level: str = 'info'):
     """Record progress logs"""
@@ -101,12 +172,40 @@ def log_progress(message: str, level: str = 'info'):
         logger.debug(message)
     
     # Also write to the progress log file
+    if progress_log_path is None:
+        return
     try:
-        with open(progress_log_path, 'a', encoding='utf-8') as f:
+        with _progress_log_lock, open(progress_log_path, 'a', encoding='utf-8') as f:
             f.write(f"{log_message}\n")
     except Exception as e:
         logger.error(f"Failed to write progress log: {e}")
 
+def unpack_quality_result(judge_quality_result):
+    """
+    Read the quality fields of a parsed judge_quality response (raises if a field is missing).
+    Returns:
+        comprehensiveness_score, coherence_score, clarity_score, insight_score, overall_score, quality_reason
+    """
+    comprehensiveness_score = judge_quality_result['Comprehensiveness_Score']
+    coherence_score = judge_quality_result['Coherence_Score']
+    clarity_score = judge_quality_result['Clarity_Score']
+    insight_score = judge_quality_result['Insightfulness_Score']
+    overall_score = judge_quality_result['Overall_Score']
+    quality_reason = judge_quality_result['Reason']
+    return comprehensiveness_score, coherence_score, clarity_score, insight_score, overall_score, quality_reason
+
+def unpack_repeatability_result(judge_repeatability_result):
+    """
+    Read the fields of a parsed judge_repeatability_pair response (raises if a field is missing).
+    Returns:
+        repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence
+    """
+    repeatability_score = judge_repeatability_result['score']
+    repeatability_explanation = judge_repeatability_result['explanation']
+    repetitions_found = judge_repeatability_result['repetitions_found']
+    repeatability_confidence = judge_repeatability_result['confidence']
+    return repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence
+
 def extract_quality_scores(use_topic, use_report, max_attempts, debug_mode):
     """
     Extract quality scores of the report.
@@ -122,15 +221,13 @@ def extract_quality_scores(use_topic, use_report, max_attempts, debug_mode):
     while attempt < max_attempts:
         try:
             log_progress(f"Start extracting quality scores, attempt: {attempt + 1}/{max_attempts}", 'debug')
-            judge_quality_result = judge_quality(use_topic, use_report)
-            comprehensiveness_score = judge_quality_result['Comprehensiveness_Score']
-            coherence_score = judge_quality_result['Coherence_Score']
-            clarity_score = judge_quality_result['Clarity_Score']
-            insight_score = judge_quality_result['Insightfulness_Score']
-            overall_score = judge_quality_result['Overall_Score']
-            quality_reason = judge_quality_result['Reason']
+            if attempt > 0:
+                judge_stats.record('quality', 'retries')
+            with span('extract_quality_scores.attempt', attempt=attempt + 1):
+                judge_quality_result = judge_quality(use_topic, use_report)
+                quality_scores = unpack_quality_result(judge_quality_result)
             log_progress(f"Quality score extraction succeeded", 'debug')
-            return comprehensiveness_score, coherence_score, clarity_score, insight_score, overall_score, quality_reason
+            return quality_scores
         except Exception as e:
             attempt += 1
             log_progress(f"Quality score extraction failed, attempt: {attempt}/{max_attempts}, error: {e}", 'warning')
@@ -138,7 +235,8 @@ def extract_quality_scores(use_topic, use_report, max_attempts, debug_mode):
                 log_progress(f"Quality score extraction ultimately failed: {e}", 'error')
                 return None, None, None, None, None, None
             else:
-                time.sleep(2)  # Wait 2 seconds before retrying
+                if not isinstance(e, SchemaError):
+                    time.sleep(2)  # Wait 2 seconds before retrying an API error
                 continue
 
 def extract_repeatability_scores(passage1, passage2, max_attempts, debug_mode):
@@ -156,121 +254,119 @@ def extract_repeatability_scores(passage1, passage2, max_attempts, debug_mode):
     while attempt < max_attempts:   
         try:
             log_progress(f"Start extracting repeatability score, attempt: {attempt + 1}/{max_attempts}", 'debug')
-            judge_repeatability_result = judge_repeatability_pair(passage1, passage2)
-            repeatability_score = judge_repeatability_result['score']
-            repeatability_explanation = judge_repeatability_result['explanation']
-            repetitions_found = judge_repeatability_result['repetitions_found']
-            repeatability_confidence = judge_repeatability_result['confidence']
+            if attempt > 0:
+                judge_stats.record('repeatability_pair', 'retries')
+            with span('extract_repeatability_scores.attempt', attempt=attempt + 1):
+                judge_repeatability_result = judge_repeatability_pair(passage1, passage2)
+                pair_scores = unpack_repeatability_result(judge_repeatability_result)
             log_progress(f"Repeatability score extraction succeeded", 'debug')
-            return repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence
+            return pair_scores
         except Exception as e:
             attempt += 1
             log_progress(f"Repeatability score extraction failed, attempt: {attempt}/{max_attempts}, error: {e}", 'warning')
-            try:
-                judge_repeatability_result = judge_repeatability_result[-1]
-                repeatability_score = judge_repeatability_result['score']
-                repeatability_explanation = judge_repeatability_result['explanation']
-                repetitions_found = judge_repeatability_result['repetitions_found']
-                repeatability_confidence = judge_repeatability_result['confidence']
-                log_progress(f"Repeatability score extraction succeeded (fallback)", 'debug')
-                return repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence
-            except Exception as e:
-                if attempt == max_attempts:
-                    log_progress(f"Repeatability score extraction ultimately failed: {e}", 'error')
-                    return None, None, None, None
-                else:
-                    time.sleep(2)  # Wait 2 seconds before retrying
-                    continue
+            if attempt == max_attempts:
+                log_progress(f"Repeatability score extraction ultimately failed: {e}", 'error')
+                return None, None, None, None
+            else:
+                if not isinstance(e, SchemaError):
+                    time.sleep(2)  # Wait 2 seconds before retrying an API error
+                continue
 
-def judge_one_report(
-    use_topic,
-    use_report,
-    headings, 
-    sections, 
-    sections_headings, 
-    sections_with_headings,
-    repeat_nums = 30,
-    max_attempts = 3,
-    file_id = None,
-    debug_mode = True,
-):
+# Repeatability score given to pairs skipped by the similarity prefilter (4 = almost no repetition)
+PREFILTER_REPEAT_SCORE = 4
+
+def filter_repeat_sections(sections_with_headings, min_length = 200):
+    """Drop sections containing links (e.g. references) and paragraphs that are too short; returns a SectionView."""
+    keep = [
+        i for i in range(len(sections_with_headings))
+        if not sections_with_headings.contains(i, 'https') and sections_with_headings.text_length(i) >= min_length
+    ]
+    return sections_with_headings.select(keep)
+
+def repeat_pair_seed(repeat_seed, file_id):
+    """Seed of the pair sampling of one report, or None for unseeded sampling."""
+    return None if repeat_seed is None else f"{repeat_seed}:{file_id}"
+
+def repeat_pair_population(candidates):
+    """Number of distinct section pairs of a report (candidates as returned by plan_repeat_pairs)."""
+    sections = max(len(candidates) - 1, 0)
+    return sections * (sections - 1) // 2
+
+def plan_repeat_pairs(sections_with_headings, repeat_nums = 30, prefilter_threshold = None, seed = None):
     """
-    Evaluate a single report for quality and repeatability.
+    Select the section pairs of a report to judge for repeatability.
     Args:
-        use_topic: topic content
-        use_report: report content
-        headings: list of first-level headings
-        sections: section contents
-        sections_headings: section headings
-        sections_with_headings: sections with headings
-        repeat_nums: number of pairs for repeatability checks
-        max_attempts: maximum retry attempts
-        file_id: file id (optional)
-        debug_mode: whether in debug mode
+        sections_with_headings: sections with headings (SectionView)
+        repeat_nums: number of pairs for repeatability checks (the maximum with adaptive sampling)
+        prefilter_threshold: optional TF-IDF cosine threshold; every pair of the report is scored
+            locally, pairs below it get PREFILTER_REPEAT_SCORE without an LLM call and the pairs
+            are only sampled among the ones at or above it
+        seed: seed of the pair sampling order (see repeat_pair_seed); pairs are drawn in this order
     Returns:
-        result_entry: dict containing various scores and repeatability results
+        candidates: filtered sections that pair indices refer to
+        pair_plan: list of (i, (a, b)) pairs to send to the LLM
+        prefiltered_num: number of pairs of the report below the threshold, or None if the prefilter is disabled
     """
-    
-    log_progress(f"Start processing file: {file_id}", 'info')
+    sections_with_headings = filter_repeat_sections(sections_with_headings)
+    accept = None
+    prefiltered_num = None
+    if prefilter_threshold is not None:
+        # Score all pairs locally in one go; clearly unrelated pairs never reach the LLM
+        similarity = pairwise_section_similarity(sections_with_headings[1:-1])
+        prefiltered_num = sum(1 for value in similarity.values() if value < prefilter_threshold)
+        accept = lambda pair: similarity[pair] >= prefilter_threshold
+    results = generate_random_pair_with_label(sections_with_headings[1:-1], pair_nums=repeat_nums, seed=seed, accept=accept)
+    pair_plan = [(i, tuple(pair)) for i, (pair, _, _) in enumerate(results)]
+    return sections_with_headings[1:], pair_plan, prefiltered_num
+
+def repeat_score_estimate(candidates, prefiltered_num, confidence):
+    """RepeatScoreEstimate over the LLM-judged pairs of a report, with its prefiltered pairs as a known stratum."""
+    population = repeat_pair_population(candidates)
+    if prefiltered_num is None:
+        return RepeatScoreEstimate(population, confidence)
+    return RepeatScoreEstimate(population - prefiltered_num, confidence, prefiltered_num, PREFILTER_REPEAT_SCORE)
 
-    result_entry = {
-        'file_id': file_id,
-        'topic': use_topic,
-        'compare_list': [],
-        'repeat_results': [],
-        'comprehensiveness_score': None,
-        'coherence_score': None,
-        'clarity_score': None,
-        'insight_score': None,
-        'overall_score': None,
-        'repeat_score': None,
-        'quality_reason': None
-    }
+def assemble_result_entry(file_id, use_topic, quality_scores, pair_outcomes, prefiltered_num = None, repeat_interval = None, pair_population = None):
+    """
+    Combine quality scores and pair results into the per-report result.
+    Args:
+        file_id: file id
+        use_topic: topic content
+        quality_scores: tuple returned by extract_quality_scores
+        pair_outcomes: list of (i, passage1, passage2, pair_scores) in pair order
+        prefiltered_num: number of prefiltered pairs, or None if the prefilter is disabled
+        repeat_interval: confidence interval of repeat_score from RepeatScoreEstimate.interval, or None without adaptive sampling
+        pair_population: number of section pairs of the report; with prefiltered_num, repeat_score is
+            the mean over all of them: the judged pairs stand for the pairs above the threshold and
+            the prefiltered ones count PREFILTER_REPEAT_SCORE
+    Returns:
+        result_entry, or None if quality scoring or all repeatability checks failed
+    """
     ERRFLAG = False
-    
-    if debug_mode:
-        log_progress('Start extracting quality scores', 'debug')
-    comprehensiveness_score, coherence_score, clarity_score, insight_score, overall_score, quality_reason = extract_quality_scores(use_topic, use_report, max_attempts, debug_mode)
+    comprehensiveness_score, coherence_score, clarity_score, insight_score, overall_score, quality_reason = quality_scores
     if comprehensiveness_score is None:
         ERRFLAG = True
         log_progress(f"Quality score extraction failed, file: {file_id}", 'error')
-    
-    if debug_mode:
-        log_progress('Start extracting repeatability scores', 'debug')
-    pair_list = []
-    label_list = []
+
     repeat_score = 0
     repeat_num = 0
-    sections_with_headings = [section for section in sections_with_headings if 'https' not in section]
-    # Filter out paragraphs that are too short
-    min_length = 200
-    sections_with_headings = [section for section in sections_with_headings if len(section) >= min_length]
-    results = generate_random_pair_with_label(sections_with_headings[1:-1], pair_nums=repeat_nums)
-    
     return_results = []
     compare_list = []
-    
-    log_progress(f"Start processing {len(results)} text pairs for repeatability checks", 'debug')
-    for i, (pairs, label, _) in enumerate(results):
-        if label == -2:
-            passage1 = sections_with_headings[1:][pairs[0]]
-            passage2 = sections_with_headings[1:][pairs[1]]
-            repeatability_score = None
-            repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence = extract_repeatability_scores(
-                    passage1, passage2, max_attempts, debug_mode)
-            if repeatability_score is None:
-                log_progress(f"Repeatability scoring failed for pair {i+1}", 'warning')
-                continue
-            else:
-                compare_list.append((passage1, passage2, repeatability_score))
-                repeat_score += repeatability_score
-                repeat_num += 1
-                return_results.append((passage1, passage2, repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence))
-                log_progress(f"Repeatability scoring succeeded for pair {i+1}: {repeatability_score}", 'debug')
-        else:
+    for i, passage1, passage2, pair_scores in pair_outcomes:
+        repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence = pair_scores
+        if repeatability_score is None:
+            log_progress(f"Repeatability scoring failed for pair {i+1}", 'warning')
             continue
+        else:
+            compare_list.append((passage1, passage2, repeatability_score))
+            repeat_score += repeatability_score
+            repeat_num += 1
+            return_results.append((passage1, passage2, repeatability_score, repeatability_explanation, repetitions_found, repeatability_confidence))
+            log_progress(f"Repeatability scoring succeeded for pair {i+1}: {repeatability_score}", 'debug')
     
-    if len(return_results) == 0:
+    # Every pair of the report may have been prefiltered, leaving nothing to judge
+    all_prefiltered = prefiltered_num is not None and pair_population is not None and prefiltered_num >= pair_population
+    if len(return_results) == 0 and not all_prefiltered:
         ERRFLAG = True
         log_progress(f"All repeatability checks failed, file: {file_id}", 'error')
     
@@ -279,6 +375,9 @@ def judge_one_report(
         return None
     else:
         avg_repeat_score = repeat_score / repeat_num if repeat_num > 0 else 0
+        if prefiltered_num and pair_population:
+            judged_share = (pair_population - prefiltered_num) / pair_population
+            avg_repeat_score = judged_share * avg_repeat_score + (1 - judged_share) * PREFILTER_REPEAT_SCORE
         result_entry = {
             'file_id': file_id,
             'topic': use_topic,
@@ -292,27 +391,391 @@ def judge_one_report(
             'repeat_score': avg_repeat_score,
             'quality_reason': quality_reason
         }
+        if prefiltered_num is not None:
+            result_entry['prefiltered_pairs'] = prefiltered_num
+        if repeat_interval is not None:
+            result_entry['repeat_interval'] = repeat_interval
         log_progress(f"File processed successfully: {file_id}, quality score: {overall_score}, repeatability score: {avg_repeat_score}", 'info')
         return result_entry
 
+@traced('judge_one_report', 'file_id')
+def judge_one_report(
+    use_topic,
+    use_report,
+    headings, 
+    sections, 
+    sections_headings, 
+    sections_with_headings,
+    repeat_nums = 30,
+    max_attempts = 3,
+    file_id = None,
+    debug_mode = True,
+    executor = None,
+    prefilter_threshold = None,
+    journal = None,
+    repeat_min_pairs = 10,
+    repeat_ci_width = None,
+    repeat_confidence = 0.95,
+    repeat_seed = None,
+):
+    """
+    Evaluate a single report for quality and repeatability.
+    Args:
+        use_topic: topic content
+        use_report: report content
+        headings: first-level headings (SectionView)
+        sections: section contents (SectionView)
+        sections_headings: section headings (SectionView)
+        sections_with_headings: sections with headings (SectionView)
+        repeat_nums: number of pairs for repeatability checks; the maximum when repeat_ci_width is set
+        max_attempts: maximum retry attempts
+        file_id: file id (optional)
+        debug_mode: whether in debug mode
+        executor: optional thread pool; when given, the quality call and all pair calls are submitted to it and run concurrently
+        prefilter_threshold: optional TF-IDF cosine threshold; pairs below it are not sent to the LLM and get PREFILTER_REPEAT_SCORE, pairs are sampled among the others
+        journal: optional CheckpointJournal; metrics it already holds for file_id are reused, newly finished ones are recorded
+        repeat_min_pairs: adaptive sampling never stops before this many scored pairs
+        repeat_ci_width: adaptive sampling: stop drawing pairs once the repeat_score confidence interval is at most this wide (fixed repeat_nums pairs if None)
+        repeat_confidence: confidence level of the repeat_score interval
+        repeat_seed: base seed of the pair sampling, combined with file_id (unseeded if None)
+    Returns:
+        result_entry: dict containing various scores and repeatability results
+    """
+    
+    log_progress(f"Start processing file: {file_id}", 'info')
+    quality_scores = journal.get_metric(file_id, 'quality') if journal is not None else None
+    repeat_state = journal.get_metric(file_id, 'repeatability') if journal is not None else None
+    
+    if debug_mode:
+        log_progress('Start extracting quality scores', 'debug')
+    quality_future = None
+    if quality_scores is not None:
+        quality_scores = tuple(quality_scores)
+        log_progress(f"Quality scores restored from checkpoint, file: {file_id}", 'debug')
+    elif executor is not None:
+        quality_future = submit_in_context(executor, extract_quality_scores, use_topic, use_report, max_attempts, debug_mode)
+    else:
+        quality_scores = extract_quality_scores(use_topic, use_report, max_attempts, debug_mode)
+        record_quality_metric(journal, file_id, quality_scores)
+    
+    if repeat_state is not None:
+        log_progress(f"Repeatability scores restored from checkpoint, file: {file_id}", 'debug')
+        if quality_future is not None:
+            quality_scores = quality_future.result()
+            record_quality_metric(journal, file_id, quality_scores)
+        candidates = filter_repeat_sections(sections_with_headings)[1:]
+        pair_outcomes = [(i, candidates[a], candidates[b], tuple(pair_scores)) for i, a, b, pair_scores in repeat_state['pairs']]
+        return assemble_result_entry(file_id, use_topic, quality_scores, pair_outcomes, repeat_state['prefiltered_num'], repeat_state.get('interval'), repeat_pair_population(candidates))
+
+    if debug_mode:
+        log_progress('Start extracting repeatability scores', 'debug')
+    candidates, pair_plan, prefiltered_num = plan_repeat_pairs(sections_with_headings, repeat_nums, prefilter_threshold, repeat_pair_seed(repeat_seed, file_id))
+    estimate = None
+    if repeat_ci_width is not None:
+        estimate = repeat_score_estimate(candidates, prefiltered_num, repeat_confidence)
+
+    def start_pair(i, pair):
+        pair_future = None
+        if executor is not None:
+            pair_future = submit_in_context(executor, extract_repeatability_scores, candidates[pair[0]], candidates[pair[1]], max_attempts, debug_mode)
+        return i, pair[0], pair[1], pair_future
+
+    log_progress(f"Start processing {len(pair_plan)} text pairs for repeatability checks", 'debug')
+    # All planned pairs are started at once; with adaptive sampling only repeat_min_pairs run ahead
+    # of the stopping rule, which sees the pairs in plan order whatever the concurrency
+    window = len(pair_plan) if estimate is None else max(1, repeat_min_pairs)
+    pair_jobs = deque(start_pair(*planned) for planned in pair_plan[:window])
+    next_pair = len(pair_jobs)
+    if prefiltered_num is not None:
+        log_progress(f"Similarity prefilter skipped {prefiltered_num}/{repeat_pair_population(candidates)} pairs, file: {file_id}", 'debug')
+
+    if quality_future is not None:
+        quality_scores = quality_future.result()
+        record_quality_metric(journal, file_id, quality_scores)
+
+    # Collect in submission order so outputs match the sequential run
+    pair_outcomes = []
+    pair_records = []
+    stop = None
+    while pair_jobs:
+        i, a, b, pair_future = pair_jobs.popleft()
+        if pair_future is not None:
+            pair_scores = pair_future.result()
+        else:
+            pair_scores = extract_repeatability_scores(candidates[a], candidates[b], max_attempts, debug_mode)
+        pair_outcomes.append((i, candidates[a], candidates[b], pair_scores))
+        pair_records.append([i, a, b, list(pair_scores)])
+        if estimate is not None:
+            if pair_scores[0] is not None:
+                estimate.add(pair_scores[0])
+            if estimate.count >= repeat_min_pairs and estimate.width() <= repeat_ci_width:
+                stop = 'target_width'
+                break
+        if next_pair < len(pair_plan):
+            pair_jobs.append(start_pair(*pair_plan[next_pair]))
+            next_pair += 1
+    repeat_interval = None
+    if estimate is not None:
+        # Pairs started ahead of the stop are dropped, so the result does not depend on the concurrency
+        for _, _, _, pair_future in pair_jobs:
+            if pair_future is not None:
+                pair_future.cancel()
+        if stop is None:
+            stop = 'all_pairs' if len(pair_plan) >= estimate.population else 'max_pairs'
+        repeat_interval = estimate.interval(stop)
+        log_progress(f"Adaptive sampling judged {len(pair_outcomes)}/{len(pair_plan)} pairs ({stop}), repeat_score interval: [{repeat_interval['low']}, {repeat_interval['high']}], file: {file_id}", 'debug')
+    # Same success criterion as assemble_result_entry: at least one scored pair
+    if journal is not None and any(pair_scores[0] is not None for _, _, _, pair_scores in pair_outcomes):
+        journal.record_metric(file_id, 'repeatability', {'pairs': pair_records, 'prefiltered_num': prefiltered_num, 'interval': repeat_interval})
+
+    return assemble_result_entry(file_id, use_topic, quality_scores, pair_outcomes, prefiltered_num, repeat_interval, repeat_pair_population(candidates))
+
+def record_quality_metric(journal, file_id, quality_scores):
+    """Record successful quality scores of a report in the checkpoint journal, if any."""
+    if journal is not None and quality_scores[0] is not None:
+        journal.record_metric(file_id, 'quality', list(quality_scores))
+
+def report_file_id(json_data):
+    """File id of an input report: md5 of its topic."""
+    return hashlib.md5(json_data['topic'].encode('utf-8')).hexdigest()
+
+def prepare_report(json_data):
+    """
+    Derive the file id and sections of one input report.
+    Returns:
+        (file_id, report_args): report_args is None if the report is skipped, otherwise the
+        (use_topic, use_report, headings, sections, sections_headings, sections_with_headings)
+        positional arguments of judge_one_report
+    """
+    EN_topic = json_data['topic']
+    file_id = report_file_id(json_data)
+    EN_report = json_data['report']
+    
+    paragraphs = split_paragraphs(EN_report)
+    if len(paragraphs) <= 3:
+        return file_id, None
+
+    index = SectionIndex(EN_report)
+    if not index.headings:
+        log_progress(f"No first-level headings, skipping file: {file_id}", 'warning')
+        return file_id, None
+    # Lazy views over one index; the first and last sections are never paired
+    return file_id, (EN_topic, EN_report, index.headings, index.bodies, index.titles, index.with_titles[1:-1])
+
+def build_score_batch(all_json_data, writer, plan_path, processed_files, repeat_nums = 30, prefilter_threshold = None, model = "gpt-4o", repeat_seed = None):
+    """
+    Batch phase 1: write the quality request and the sampled repeatability pair requests of every
+    unprocessed report to the batch file. The plan file records the sampled pairs for the ingest phase.
+    A batch has a single round, so adaptive sampling does not apply: all repeat_nums pairs are requested.
+    Returns:
+        number of reports planned
+    """
+    planned = 0
+    with open(plan_path, 'w', encoding='utf-8') as fplan:
+        for json_data in all_json_data:
+            file_id, report_args = prepare_report(json_data)
+            if report_args is None or file_id in processed_files:
+                continue
+            use_topic, use_report, _, _, _, sections_with_headings = report_args
+            writer.add(f"quality::{file_id}", quality_messages(use_topic, use_report), model=model, **judge_params('quality'))
+            candidates, pair_plan, prefiltered_num = plan_repeat_pairs(sections_with_headings, repeat_nums, prefilter_threshold, repeat_pair_seed(repeat_seed, file_id))
+            for i, (a, b) in pair_plan:
+                writer.add(f"pair::{file_id}::{a}::{b}", repeatability_pair_messages(candidates[a], candidates[b]), model=model, **judge_params('repeatability_pair'))
+            plan_entry = {'file_id': file_id, 'pairs': pair_plan, 'prefiltered_num': prefiltered_num}
+            fplan.write(json.dumps(plan_entry, ensure_ascii=False) + "\n")
+            planned += 1
+    return planned
+
+def ingest_score_batch(all_json_data, plan_path, results_path, save_result, repeat_confidence = None):
+    """
+    Batch phase 2: parse the completed batch results and assemble the usual per-report results,
+    which are passed to save_result(result_entry, file_id, index, report).
+    With repeat_confidence set, the repeat_score interval over all planned pairs is recorded as well.
+    """
+    results = read_batch_results(results_path)
+    plans = {}
+    with open(plan_path, 'r', encoding='utf-8') as fplan:
+        for line in fplan:
+            plan_entry = json.loads(line)
+            plans[plan_entry['file_id']] = plan_entry
+
+    def batch_result(custom_id):
+        result = results.get(custom_id)
+        if result is None or result['content'] is None:
+            error = 'missing from batch results' if result is None else result['error']
+            raise ValueError(f"batch request {custom_id} failed: {error}")
+        return result['content']
+
+    for index, json_data in enumerate(all_json_data):
+        file_id, report_args = prepare_report(json_data)
+        if report_args is None or file_id not in plans:
+            continue
+        use_topic, use_report, _, _, _, sections_with_headings = report_args
+        try:
+            quality_scores = unpack_quality_result(parse_quality_response(batch_result(f"quality::{file_id}")))
+        except Exception as e:
+            log_progress(f"Quality score extraction failed, file: {file_id}, error: {e}", 'warning')
+            quality_scores = (None, None, None, None, None, None)
+        # Recompute the filtered sections the planned pair indices refer to
+        candidates = filter_repeat_sections(sections_with_headings)[1:]
+        pair_outcomes = []
+        for i, (a, b) in plans[file_id]['pairs']:
+            try:
+                pair_scores = unpack_repeatability_result(parse_repeatability_pair_response(batch_result(f"pair::{file_id}::{a}::{b}")))
+            except Exception as e:
+                log_progress(f"Repeatability score extraction failed, file: {file_id}, pair: {a}-{b}, error: {e}", 'warning')
+                pair_scores = (None, None, None, None)
+            pair_outcomes.append((i, candidates[a], candidates[b], tuple(pair_scores)))
+        repeat_interval = None
+        if repeat_confidence is not None:
+            estimate = repeat_score_estimate(candidates, plans[file_id]['prefiltered_num'], repeat_confidence)
+            for _, _, _, pair_scores in pair_outcomes:
+                if pair_scores[0] is not None:
+                    estimate.add(pair_scores[0])
+            repeat_interval = estimate.interval('all_pairs' if len(pair_outcomes) >= estimate.population else 'max_pairs')
+        result_entry = assemble_result_entry(file_id, use_topic, quality_scores, pair_outcomes, plans[file_id]['prefiltered_num'], repeat_interval, repeat_pair_population(candidates))
+        save_result(result_entry, file_id, index, use_report)
+
+def run_reports(args, all_json_data, journal, save_result):
+    """
+    Judge every report not completed in the checkpoint journal and pass each result to save_result(result_entry, file_id, index, report).
+    With --concurrency > 1, reports run on report_executor while their judge calls share
+    call_executor, which caps the number of in-flight API requests. At most twice the
+    concurrency of reports are queued at a time, so lazily read input is never fully
+    materialized. Results are saved and checkpointed from the main thread as reports complete.
+    """
+    report_executor = None
+    call_executor = None
+    if args.concurrency > 1:
+        report_executor = ThreadPoolExecutor(max_workers=args.concurrency)
+        call_executor = ThreadPoolExecutor(max_workers=args.concurrency)
+        log_progress(f"Concurrent mode enabled, concurrency: {args.concurrency}", 'info')
+    pending = {}
+
+    def collect(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            file_id, index, report = pending.pop(future)
+            try:
+                result_entry = future.result()
+            except Exception as e:
+                log_progress(f"Processing raised an error, file: {file_id}, error: {e}", 'error')
+                result_entry = None
+            save_result(result_entry, file_id, index, report)
+
+    # Use tqdm to show progress
+    for i, json_data in enumerate(all_json_data):
+        file_id, report_args = prepare_report(json_data)
+        
+        # Check if already processed
+        if journal.is_file_processed(file_id):
+            log_progress(f"File already processed, skip: {file_id}", 'debug')
+            continue
+        
+        log_progress(f"Processing file {i+1}/{len(all_json_data)}: {file_id}", 'info')
+        if report_args is None:
+            continue
+
+        judge_kwargs = dict(
+            repeat_nums=args.repeat_max_pairs,
+            max_attempts=3,
+            file_id=file_id,
+            debug_mode=True,
+            prefilter_threshold=args.repeat_prefilter_threshold,
+            journal=journal,
+            repeat_min_pairs=args.repeat_min_pairs,
+            repeat_ci_width=args.repeat_ci_width,
+            repeat_confidence=args.repeat_confidence,
+            repeat_seed=args.repeat_seed,
+        )
+        # Every LLM call of the report is recorded in the metrics with its file_id
+        if report_executor is None:
+            with metrics_tags(file_id=file_id):
+                result_entry = judge_one_report(*report_args, **judge_kwargs)
+            save_result(result_entry, file_id, i, report_args[1])
+        else:
+            if len(pending) >= 2 * args.concurrency:
+                collect(FIRST_COMPLETED)
+            with metrics_tags(file_id=file_id):
+                future = submit_in_context(report_executor, judge_one_report, *report_args, executor=call_executor, **judge_kwargs)
+            pending[future] = (file_id, i, report_args[1])
+
+    if report_executor is not None:
+        if pending:
+            collect(ALL_COMPLETED)
+        report_executor.shutdown()
+        call_executor.shutdown()
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--inputpath', type=str)
     parser.add_argument('--outputpath', type=str)
     parser.add_argument('--resume', action='store_true', help='Resume from checkpoint')
     parser.add_argument('--clear_checkpoint', action='store_true', help='Clear checkpoint file')
+    parser.add_argument('--output_format', choices=['dir', 'jsonl'], default='dir', help='dir: one pretty-printed {file_id}.json per report; jsonl: compact lines appended to results.jsonl in --outputpath')
+    parser.add_argument('--result_format', choices=['legacy', 'compact'], default='legacy', help='legacy: full passages in compare_list and repeat_results; compact: a section table (offsets + md5) referenced by index from the pairs, expanded with python Aresults.py')
+    parser.add_argument('--shard', type=parse_shard, default=None, help='Judge only partition i/N of the input (0 <= i < N), assigned by file_id; logs, checkpoint, metrics, trace, batch and jsonl result files get a .shard-i-of-N suffix')
+    parser.add_argument('--shard_max_mb', type=float, default=None, help='jsonl output: start a new results-NNNNN.jsonl shard once the current one reaches this size (single file if not set)')
+    parser.add_argument('--sync_every', type=int, default=100, help='jsonl output: fsync the results and save the checkpoint every N reports')
+    parser.add_argument('--concurrency', type=int, default=1, help='Maximum number of in-flight judge calls; values > 1 overlap reports and the pairs inside each report')
+    parser.add_argument('--repeat_prefilter_threshold', type=float, default=None, help='TF-IDF cosine similarity below which a section pair is scored as non-repetitive without an LLM call (disabled if not set)')
+    parser.add_argument('--repeat_max_pairs', type=int, default=30, help='Section pairs sampled per report for the repeatability score (all pairs if the report has fewer)')
+    parser.add_argument('--repeat_min_pairs', type=int, default=10, help='Adaptive sampling: scored pairs judged before the stopping rule applies')
+    parser.add_argument('--repeat_ci_width', type=float, default=None, help='Adaptive sampling: stop drawing pairs once the repeat_score confidence interval (0-4 scale) is at most this wide, and store it as repeat_interval (always --repeat_max_pairs pairs if not set)')
+    parser.add_argument('--repeat_confidence', type=float, default=0.95, help='Confidence level of the repeat_score interval')
+    parser.add_argument('--repeat_seed', type=int, default=0, help='Base seed of the pair sampling, combined with each file_id so reruns and shards judge the same pairs; every run with the default 0 draws the same sample, pass another value for a different one')
+    parser.add_argument('--batch_phase', choices=['build', 'ingest'], default=None, help='Offline Batch API mode: build writes all judge requests to --batch_file; ingest assembles results from --batch_results')
+    parser.add_argument('--batch_file', type=str, default=None, help='Batch request JSONL (its plan is stored next to it as <batch_file>.plan.jsonl)')
+    parser.add_argument('--batch_results', type=str, default=None, help='Completed batch result JSONL for --batch_phase ingest')
+    parser.add_argument('--structured_outputs', action=argparse.BooleanOptionalAction, default=True, help='Request JSON-schema structured outputs for judge calls (falls back automatically if the backend rejects them)')
+    parser.add_argument('--judge_model', type=str, default='gpt-4o', help='Judge model; with --cascade_model it only answers the escalated requests')
+    parser.add_argument('--cascade_model', type=str, default=None, help='Cheaper model answering every judge request first; parse failures and low-confidence repeatability verdicts are re-asked of --judge_model (disabled if not set; not applied with --batch_phase)')
+    parser.add_argument('--cascade_min_confidence', type=float, default=0.8, help='Escalate repeatability verdicts whose confidence is below this fraction')
+    parser.add_argument('--metrics_path', type=str, default=None, help='JSONL file receiving one record per LLM call (tokens, cost, latency, retries); a summary is written to <metrics_path>.summary.json')
+    parser.add_argument('--trace_path', type=str, default=None, help='Export tracing spans (report, judge attempts, LLM requests, parsing, writes) to this file (disabled if not set)')
+    parser.add_argument('--trace_format', choices=['chrome', 'otlp'], default='chrome', help='chrome: trace-event JSON for chrome://tracing / Perfetto; otlp: OTLP/JSON lines')
+    parser.add_argument('--rpm', type=float, default=None, help='Client-side requests-per-minute budget for judge calls (unlimited if not set)')
+    parser.add_argument('--tpm', type=float, default=None, help='Client-side tokens-per-minute budget for judge calls (unlimited if not set)')
+    parser.add_argument('--llm_cache', type=str, default=None, help='SQLite file for the persistent LLM response cache (disabled if not set)')
+    parser.add_argument('--llm_cache_max_mb', type=float, default=None, help='Size limit of the LLM response cache in MB (LRU eviction)')
+    parser.add_argument('--llm_cache_replay', action='store_true', help='Read-only replay: only answer from the LLM cache, never call the API')
     args = parser.parse_args()
+    if args.batch_phase is not None and not args.batch_file:
+        parser.error('--batch_phase requires --batch_file')
+    if args.batch_phase == 'ingest' and not args.batch_results:
+        parser.error('--batch_phase ingest requires --batch_results')
+    if args.repeat_ci_width is not None and args.repeat_min_pairs > args.repeat_max_pairs:
+        parser.error('--repeat_min_pairs must not exceed --repeat_max_pairs')
+    # Every per-run file gets the shard tag, so workers can share a directory
+    configure_logging(args.shard)
+    args.metrics_path = shard_path(args.metrics_path, args.shard)
+    args.trace_path = shard_path(args.trace_path, args.shard)
+    args.batch_file = shard_path(args.batch_file, args.shard)
+    checkpoint_file = shard_path('checkpoint.jsonl', args.shard)
     
+    configure_structured_outputs(args.structured_outputs)
+    cascade = configure_judge_models(args.judge_model, args.cascade_model, min_confidence=args.cascade_min_confidence)
+    if cascade is not None:
+        log_progress(f"Judge cascade: {args.cascade_model} first, escalating to {args.judge_model}", 'info')
+    run_metrics = configure_metrics(args.metrics_path)
+    run_tracer = configure_tracing(args.trace_path, args.trace_format)
+    limiter = configure_rate_limiter(rpm=args.rpm, tpm=args.tpm)
+    response_cache = None
+    if args.llm_cache:
+        response_cache = configure_llm_cache(args.llm_cache, max_mb=args.llm_cache_max_mb, replay=args.llm_cache_replay)
+        log_progress(f"LLM response cache enabled: {args.llm_cache}", 'info')
     
-    # Initialize checkpoint manager
-    checkpoint_manager = CheckpointManager()
     
-    # If clear_checkpoint is specified, delete checkpoint file
+    # If clear_checkpoint is specified, delete checkpoint files
     if args.clear_checkpoint:
-        if os.path.exists(checkpoint_manager.checkpoint_file):
-            os.remove(checkpoint_manager.checkpoint_file)
-            log_progress("Checkpoint file cleared", 'info')
-        checkpoint_manager = CheckpointManager()
+        cleared = [checkpoint_file] if args.shard else [checkpoint_file, CheckpointJournal.LEGACY_CHECKPOINT_FILE]
+        for path in cleared:
+            if os.path.exists(path):
+                os.remove(path)
+        log_progress("Checkpoint file cleared", 'info')
+    
+    # Initialize checkpoint journal; without --resume it starts empty
+    checkpoint_manager = CheckpointJournal(checkpoint_file, resume=args.resume)
     
     SAVEPATH = args.outputpath
         
@@ -320,86 +783,102 @@ def main():
         os.makedirs(SAVEPATH)
         log_progress(f"Created output directory: {SAVEPATH}", 'info')
     
-    all_json_data = []
-    with open(args.inputpath, 'r', encoding='utf-8') as file:
-        for line in file:
-            all_json_data.append(json.loads(line))
-        
-    # Update checkpoint data
-    checkpoint_manager.checkpoint_data['processed_files'] = []
-    checkpoint_manager.checkpoint_data['current_index'] = 0
-    checkpoint_manager.checkpoint_data['total_files'] = len(all_json_data)
-    
-    # Get processed file list
-    processed_files = checkpoint_manager.checkpoint_data.get('processed_files', [])
-    current_index = checkpoint_manager.checkpoint_data.get('current_index', 0)
+    # Reports are parsed lazily, one line at a time
+    all_json_data = JsonlReader(args.inputpath)
+    if args.shard:
+        all_json_data = ShardFilter(all_json_data, args.shard, report_file_id)
+        log_progress(f"Shard {args.shard.index}/{args.shard.count}: {len(all_json_data)} reports", 'info')
+    checkpoint_manager.total_files = len(all_json_data)
     
-    log_progress(f"Start processing: total files: {len(all_json_data)}, processed: {len(processed_files)}, current index: {current_index}", 'info')
+    log_progress(f"Start processing: total files: {len(all_json_data)}, processed: {len(checkpoint_manager.completed)}, partially processed: {len(checkpoint_manager.partial)}", 'info')
     
-    # Use tqdm to show progress
-    for i, json_data in enumerate(all_json_data):
-        EN_topic = json_data['topic']
-
-        file_id = hashlib.md5(EN_topic.encode('utf-8')).hexdigest()
-        
-        # Check if already processed
-        if file_id in processed_files:
-            log_progress(f"File already processed, skip: {file_id}", 'debug')
-            continue
-        
-        log_progress(f"Processing file {i+1}/{len(all_json_data)}: {file_id}", 'info')
-        
-        EN_report = json_data['report']
-        
-        paragraphs = split_paragraphs(EN_report)
-        if len(paragraphs) <= 3:
-            continue
+    if args.output_format == 'jsonl':
+        shard_max_bytes = int(args.shard_max_mb * 1024 * 1024) if args.shard_max_mb else None
+        prefix = f"results.{args.shard.tag}" if args.shard else 'results'
+        sink = JsonlResultSink(SAVEPATH, shard_max_bytes=shard_max_bytes, prefix=prefix, resume=args.resume)
+        sync_every = max(1, args.sync_every)
+        # Results flushed after the last checkpoint of an interrupted run are already on disk
+        recovered = [file_id for file_id in sink.file_ids if not checkpoint_manager.is_file_processed(file_id)]
+        if recovered:
+            for file_id in recovered:
+                checkpoint_manager.add_processed_file(file_id)
+            checkpoint_manager.sync()
+            log_progress(f"Recovered {len(recovered)} results written after the last checkpoint", 'info')
+    else:
+        sink = DirectoryResultSink(SAVEPATH)
+        sync_every = 1
+    unsynced = []
 
-        try:
-            headings, sections, sections_headings, sections_with_headings = extract_first_level_headings(EN_report)
-            sections_with_headings = sections_with_headings[1:-1]
-            use_report = EN_report
-            use_topic = EN_topic
-        except Exception as e:
-            log_progress(f"Failed to extract headings, file: {file_id}, error: {e}", 'error')
-            continue
+    def commit_checkpoint():
+        # Results must be durable before the checkpoint marks them as processed
+        with span('commit_checkpoint', reports=len(unsynced)):
+            sink.sync()
+            for file_id in unsynced:
+                checkpoint_manager.add_processed_file(file_id)
+            checkpoint_manager.sync()
+        log_progress(f"Saved checkpoint: processed {len(checkpoint_manager.completed)} files", 'info')
+        unsynced.clear()
 
-        result_entry = judge_one_report(
-            use_topic,
-            use_report,
-            headings, 
-            sections, 
-            sections_headings, 
-            sections_with_headings,
-            repeat_nums=30,
-            max_attempts=3,
-            file_id=file_id,
-            debug_mode=True,
-        )
-        
+    def save_result(result_entry, file_id, index, report):
         if result_entry is not None:
             # Save result
-            output_file = os.path.join(SAVEPATH, f'{file_id}.json')
+            if args.result_format == 'compact':
+                try:
+                    result_entry = compact_result(result_entry, report)
+                except Exception as e:
+                    # The judged result is still saved, in the legacy format expand_result passes through
+                    log_progress(f"Compacting result failed, saving the full result: {file_id}, error: {e}", 'warning')
             try:
-                with open(output_file, 'w', encoding='utf-8') as file:
-                    json.dump(result_entry, file, indent=4, ensure_ascii=False)
+                with span('write_result', file_id=file_id):
+                    output_file = sink.write(result_entry, file_id)
                 log_progress(f"Result saved: {output_file}", 'debug')
                 
                 # Update checkpoint
-                checkpoint_manager.add_processed_file(file_id)
-                checkpoint_manager.save_checkpoint(
-                    processed_files=checkpoint_manager.checkpoint_data['processed_files'],
-                    current_index=i,
-                    total_files=len(all_json_data)
-                )
+                unsynced.append(file_id)
+                if len(unsynced) >= sync_every:
+                    commit_checkpoint()
             except Exception as e:
-                log_progress(f"Failed to save result: {output_file}, error: {e}", 'error')
+                log_progress(f"Failed to save result: {file_id}, error: {e}", 'error')
         else:
             log_progress(f"Processing failed, skip saving: {file_id}", 'warning')
+
+    if args.batch_phase == 'build':
+        plan_path = args.batch_file + '.plan.jsonl'
+        with BatchRequestWriter(args.batch_file) as writer:
+            planned = build_score_batch(all_json_data, writer, plan_path, checkpoint_manager.completed, repeat_nums=args.repeat_max_pairs, prefilter_threshold=args.repeat_prefilter_threshold, model=args.judge_model, repeat_seed=args.repeat_seed)
+        log_progress(f"Saved batch requests: {args.batch_file} (reports: {planned}, requests: {len(writer.custom_ids)}, plan: {plan_path})", 'info')
+        run_tracer.close()
+        return
+    if args.batch_phase == 'ingest':
+        ingest_score_batch(all_json_data, args.batch_file + '.plan.jsonl', args.batch_results, save_result,
+                           repeat_confidence=args.repeat_confidence if args.repeat_ci_width is not None else None)
+    else:
+        if not args.llm_cache_replay:
+            # Build the client up front so the SDK import is not charged to the first judge calls
+            get_client()
+        run_reports(args, all_json_data, checkpoint_manager, save_result)
+    if unsynced:
+        commit_checkpoint()
+    sink.close()
+    checkpoint_manager.close()
     
     # Processing complete
     processed_count, total_count = checkpoint_manager.get_progress()
     log_progress(f"Completed. Total files: {total_count}, successfully processed: {processed_count}", 'info')
+    log_progress(f"Judge parse stats: {judge_stats.report()}", 'info')
+    if cascade is not None:
+        log_progress(f"Judge cascade escalations: {cascade.report()}", 'info')
+    log_progress(f"Run metrics: {run_metrics.summary()}", 'info')
+    if args.metrics_path:
+        run_metrics.write_summary(args.metrics_path + '.summary.json')
+        run_metrics.close()
+    run_tracer.close()
+    if args.trace_path:
+        log_progress(f"Saved trace: {args.trace_path}", 'info')
+    if response_cache is not None:
+        log_progress(f"LLM cache stats: {response_cache.stats()}", 'info')
+    if limiter is not None:
+        log_progress(f"Rate limiter utilization: {limiter.utilization()}", 'info')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+import Atools
+from mock_servers import canned_verdict
+
+
+def make_report(topic, sections=8):
+    """Markdown report with an introduction and `sections` distinct second-level sections."""
+    parts = [f"# {topic}", f"An introduction to {topic.lower()} and what the report covers."]
+    for k in range(sections):
+        parts.append(f"## Section {k} on {topic}")
+        parts.append(
+            f"Paragraph {k} discusses aspect number {k} of {topic.lower()} with its own evidence and examples. "
+            f"It compares study {k} with earlier work, describes the data behind finding {k} and explains "
+            f"why aspect {k} matters for the overall picture drawn by the report."
+        )
+    return "\n\n".join(parts)
+
+
+def write_reports(path, count, sections=8):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            topic = f"Topic {i}"
+            f.write(json.dumps({'topic': topic, 'report': make_report(topic, sections)}, ensure_ascii=False) + '\n')
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class LLMCalls(list):
+    """(model, judge schema name) of every completion; responder(body) -> content overrides the answers."""
+    responder = None
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer every chat completion with the deterministic verdict of the benchmark mock server."""
+    calls = LLMCalls()
+
+    def create_completion(model, messages, params):
+        body = {'model': model, 'messages': messages, **params}
+        calls.append((model, ((params.get('response_format') or {}).get('json_schema') or {}).get('name')))
+        return (calls.responder or canned_verdict)(body), 0
+
+    monkeypatch.setattr(Atools, '_create_completion', create_completion)
+    yield calls
+    Atools.configure_llm_cache(None)
+    Atools.configure_judge_models()
+    Atools.configure_structured_outputs(True)
+
+
+@pytest.fixture
+def run_score(monkeypatch, tmp_path, fake_llm):
+    """Run judge_score.main with the given arguments from tmp_path (where its logs and checkpoint go)."""
+    import judge_score
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(judge_score, 'get_client', lambda: None)
+
+    def run(*args):
+        monkeypatch.setattr(sys, 'argv', ['judge_score.py', *args])
+        judge_score.main()
+    return run
+
+
+VERDICT = {"is_factual": 1, "sentence_support": "Supported."}
+
+
+class FakeAgent:
+    """Scrapes every page successfully except the URLs in failing."""
+
+    failing = set()
+    scraped = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def scrape(self, url, provider='jina'):
+        FakeAgent.scraped.append(url)
+        return None if url in FakeAgent.failing else f"Page of {url}"
+
+
+@pytest.fixture
+def run_fact(monkeypatch):
+    """Run judge_fact.main with a fake scraper and a judge answering VERDICT; returns the judged claims."""
+    import judge_fact
+    judged = []
+
+    def check_factual(sentence, page):
+        judged.append(sentence)
+        return dict(VERDICT)
+
+    monkeypatch.setattr(judge_fact, 'SearchAgent', FakeAgent)
+    monkeypatch.setattr(judge_fact, 'check_factual', check_factual)
+    monkeypatch.setattr(judge_fact, 'get_client', lambda: None)
+    FakeAgent.failing = set()
+    FakeAgent.scraped = []
+
+    def run(*args):
+        monkeypatch.setattr(sys, 'argv', ['judge_fact.py', *args])
+        judge_fact.main()
+        return judged
+    return run
@@ -0,0 +1,74 @@
+import json
+import sys
+
+import pytest
+
+import Abatch
+from Abatch import LocalBatchEndpoint
+from conftest import VERDICT, read_jsonl, write_jsonl, write_reports
+from mock_servers import canned_verdict
+
+SCORE_FIELDS = ('comprehensiveness_score', 'coherence_score', 'clarity_score', 'insight_score', 'overall_score', 'repeat_score')
+
+
+def run_batch_cli(monkeypatch, capsys, *args):
+    monkeypatch.setattr(sys, 'argv', ['Abatch.py', *args])
+    capsys.readouterr()
+    Abatch.main()
+    out = capsys.readouterr().out
+    return json.loads(out[out.index('{'):])
+
+
+def test_local_submit_needs_a_responder(monkeypatch, capsys, tmp_path):
+    write_jsonl(tmp_path / 'batch.jsonl', [])
+    monkeypatch.setattr(sys, 'argv', ['Abatch.py', 'submit', '--endpoint', 'local', '--local_root', str(tmp_path / 'root'), '--input', str(tmp_path / 'batch.jsonl')])
+    with pytest.raises(SystemExit) as exit_info:
+        Abatch.main()
+    assert exit_info.value.code == 2
+    assert '--llm_cache' in capsys.readouterr().err
+    assert not (tmp_path / 'root').exists()
+
+
+def test_score_batch_round_trip_replays_the_llm_cache(run_score, fake_llm, monkeypatch, capsys, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 3)
+    common = ['--inputpath', 'reports.jsonl', '--output_format', 'jsonl', '--repeat_max_pairs', '4']
+    # A direct run fills the LLM cache
+    run_score(*common, '--outputpath', 'direct', '--llm_cache', 'llm_cache.db')
+    calls = len(fake_llm)
+
+    run_score(*common, '--outputpath', 'batch', '--batch_phase', 'build', '--batch_file', 'score.batch.jsonl')
+    batch = run_batch_cli(monkeypatch, capsys, 'submit', '--local_root', 'batches', '--input', 'score.batch.jsonl', '--llm_cache', 'llm_cache.db')
+    assert batch['request_counts'] == {'total': 15, 'completed': 15, 'failed': 0}
+    run_batch_cli(monkeypatch, capsys, 'download', '--local_root', 'batches', '--batch_id', batch['id'], '--output', 'score.results.jsonl')
+    run_score(*common, '--outputpath', 'batch', '--batch_phase', 'ingest', '--batch_file', 'score.batch.jsonl', '--batch_results', 'score.results.jsonl')
+
+    # The batch went through the cache only and gives the same results
+    assert len(fake_llm) == calls
+    direct = {r['file_id']: r for r in read_jsonl(tmp_path / 'direct' / 'results.jsonl')}
+    batched = {r['file_id']: r for r in read_jsonl(tmp_path / 'batch' / 'results.jsonl')}
+    assert len(batched) == 3
+    for file_id, result in batched.items():
+        assert [result[field] for field in SCORE_FIELDS] == [direct[file_id][field] for field in SCORE_FIELDS]
+        assert result['repeat_results'] == direct[file_id]['repeat_results']
+
+
+def test_fact_batch_round_trip(run_fact, tmp_path):
+    claims = tmp_path / 'claims.jsonl'
+    write_jsonl(claims, [
+        {'https://a.org': {'contexts': ['A one.', 'A two.']}},
+        {'https://b.org': {'contexts': ['B one.']}},
+        {'https://a.org': {'contexts': ['A two.']}},
+    ])
+    batch_file = str(tmp_path / 'fact.batch.jsonl')
+    output = str(tmp_path / 'fact.judge.jsonl')
+    run_fact('--inputpath', str(claims), '--outputpath', output, '--batch_phase', 'build', '--batch_file', batch_file)
+    endpoint = LocalBatchEndpoint(str(tmp_path / 'batches'), canned_verdict)
+    batch = endpoint.create(batch_file)
+    assert batch['request_counts']['completed'] == 3
+    endpoint.download(batch['id'], str(tmp_path / 'fact.results.jsonl'))
+    run_fact('--inputpath', str(claims), '--outputpath', output, '--batch_phase', 'ingest', '--batch_file', batch_file, '--batch_results', str(tmp_path / 'fact.results.jsonl'))
+    records = read_jsonl(output)
+    assert [(r['url'], r['context']) for r in records] == [
+        ('https://a.org', 'A one.'), ('https://a.org', 'A two.'), ('https://b.org', 'B one.'), ('https://a.org', 'A two.'),
+    ]
+    assert all(set(r['label']) == set(VERDICT) for r in records)
@@ -0,0 +1,57 @@
+import json
+
+import Atools
+
+PAIR = {"score": 3, "explanation": "Little overlap.", "repetitions_found": [], "confidence": "90%"}
+
+
+def test_uncertain_and_broken_fast_verdicts_are_escalated(fake_llm):
+    cascade = Atools.configure_judge_models('strong', 'fast', min_confidence=0.8)
+
+    def responder(body):
+        user = body['messages'][-1]['content']
+        if body['model'] == 'strong':
+            return json.dumps(PAIR)
+        if 'uncertain' in user:
+            return json.dumps({**PAIR, 'score': 0, 'confidence': '55%'})
+        if 'broken' in user:
+            return '{"score": '
+        return json.dumps({**PAIR, 'score': 4})
+
+    fake_llm.responder = responder
+    assert Atools.judge_repeatability_pair('A sure passage.', 'Another one.')['score'] == 4
+    assert Atools.judge_repeatability_pair('An uncertain passage.', 'Another one.')['score'] == 3
+    assert Atools.judge_repeatability_pair('A broken passage.', 'Another one.')['score'] == 3
+    assert [model for model, _ in fake_llm] == ['fast', 'fast', 'strong', 'fast', 'strong']
+    report = cascade.report()['repeatability_pair']
+    assert report['calls'] == 3
+    assert (report['escalated'], report['low_confidence'], report['parse_failure']) == (2, 1, 1)
+    assert report['escalation_rate'] == round(2 / 3, 4)
+
+
+def test_partial_fact_checks_are_rechecked_in_one_batch(fake_llm):
+    cascade = Atools.configure_judge_models('strong', 'fast')
+
+    def responder(body):
+        user = body['messages'][-1]['content']
+        claims = [line for line in user.splitlines() if line.startswith('Claim [')]
+        results = []
+        for i, claim in enumerate(claims):
+            partial = body['model'] == 'fast' and 'maybe' in claim
+            results.append({'id': i, 'is_factual': 0 if partial else 1, 'sentence_support': 'Support.'})
+        return json.dumps({'results': results})
+
+    fake_llm.responder = responder
+    labels = Atools.check_factual_batch(['Sure one.', 'A maybe claim.', 'Sure two.', 'Another maybe.'], 'page')
+    assert [label['is_factual'] for label in labels] == [1, 1, 1, 1]
+    # The two partial claims go to the strong model together
+    assert fake_llm == [('fast', 'fact_check_batch_result'), ('strong', 'fact_check_batch_result')]
+    report = cascade.report()['fact_check']
+    assert (report['calls'], report['partial']) == (4, 2)
+
+
+def test_without_escalate_partial_the_fast_label_is_kept(fake_llm):
+    Atools.configure_judge_models('strong', 'fast', escalate_partial=False)
+    fake_llm.responder = lambda body: json.dumps({'is_factual': 0, 'sentence_support': 'Partly.'})
+    assert Atools.check_factual_batch(['A claim.'], 'page')[0]['is_factual'] == 0
+    assert [model for model, _ in fake_llm] == ['fast']
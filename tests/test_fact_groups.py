@@ -0,0 +1,52 @@
+import json
+
+import judge_fact
+from conftest import FakeAgent, read_jsonl, write_jsonl
+
+
+def write_claims(path):
+    write_jsonl(path, [
+        {'https://a.org': {'contexts': ['A one.', 'A two.']}},
+        {'https://b.org/x](https://b.org/x)': {'contexts': ['B one.']}},
+        {'https://a.org': {'contexts': ['A two.', 'A three.']}},
+        {'https://c.org': {'contexts': ['C one.']}, 'https://d.org': {}},
+    ])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n{"https://e.org": not json\n')
+        f.write(json.dumps({'https://b.org/x': {'contexts': ['B two.', 'B one.']}}) + '\n')
+
+
+def test_plan_keeps_offsets_and_reads_contexts_back(tmp_path):
+    claims = tmp_path / 'claims.jsonl'
+    write_claims(claims)
+    lines, groups = judge_fact.plan_url_groups(str(claims))
+    assert list(groups) == ['https://a.org', 'https://b.org/x']
+    assert groups == {'https://a.org': [0, 2], 'https://b.org/x': [1, 5]}
+    assert len(lines) == 6 and lines.records == 4
+    assert not lines.contexts
+    assert lines[2] == ('https://a.org', ['A two.', 'A three.'])
+    assert lines[3][0] is None and '__PARSE_ERROR__' in lines[3][1]
+    assert lines[4][0] is None and lines[4][1]['__raw__'] == '{"https://e.org": not json'
+    assert [url for url, _ in lines] == lines.urls
+
+
+def test_grouped_output_matches_line_by_line(run_fact, tmp_path):
+    claims = tmp_path / 'claims.jsonl'
+    write_claims(claims)
+    run_fact('--inputpath', str(claims), '--outputpath', str(tmp_path / 'grouped.jsonl'))
+    assert FakeAgent.scraped == ['https://a.org', 'https://b.org/x']
+    run_fact('--inputpath', str(claims), '--outputpath', str(tmp_path / 'lines.jsonl'), '--no-group_by_url')
+    assert read_jsonl(tmp_path / 'grouped.jsonl') == read_jsonl(tmp_path / 'lines.jsonl')
+
+
+def test_resume_keeps_only_remaining_contexts(tmp_path):
+    claims = tmp_path / 'claims.jsonl'
+    write_claims(claims)
+    output = tmp_path / 'fact.judge.jsonl'
+    write_jsonl(output, [{'url': 'https://a.org', 'context': 'A one.', 'label': {'is_factual': 1, 'sentence_support': ''}}])
+    lines, _ = judge_fact.plan_url_groups(str(claims))
+    remaining, groups = judge_fact.skip_completed(lines, judge_fact.CompletedResults.from_output(str(output)))
+    assert remaining.contexts == {0: ['A two.']}
+    assert remaining[0] == ('https://a.org', ['A two.'])
+    assert remaining[2] == ('https://a.org', ['A two.', 'A three.'])
+    assert groups['https://a.org'] == [0, 2]
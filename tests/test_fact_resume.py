@@ -0,0 +1,42 @@
+import judge_fact
+from conftest import VERDICT, FakeAgent, read_jsonl, write_jsonl
+
+
+def test_resume_judges_error_labels_again(run_fact, tmp_path):
+    claims = tmp_path / 'claims.jsonl'
+    write_jsonl(claims, [
+        {'https://a.org': {'contexts': ['A one.', 'A two.']}},
+        {'https://b.org': {'contexts': ['B one.']}},
+        {'https://c.org': {'contexts': ['C one.']}},
+    ])
+    output = tmp_path / 'fact.judge.jsonl'
+    write_jsonl(output, [
+        {'url': 'https://a.org', 'context': 'A one.', 'label': VERDICT},
+        {'url': 'https://a.org', 'context': 'A two.', 'label': '__ERROR__: Connection reset'},
+        {'url': 'https://b.org', 'context': 'B one.', 'label': {'error': 'Failed to parse JSON response', 'raw_response': ''}},
+    ])
+    judged = run_fact('--inputpath', str(claims), '--outputpath', str(output), '--resume')
+    assert sorted(judged) == ['A two.', 'B one.', 'C one.']
+    records = read_jsonl(output)
+    # Every pair is in the output once, with its new verdict
+    assert sorted((r['url'], r['context']) for r in records) == [
+        ('https://a.org', 'A one.'), ('https://a.org', 'A two.'), ('https://b.org', 'B one.'), ('https://c.org', 'C one.'),
+    ]
+    assert all(judge_fact.is_verdict(r['label']) for r in records)
+
+
+def test_failed_scrape_is_not_judged_and_retried_on_resume(run_fact, tmp_path):
+    claims = tmp_path / 'claims.jsonl'
+    write_jsonl(claims, [{'https://a.org': {'contexts': ['A one.']}}, {'https://b.org': {'contexts': ['B one.']}}])
+    output = tmp_path / 'fact.judge.jsonl'
+    FakeAgent.failing = {'https://b.org'}
+    judged = run_fact('--inputpath', str(claims), '--outputpath', str(output))
+    assert judged == ['A one.']
+    assert read_jsonl(output)[1]['label'].startswith('__ERROR__: scrape failed')
+
+    FakeAgent.failing = set()
+    FakeAgent.scraped = []
+    run_fact('--inputpath', str(claims), '--outputpath', str(output), '--resume')
+    assert FakeAgent.scraped == ['https://b.org']
+    assert judged == ['A one.', 'B one.']
+    assert [r['label'] for r in read_jsonl(output)] == [VERDICT, VERDICT]
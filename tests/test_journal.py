@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from judge_score import CheckpointJournal
+
+
+@pytest.fixture
+def journal_path(monkeypatch, tmp_path):
+    # A legacy checkpoint.json is looked up in the working directory
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / 'checkpoint.jsonl')
+
+
+def test_resume_restores_completed_and_partial_reports(journal_path):
+    journal = CheckpointJournal(journal_path, resume=False)
+    journal.record_metric('a', 'quality', [3, 3, 4, 2, 3, 'Clear.'])
+    journal.add_processed_file('a')
+    journal.record_metric('b', 'quality', [1, 2, 3, 4, 2, 'Thin.'])
+    journal.sync()
+    # Interrupted without close(): the journal lines are all there is
+
+    resumed = CheckpointJournal(journal_path, resume=True)
+    assert resumed.is_file_processed('a')
+    assert not resumed.is_file_processed('b')
+    assert resumed.get_metric('b', 'quality') == [1, 2, 3, 4, 2, 'Thin.']
+    assert resumed.get_metric('b', 'repeatability') is None
+    # A completed report keeps no partial metrics
+    assert resumed.get_metric('a', 'quality') is None
+    resumed.close()
+
+
+def test_torn_and_unreadable_lines_are_dropped(journal_path):
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'file_id': 'a', 'done': True}) + '\n')
+        f.write('not json\n')
+        f.write(json.dumps({'file_id': 'b', 'metric': 'quality', 'data': [1]}) + '\n')
+        f.write('{"file_id": "c", "do')
+
+    journal = CheckpointJournal(journal_path, resume=True)
+    assert journal.completed == {'a'}
+    assert journal.get_metric('b', 'quality') == [1]
+    # The journal was rewritten without the broken lines, so appends start on a fresh line
+    journal.add_processed_file('c')
+    journal.close()
+    with open(journal_path, encoding='utf-8') as f:
+        events = [json.loads(line) for line in f]
+    assert CheckpointJournal(journal_path, resume=True).completed == {'a', 'c'}
+    assert {'file_id': 'b', 'metric': 'quality', 'data': [1]} in events
+
+
+def test_compact_keeps_one_line_per_live_entry(journal_path):
+    journal = CheckpointJournal(journal_path, resume=False)
+    for file_id in ('a', 'b'):
+        journal.record_metric(file_id, 'quality', [file_id])
+        journal.record_metric(file_id, 'repeatability', [file_id])
+    journal.add_processed_file('a')
+    journal.compact()
+    with open(journal_path, encoding='utf-8') as f:
+        events = [json.loads(line) for line in f]
+    assert events == [
+        {'file_id': 'a', 'done': True},
+        {'file_id': 'b', 'metric': 'quality', 'data': ['b']},
+        {'file_id': 'b', 'metric': 'repeatability', 'data': ['b']},
+    ]
+    journal.close()
+
+
+def test_without_resume_the_journal_starts_empty(journal_path):
+    journal = CheckpointJournal(journal_path, resume=False)
+    journal.add_processed_file('a')
+    journal.close()
+    assert not CheckpointJournal(journal_path, resume=False).completed
+
+
+def test_legacy_checkpoint_is_imported(journal_path, tmp_path):
+    with open(tmp_path / CheckpointJournal.LEGACY_CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'processed_files': ['a', 'b']}, f)
+    journal = CheckpointJournal(journal_path, resume=True)
+    assert journal.completed == {'a', 'b'}
+    journal.close()
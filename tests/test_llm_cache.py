@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import Atools
+from Acache import LLMCache
+from Aschema import SchemaError
+
+QUALITY = json.dumps({
+    "Reason": "Clear and well structured.",
+    "Comprehensiveness_Score": 3,
+    "Coherence_Score": 3,
+    "Clarity_Score": 4,
+    "Insightfulness_Score": 2,
+    "Overall_Score": 3,
+})
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Answer completions from a list of canned responses and count the calls."""
+    responses = []
+    calls = []
+
+    def create_completion(model, messages, params):
+        calls.append(model)
+        return responses.pop(0), 0
+
+    monkeypatch.setattr(Atools, '_create_completion', create_completion)
+    monkeypatch.setattr(Atools, 'judge_cascade', None)
+    Atools.configure_llm_cache(str(tmp_path / 'llm_cache.db'))
+    yield responses, calls
+    Atools.configure_llm_cache(None)
+
+
+def test_broken_response_is_not_cached(api):
+    responses, calls = api
+    responses.extend(['{"Reason": "cut off', QUALITY])
+    with pytest.raises(SchemaError):
+        Atools.judge_quality('topic', 'report')
+    # The retry reaches the API again instead of reading the broken answer back
+    assert Atools.judge_quality('topic', 'report')['Overall_Score'] == 3
+    assert len(calls) == 2
+    # ... and the valid answer is cached
+    assert Atools.judge_quality('topic', 'report')['Overall_Score'] == 3
+    assert len(calls) == 2
+
+
+def test_cached_broken_response_is_requested_again(api):
+    responses, calls = api
+    messages = Atools.quality_messages('topic', 'report')
+    key = LLMCache.make_key('gpt-4o', messages, Atools.judge_params('quality'))
+    Atools.llm_cache.put(key, 'gpt-4o', 'not json at all')
+    responses.append(QUALITY)
+    assert Atools.judge_quality('topic', 'report')['Overall_Score'] == 3
+    assert len(calls) == 1
+    assert Atools.llm_cache.get(key) == QUALITY
+
+
+def test_fact_check_error_label_is_not_cached(api):
+    responses, calls = api
+    valid = json.dumps({"is_factual": 1, "sentence_support": "Supported."})
+    responses.extend(['', valid])
+    assert 'error' in Atools.check_factual_batch(['A claim.'], 'page')[0]
+    assert Atools.check_factual_batch(['A claim.'], 'page')[0]['is_factual'] == 1
+    assert len(calls) == 2
@@ -0,0 +1,47 @@
+import pytest
+
+import judge_score
+from Asections import SectionIndex
+from conftest import make_report, read_jsonl, write_reports
+
+
+def report_sections(report):
+    return SectionIndex(report).with_titles[1:-1]
+
+
+def duplicated_report(sections=12):
+    """Report whose sections 3 and 7 (and 5 and 9) say the same thing."""
+    report = make_report('Topic', sections)
+    for a, b in ((3, 7), (5, 9)):
+        report = report.replace(f"Paragraph {b} discusses aspect number {b}", f"Paragraph {a} discusses aspect number {a}")
+        report = report.replace(f"study {b} ", f"study {a} ").replace(f"finding {b} ", f"finding {a} ").replace(f"aspect {b} ", f"aspect {a} ")
+    return report
+
+
+def test_prefilter_sends_every_similar_pair_whatever_the_sample():
+    sections = report_sections(duplicated_report())
+    for seed in range(5):
+        candidates, pair_plan, prefiltered = judge_score.plan_repeat_pairs(sections, repeat_nums=3, prefilter_threshold=0.9, seed=seed)
+        texts = [(candidates[a], candidates[b]) for _, (a, b) in pair_plan]
+        assert len(pair_plan) == 2
+        assert all('Paragraph 3 ' in p1 and 'Paragraph 3 ' in p2 or 'Paragraph 5 ' in p1 and 'Paragraph 5 ' in p2 for p1, p2 in texts)
+        assert prefiltered == judge_score.repeat_pair_population(candidates) - 2
+
+
+def test_prefiltered_pairs_count_in_repeat_score():
+    pair_outcomes = [(0, 'a', 'b', (0, 'Same point twice.', ['x'], '90%')), (1, 'c', 'd', (2, 'Some overlap.', ['y'], '80%'))]
+    quality = (3, 3, 3, 3, 3, 'Fine.')
+    result = judge_score.assemble_result_entry('f', 'topic', quality, pair_outcomes, prefiltered_num=8, pair_population=10)
+    # Two judged pairs (mean 1) stand for the 2 similar pairs, 8 prefiltered pairs score 4
+    assert result['repeat_score'] == pytest.approx((2 * 1 + 8 * 4) / 10)
+    assert result['prefiltered_pairs'] == 8
+    assert len(result['repeat_results']) == 2
+
+
+def test_report_without_similar_pairs_needs_no_llm_call(run_score, fake_llm, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 1)
+    run_score('--inputpath', 'reports.jsonl', '--outputpath', 'out', '--output_format', 'jsonl', '--repeat_prefilter_threshold', '0.99')
+    result, = read_jsonl(tmp_path / 'out' / 'results.jsonl')
+    assert result['repeat_score'] == judge_score.PREFILTER_REPEAT_SCORE
+    assert result['repeat_results'] == []
+    assert [schema for _, schema in fake_llm] == ['quality_result']
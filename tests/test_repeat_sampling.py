@@ -0,0 +1,96 @@
+import json
+import math
+
+import pytest
+
+from Atools import RepeatScoreEstimate, student_t_quantile
+from conftest import read_jsonl, write_reports
+from mock_servers import canned_verdict
+
+T_95_1 = 12.7062
+
+
+def test_student_t_quantile():
+    assert student_t_quantile(0.95, 1) == pytest.approx(T_95_1, abs=1e-3)
+    assert student_t_quantile(0.95, 10) == pytest.approx(2.2281, abs=1e-3)
+    assert student_t_quantile(0.99, 4) == pytest.approx(4.6041, abs=1e-3)
+
+
+def test_interval_uses_finite_population_correction():
+    estimate = RepeatScoreEstimate(45)
+    estimate.add(1)
+    assert estimate.half_width() == math.inf
+    estimate.add(3)
+    # Sample standard error 1, two of 45 pairs judged
+    assert estimate.half_width() == pytest.approx(T_95_1 * math.sqrt(43 / 44), rel=1e-4)
+    # The unclipped interval is wider than the score range
+    assert estimate.interval('max_pairs') == {'low': 0, 'high': 4, 'width': 4, 'confidence': 0.95, 'pairs': 2, 'stop': 'max_pairs'}
+
+
+def test_interval_closes_once_every_pair_is_judged():
+    estimate = RepeatScoreEstimate(3)
+    for score in (0, 4, 2):
+        estimate.add(score)
+    assert estimate.half_width() == 0.0
+    assert estimate.interval('all_pairs')['low'] == estimate.interval()['high'] == 2
+
+
+def test_known_pairs_narrow_and_shift_the_interval():
+    sampled = RepeatScoreEstimate(10)
+    mixed = RepeatScoreEstimate(10, known=30, known_score=4)
+    for score in (1, 2, 3):
+        sampled.add(score)
+        mixed.add(score)
+    assert mixed.score() == pytest.approx(0.25 * 2 + 0.75 * 4)
+    assert mixed.half_width() == pytest.approx(0.25 * sampled.half_width())
+
+
+def constant_pair_score(body):
+    """Every repeatability pair gets score 2 with high confidence; other judges use the mock verdict."""
+    if (body.get('response_format') or {}).get('json_schema', {}).get('name') == 'repeatability_pair_result':
+        return json.dumps({"score": 2, "explanation": "Same.", "repetitions_found": [], "confidence": "95%"})
+    return canned_verdict(body)
+
+
+def pair_calls(fake_llm):
+    return sum(1 for _, schema in fake_llm if schema == 'repeatability_pair_result')
+
+
+def test_sampling_stops_at_target_width(run_score, fake_llm, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 2, sections=10)
+    fake_llm.responder = constant_pair_score
+    args = ['--inputpath', 'reports.jsonl', '--output_format', 'jsonl', '--repeat_ci_width', '0.5', '--repeat_min_pairs', '4']
+    run_score(*args, '--outputpath', 'sequential')
+    results = sorted(read_jsonl(tmp_path / 'sequential' / 'results.jsonl'), key=lambda r: r['file_id'])
+    # Identical scores have a zero-width interval, so each report stops at --repeat_min_pairs
+    assert pair_calls(fake_llm) == 8
+    for result in results:
+        assert len(result['repeat_results']) == 4
+        assert result['repeat_interval'] == {'low': 2, 'high': 2, 'width': 0, 'confidence': 0.95, 'pairs': 4, 'stop': 'target_width'}
+
+    # Pairs started ahead of the stop are dropped from the result
+    del fake_llm[:]
+    run_score(*args, '--outputpath', 'concurrent', '--concurrency', '4')
+    assert pair_calls(fake_llm) <= 2 * (4 + 4)
+    assert sorted(read_jsonl(tmp_path / 'concurrent' / 'results.jsonl'), key=lambda r: r['file_id']) == results
+
+
+def test_sampling_stops_at_max_pairs_when_the_target_is_not_reached(run_score, fake_llm, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 1, sections=10)
+    run_score('--inputpath', 'reports.jsonl', '--outputpath', 'out', '--output_format', 'jsonl',
+              '--repeat_ci_width', '0.01', '--repeat_min_pairs', '2', '--repeat_max_pairs', '6')
+    interval = read_jsonl(tmp_path / 'out' / 'results.jsonl')[0]['repeat_interval']
+    assert (interval['pairs'], interval['stop']) == (6, 'max_pairs')
+    assert interval['width'] > 0.01
+
+
+def judged_pairs(run_score, tmp_path, output, *args):
+    run_score('--inputpath', 'reports.jsonl', '--outputpath', output, '--output_format', 'jsonl', '--repeat_max_pairs', '5', *args)
+    return [pair[:2] for pair in read_jsonl(tmp_path / output / 'results.jsonl')[0]['compare_list']]
+
+
+def test_seed_fixes_the_sample(run_score, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 1, sections=10)
+    default = judged_pairs(run_score, tmp_path, 'a')
+    assert judged_pairs(run_score, tmp_path, 'b', '--repeat_seed', '0') == default
+    assert judged_pairs(run_score, tmp_path, 'c', '--repeat_seed', '7') != default
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from Aresults import COMPACT_FORMAT, JsonlResultSink, compact_result, expand_result, expand_results, read_results
+from Asections import SectionIndex
+from conftest import make_report, read_jsonl, write_reports
+
+
+def test_resume_drops_partial_line_and_skips_written_ids(tmp_path):
+    sink = JsonlResultSink(str(tmp_path), resume=False)
+    sink.write({'file_id': 'a', 'score': 1}, 'a')
+    sink.close()
+    path = tmp_path / 'results.jsonl'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"file_id":"b","sc')
+
+    sink = JsonlResultSink(str(tmp_path), resume=True)
+    assert sink.file_ids == {'a'}
+    sink.write({'file_id': 'a', 'score': 2}, 'a')
+    sink.write({'file_id': 'b', 'score': 3}, 'b')
+    sink.close()
+    assert read_jsonl(path) == [{'file_id': 'a', 'score': 1}, {'file_id': 'b', 'score': 3}]
+
+
+def test_without_resume_existing_results_are_removed(tmp_path):
+    sink = JsonlResultSink(str(tmp_path), shard_max_bytes=1)
+    sink.write({'file_id': 'a'}, 'a')
+    sink.write({'file_id': 'b'}, 'b')
+    sink.close()
+    assert sorted(os.listdir(tmp_path)) == ['results-00000.jsonl', 'results-00001.jsonl']
+
+    sink = JsonlResultSink(str(tmp_path), shard_max_bytes=1, resume=False)
+    assert not sink.file_ids
+    sink.close()
+    assert os.listdir(tmp_path) == ['results-00000.jsonl']
+    assert read_jsonl(tmp_path / 'results-00000.jsonl') == []
+
+
+def test_resume_continues_the_last_shard(tmp_path):
+    sink = JsonlResultSink(str(tmp_path), shard_max_bytes=1)
+    for file_id in ('a', 'b'):
+        sink.write({'file_id': file_id}, file_id)
+    sink.close()
+    sink = JsonlResultSink(str(tmp_path), shard_max_bytes=1, resume=True)
+    assert sink.file_ids == {'a', 'b'}
+    sink.write({'file_id': 'c'}, 'c')
+    sink.close()
+    assert [r['file_id'] for r in read_results(str(tmp_path))] == ['a', 'b', 'c']
+
+
+def test_compact_round_trip_reproduces_the_legacy_result(run_score, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 3)
+    args = ['--inputpath', 'reports.jsonl', '--repeat_max_pairs', '5', '--output_format', 'jsonl']
+    run_score(*args, '--outputpath', 'legacy')
+    run_score(*args, '--outputpath', 'compact', '--result_format', 'compact')
+    legacy = read_jsonl(tmp_path / 'legacy' / 'results.jsonl')
+    compact = read_jsonl(tmp_path / 'compact' / 'results.jsonl')
+    assert all(r['format'] == COMPACT_FORMAT and 'repeat_results' not in r for r in compact)
+    assert len(json.dumps(compact)) < len(json.dumps(legacy))
+
+    written = expand_results([str(tmp_path / 'compact')], str(tmp_path / 'reports.jsonl'), str(tmp_path / 'expanded'), 'jsonl')
+    assert written == 3
+    assert read_jsonl(tmp_path / 'expanded' / 'results.jsonl') == legacy
+
+
+def test_expand_rejects_a_changed_report():
+    report = make_report('Topic 0')
+    index = SectionIndex(report)
+    first, second = (index.render('with_title', k) for k in (2, 3))
+    entry = {
+        'file_id': 'a', 'topic': 'Topic 0', 'comprehensiveness_score': 3, 'coherence_score': 3, 'clarity_score': 3,
+        'insight_score': 3, 'overall_score': 3, 'repeat_score': 4, 'quality_reason': 'Fine.',
+        'compare_list': [[first, second, 4]], 'repeat_results': [[first, second, 4, 'None.', [], '90%']],
+    }
+    compact = compact_result(entry, report)
+    assert expand_result(compact, report) == entry
+    with pytest.raises(ValueError):
+        expand_result(compact, report.replace('Paragraph 2', 'Paragraph two'))
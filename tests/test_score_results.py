@@ -0,0 +1,22 @@
+import judge_score
+from conftest import read_jsonl, write_reports
+
+
+def test_result_is_saved_in_full_when_compaction_fails(run_score, fake_llm, monkeypatch, tmp_path):
+    write_reports(tmp_path / 'reports.jsonl', 2)
+
+    def broken_compact(result_entry, report):
+        raise ValueError('passage not found')
+
+    monkeypatch.setattr(judge_score, 'compact_result', broken_compact)
+    args = ['--inputpath', 'reports.jsonl', '--outputpath', 'out', '--output_format', 'jsonl', '--result_format', 'compact', '--repeat_max_pairs', '3']
+    run_score(*args)
+    results = read_jsonl(tmp_path / 'out' / 'results.jsonl')
+    assert len(results) == 2
+    assert all('format' not in r and len(r['repeat_results']) == 3 for r in results)
+
+    # Both reports are checkpointed: a resumed run judges nothing
+    calls = len(fake_llm)
+    run_score(*args, '--resume')
+    assert len(fake_llm) == calls
+    assert len(read_jsonl(tmp_path / 'out' / 'results.jsonl')) == 2
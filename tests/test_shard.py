@@ -0,0 +1,35 @@
+from Aleaderboard import scan_fact_results
+from Ashard import Shard, merge_fact_results, shard_of, shard_path
+from conftest import write_jsonl
+
+
+def test_shard_path_keeps_judge_suffix():
+    assert shard_path('exp/fact.judge.jsonl', Shard(0, 2)) == 'exp/fact.shard-0-of-2.judge.jsonl'
+    assert shard_path('exp/checkpoint.jsonl', Shard(1, 2)) == 'exp/checkpoint.shard-1-of-2.jsonl'
+    assert shard_path('exp/fact.judge.jsonl', None) == 'exp/fact.judge.jsonl'
+
+
+def test_merge_fact_results_from_directory(tmp_path):
+    urls = [f'https://example.org/page{i}' for i in range(12)]
+    claims = {url: [f'Claim {i} about {url}.' for i in range(3)] for url in urls}
+    claims_path = tmp_path / 'claims.jsonl'
+    write_jsonl(claims_path, ({url: {'contexts': contexts, 'file_id': 'f'}} for url, contexts in claims.items()))
+
+    # One output per shard, named the way judge_fact.py --shard names them
+    shard_dir = tmp_path / 'shards'
+    shard_dir.mkdir()
+    for index in range(2):
+        shard = Shard(index, 2)
+        records = [
+            {'url': url, 'context': context, 'label': {'is_factual': 1, 'sentence_support': 'yes'}}
+            for url, contexts in claims.items() if shard_of(url, 2) == index for context in contexts
+        ]
+        write_jsonl(shard_path(str(shard_dir / 'fact.judge.jsonl'), shard), records)
+
+    output = tmp_path / 'merged' / 'fact.judge.jsonl'
+    summary = merge_fact_results([str(shard_dir)], str(output), str(claims_path))
+    assert summary['files'] == 2
+    assert summary['records'] == 36
+    assert summary['missing'] == 0
+    assert summary['missing_shard_files'] == []
+    assert len(scan_fact_results([str(shard_dir)])) == 36